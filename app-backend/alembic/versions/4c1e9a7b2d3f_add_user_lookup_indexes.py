@@ -0,0 +1,43 @@
+"""add user lookup indexes
+
+Revision ID: 4c1e9a7b2d3f
+Revises: 
+Create Date: 2026-10-19 10:12:41.318205
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e9a7b2d3f'
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_User_first_name_last_name', 'User', ['first_name', 'last_name'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_User_dob', 'User', ['dob'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_User_dob', table_name='User',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'ix_User_first_name_last_name', table_name='User',
+            postgresql_concurrently=True, if_exists=True,
+        )
@@ -0,0 +1,36 @@
+"""
+Redis names used to hand completed RAG summaries from the worker to the API.
+
+When a summary is ready the worker stores it under `form:summary:<form id>`
+(so clients that connect late still get it) and publishes the same payload
+on the `form:summary-ready:<form id>` channel for clients already waiting.
+
+The worker also records the summary and its processing status on the form's
+MongoDB document, under the `summary` field, so it can be read back later.
+"""
+
+import os
+
+SUMMARY_TTL = int(os.getenv("SUMMARY_TTL", "3600"))
+
+SUMMARY_KEY_PREFIX = "form:summary:"
+SUMMARY_CHANNEL_PREFIX = "form:summary-ready:"
+SUMMARY_CHANNEL_PATTERN = f"{SUMMARY_CHANNEL_PREFIX}*"
+
+# Processing status of a form's summary, stored as `summary.status`
+SUMMARY_PENDING = "pending"
+SUMMARY_PROCESSING = "processing"
+SUMMARY_DONE = "done"
+SUMMARY_FAILED = "failed"
+
+def summary_key(form_id) -> str:
+    """Redis key holding a form's latest summary."""
+    return f"{SUMMARY_KEY_PREFIX}{form_id}"
+
+def summary_channel(form_id) -> str:
+    """Pub/sub channel a form's summary is announced on."""
+    return f"{SUMMARY_CHANNEL_PREFIX}{form_id}"
+
+def form_id_from_channel(channel: str) -> str:
+    """Extract the form ID from a summary channel name."""
+    return channel[len(SUMMARY_CHANNEL_PREFIX):]
@@ -0,0 +1,151 @@
+"""
+Verification session store shared by the verification and form submission services.
+
+Each doctor's progress through verification is kept in one Redis hash,
+`verification:session:<doctor id>`, holding the current step. Sessions
+expire after `VERIFICATION_SESSION_TTL` seconds of inactivity. Step
+transitions are done with a Lua compare-and-set so two concurrent requests
+cannot both advance (or skip) the same step, and checks refresh the TTL and
+fetch any extra keys the caller needs in the same round trip.
+
+Form drafts live under their own `form:draft:<form id>` prefix with their
+own TTL instead of sharing the keyspace with the sessions.
+"""
+
+import os
+import time
+
+import redis
+
+VERIFICATION_SESSION_TTL = int(os.getenv("VERIFICATION_SESSION_TTL", "1800"))
+FORM_DRAFT_TTL = int(os.getenv("FORM_DRAFT_TTL", "86400"))
+
+SESSION_PREFIX = "verification:session:"
+DRAFT_PREFIX = "form:draft:"
+
+# Verification steps, in the order they are completed.
+STEP_ID = 1
+STEP_NAME = 2
+STEP_VERIFIED = 3
+
+# KEYS[1]: session hash. ARGV: expected step, new step, TTL, timestamp.
+ADVANCE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'step') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'step', ARGV[2], 'updated_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# KEYS[1]: session hash, KEYS[2..n]: keys to fetch. ARGV: expected step, TTL.
+REQUIRE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'step') ~= ARGV[1] then
+    return {0}
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local reply = {1}
+for i = 2, #KEYS do
+    reply[i] = redis.call('GET', KEYS[i])
+end
+return reply
+"""
+
+def session_key(doctorid: str) -> str:
+    """Redis key of a doctor's verification session."""
+    return f"{SESSION_PREFIX}{str(doctorid).lower()}"
+
+def draft_key(form_id) -> str:
+    """Redis key of a form draft."""
+    return f"{DRAFT_PREFIX}{form_id}"
+
+class VerificationSessionStore:
+    """
+    Redis-backed verification sessions and form drafts.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: int = VERIFICATION_SESSION_TTL,
+                 draft_ttl: int = FORM_DRAFT_TTL):
+        """
+        Initialize the store.
+
+        Args:
+            redis_client (redis.Redis): Redis client with response decoding enabled.
+            ttl (int): Session lifetime in seconds, refreshed on every use.
+            draft_ttl (int): Form draft lifetime in seconds.
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+        self.draft_ttl = draft_ttl
+        self._advance = redis_client.register_script(ADVANCE_SCRIPT)
+        self._require = redis_client.register_script(REQUIRE_SCRIPT)
+
+    def start(self, doctorid: str, step: int = STEP_ID):
+        """
+        Start a new session at `step`, replacing any existing one.
+
+        Args:
+            doctorid (str): Doctor ID the session belongs to.
+            step (int): Step the session starts at.
+        """
+        key = session_key(doctorid)
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"step": step, "updated_at": time.time()})
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def advance(self, doctorid: str, expected: int, step: int) -> bool:
+        """
+        Move a session from `expected` to `step` atomically.
+
+        Args:
+            doctorid (str): Doctor ID the session belongs to.
+            expected (int): Step the session must currently be at.
+            step (int): Step to move to.
+
+        Returns:
+            bool: False if the session is missing, expired or at another step.
+        """
+        return bool(self._advance(
+            keys=[session_key(doctorid)], args=[expected, step, self.ttl, time.time()]
+        ))
+
+    def require_step(self, doctorid: str, step: int, *keys: str) -> list | None:
+        """
+        Check that a session is at `step` and fetch `keys` in the same round trip.
+
+        A matching session has its TTL refreshed.
+
+        Args:
+            doctorid (str): Doctor ID the session belongs to.
+            step (int): Step the session must be at.
+            *keys (str): Additional string keys to read, e.g. built with `draft_key`.
+
+        Returns:
+            list | None: Values of `keys` (None for missing ones), or None if
+            the session is missing, expired or at another step.
+        """
+        status, *values = self._require(
+            keys=[session_key(doctorid), *keys], args=[step, self.ttl]
+        )
+        return values if status else None
+
+    def save_draft(self, form_id: str, data: str):
+        """
+        Store a form draft.
+
+        Args:
+            form_id (str): Form ID the draft belongs to.
+            data (str): Serialized draft.
+        """
+        self.redis.set(draft_key(form_id), data, ex=self.draft_ttl)
+
+    def delete_draft(self, form_id: str):
+        """
+        Remove a form draft once it has been saved.
+
+        Args:
+            form_id (str): Form ID the draft belongs to.
+        """
+        self.redis.delete(draft_key(form_id))
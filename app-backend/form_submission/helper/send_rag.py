@@ -107,12 +107,14 @@ class RabbitMQProducer:
         self.queue_name = "rag_tasks"
         self.channel.queue_declare(queue=self.queue_name, durable=True)
 
-    def publish(self, message: dict):
+    def publish(self, message: dict, message_id: str | None = None):
         """
         Publish a message to the RabbitMQ queue.
 
         Args:
             message (dict): A dictionary containing the message payload.
+            message_id (str | None): ID of the form the message is about,
+                used by the worker to announce the finished summary.
 
         Raises:
             HTTPException: If publishing fails due to a connection or serialization error.
@@ -122,7 +124,13 @@ class RabbitMQProducer:
                 exchange="",
                 routing_key=self.queue_name,
                 body=json.dumps(message),
-                properties=pika.BasicProperties(delivery_mode=2),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    message_id=message_id,
+                    # Lets the worker measure how long tasks wait in the queue.
+                    # Milliseconds as an int: AMQP header tables can't hold floats.
+                    headers={"x-published-at-ms": int(time.time() * 1000)},
+                ),
             )
             logger.info("Form data published to RabbitMQ.")
         except Exception as e:
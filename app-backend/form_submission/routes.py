@@ -2,10 +2,12 @@
 This modules defines the API endpoints for form submission by verified doctors.
 
 """
+import asyncio
 import json
 import logging
 import os
 import uuid
+from datetime import datetime
 
 import redis
 from fastapi import (
@@ -18,14 +20,19 @@ from fastapi import (
     Request,
     UploadFile,
 )
+from fastapi.responses import StreamingResponse
 from typing import Generator
 from pydantic import BaseModel, Field
 from pymongo.collection import Collection
+from redis.exceptions import RedisError
 
 from common.logger import setup_logging
+from common.summary_events import SUMMARY_FAILED, SUMMARY_PENDING
+from common.verification_session import STEP_VERIFIED, VerificationSessionStore, draft_key
 from database import db
 from helper.send_rag import RabbitMQProducer
 from model import FormModel
+from summaries import SummaryBroker, summary_broker
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -37,6 +44,10 @@ router = APIRouter(
 
 form_collection = db["form_data"]
 
+# How long a summary stream stays open, and how often it sends keep-alives
+SUMMARY_STREAM_TIMEOUT = float(os.getenv("SUMMARY_STREAM_TIMEOUT", "300"))
+SUMMARY_KEEPALIVE_INTERVAL = float(os.getenv("SUMMARY_KEEPALIVE_INTERVAL", "15"))
+
 def get_redis():
     """Create and return a Redis client connected to the default Redis service.
 
@@ -45,6 +56,27 @@ def get_redis():
     """
     return redis.Redis(host="redis", port=6379, decode_responses=True)
 
+def get_session_store(redis_client = Depends(get_redis)) -> VerificationSessionStore:
+    """
+    Return the verification session store on the request's Redis client.
+
+    Args:
+        redis_client (redis.Redis): Redis client from `get_redis`.
+
+    Returns:
+        VerificationSessionStore: Store for verification sessions and form drafts.
+    """
+    return VerificationSessionStore(redis_client)
+
+def get_summary_broker() -> SummaryBroker:
+    """
+    Return the process-wide summary broker.
+
+    Returns:
+        SummaryBroker: Broker delivering completed summaries.
+    """
+    return summary_broker
+
 def get_form_collection() -> Collection:
     """
     Return the MongoDB collection for form data.
@@ -68,6 +100,31 @@ class FormSubResponse(BaseModel):
     detail: str
 
 
+class SummaryResponse(BaseModel):
+    """
+    Data model representing a form's RAG summary and its processing status.
+
+    Attributes:
+        success (bool): Indicates whether the form was found.
+        form_id (str | None): ID of the form.
+        status (str | None): `pending`, `processing`, `done` or `failed`.
+        summary (str | None): Generated clinical summary, once done.
+        model (str | None): Model that generated the summary.
+        prompt_version (str | None): Version of the prompt template used.
+        timings (dict | None): Seconds spent in each processing stage.
+        updated_at (datetime | None): Time of the last status change.
+        detail (str): Additional information or error message.
+    """
+    success: bool
+    form_id: str | None = None
+    status: str | None = None
+    summary: str | None = None
+    model: str | None = None
+    prompt_version: str | None = None
+    timings: dict | None = None
+    updated_at: datetime | None = None
+    detail: str
+
 class GetFormResponse(BaseModel):
     """
     Data model representing the response of a form retrieval operation.
@@ -99,6 +156,32 @@ def get_token(request: Request):
         raise HTTPException(status_code=401, detail="Missing Authorization header")
     return auth
 
+def check_session(sessions: VerificationSessionStore, auth_token: dict, *keys: str) -> list:
+    """
+    Check that the doctor has completed verification.
+
+    Both the token and the stored verification session must be at the final
+    step. The session's TTL is refreshed.
+
+    Args:
+        sessions (VerificationSessionStore): Verification session store.
+        auth_token (dict): Parsed authorization token with `id` and `step`.
+        *keys (str): Redis keys to fetch along with the check.
+
+    Returns:
+        list: Values of `keys`, None for missing ones.
+
+    Raises:
+        HTTPException: If the token or session is not fully verified, or the
+        session has expired.
+    """
+    values = None
+    if str(auth_token["step"]) == str(STEP_VERIFIED):
+        values = sessions.require_step(auth_token["id"], STEP_VERIFIED, *keys)
+    if values is None:
+        raise HTTPException(status_code=401, detail="Token does not match.")
+    return values
+
 def validate_session_id(session_id: str = Path(...)) -> str:
     """
     Validates that the provided session_id string is a valid UUID.
@@ -165,11 +248,11 @@ async def user_form(
     position : str = Form(...),
     files: list[UploadFile] | None = File(None),
     token: str = Depends(get_token),
-    redis_client = Depends(get_redis),
+    sessions: VerificationSessionStore = Depends(get_session_store),
     ):
     """
     Endpoint to submit a form with optional file uploads.
-    Saves files to disk, stores form data in Redis with a unique form ID.
+    Saves files to disk, stores the form draft in Redis with a unique form ID.
 
     Args:
         age_identity (int): Age identifier.
@@ -182,7 +265,7 @@ async def user_form(
         position (str): Position identifier.
         files (list[UploadFile] | None): Optional uploaded files.
         token (str): The authorization token for the request.
-        redis_client: The Redis client used for storing form data.
+        sessions (VerificationSessionStore): Store for verification sessions and form drafts.
 
     Returns:
         ResponseModel: Contains status code and generated form ID.
@@ -196,15 +279,8 @@ async def user_form(
         auth_token = json.loads(token)
         uuid.UUID(auth_token["id"])
 
-        # Redis cache check
-        cache_id = redis_client.get(auth_token["id"])
-        if cache_id:
-            if str(cache_id) == str(auth_token["step"]):
-                pass # Step matches; proceed
-            else:
-                raise HTTPException(status_code=401, detail="Token does not match.")
-        else:
-            raise HTTPException(status_code=401, detail="Token does not match.")
+        # Verification session check
+        check_session(sessions, auth_token)
 
         form_id = str(uuid.uuid4())
         saved_files = []
@@ -233,7 +309,7 @@ async def user_form(
             "position": position,
             "files": saved_files
         }
-        redis_client.set(form_id, json.dumps(form_data), ex=None)
+        sessions.save_draft(form_id, json.dumps(form_data))
         logger.info("Form drafted.")
         return FormSubResponse(success=True, form_id=form_id, detail="Form drafted.")
     except ValueError:
@@ -251,7 +327,7 @@ async def user_form(
 async def get_user_form(
     token: str = Depends(get_token),
     session_id: uuid.UUID = Depends(validate_session_id),
-    redis_client = Depends(get_redis),
+    sessions: VerificationSessionStore = Depends(get_session_store),
     form_collection: Collection = Depends(get_form_collection)
     ):
     """
@@ -259,7 +335,7 @@ async def get_user_form(
 
     Args:
         session_id (uuid.UUID): The validated session ID passed as a URL path parameter.
-        redis_client: A Redis client instance used to fetch session data.
+        sessions (VerificationSessionStore): Store for verification sessions and form drafts.
 
     Returns:
         UserForm: A pydantic model populated with session data retrieved from Redis.
@@ -273,17 +349,8 @@ async def get_user_form(
         auth_token = json.loads(token)
         uuid.UUID(auth_token["id"])
 
-        # Redis cache check
-        cache_id = redis_client.get(auth_token["id"])
-        if cache_id:
-            if str(cache_id) == str(auth_token["step"]):
-                pass # Step matches; proceed
-            else:
-                raise HTTPException(status_code=401, detail="Token does not match.")
-        else:
-            raise HTTPException(status_code=401, detail="Token does not match.")
-
-        get_form_data = redis_client.get(session_id)
+        # Verification session check and draft lookup in one round trip
+        get_form_data, = check_session(sessions, auth_token, draft_key(session_id))
 
         if not get_form_data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -317,7 +384,7 @@ async def get_user_form(
 async def save_user_form(
     token: str = Depends(get_token),
     session_id: uuid.UUID = Depends(validate_session_id),
-    redis_client = Depends(get_redis),
+    sessions: VerificationSessionStore = Depends(get_session_store),
     form_collection: Collection = Depends(get_form_collection),
     rabbitmq_producer: RabbitMQProducer = Depends(get_rabbitmq_producer)
     ):
@@ -326,7 +393,7 @@ async def save_user_form(
     Args:
         token (str): A JSON string containing authentication token data. Retrieved via dependency injection.
         session_id (uuid.UUID): The session identifier, validated via dependency.
-        redis_client (Redis): A Redis client instance for accessing cache. Injected as a dependency.
+        sessions (VerificationSessionStore): Store for verification sessions and form drafts.
         form_collection (Collection): MongoDB collection instance to insert the form into.
         rabbitmq_producer (RabbitMQProducer): Injected RabbitMQ producer instance.
 
@@ -343,17 +410,8 @@ async def save_user_form(
         auth_token = json.loads(token)
         uuid.UUID(auth_token["id"])
 
-        # Redis cache check
-        cache_id = redis_client.get(auth_token["id"])
-        if cache_id:
-            if str(cache_id) == str(auth_token["step"]):
-                pass # Step matches; proceed
-            else:
-                raise HTTPException(status_code=401, detail="Token does not match.")
-        else:
-            raise HTTPException(status_code=401, detail="Token does not match.")
-
-        get_form_data = redis_client.get(session_id)
+        # Verification session check and draft lookup in one round trip
+        get_form_data, = check_session(sessions, auth_token, draft_key(session_id))
 
         if not get_form_data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -375,16 +433,15 @@ async def save_user_form(
         if isinstance(model_dict.get("id"), uuid.UUID):
             model_dict["id"] = str(model_dict["id"])
 
-        # Add dict to the collection
-        form_collection.insert_one(model_dict)
+        # Add dict to the collection; the worker fills in the summary
+        form_collection.insert_one({**model_dict, "summary": {"status": SUMMARY_PENDING}})
+        sessions.delete_draft(session_id)
         logger.info("Data registered.")
 
-        pop_list = ["id", "files", "position", "created_at"]
-        for each in model_dict:
-            if each in pop_list:
-                model_dict.pop(each)
-        
-        rabbitmq_producer.publish(model_dict)
+        # `id` is kept so the worker can record the summary on this document
+        pop_list = ["_id", "files", "position", "created_at"]
+        message = {key: value for key, value in model_dict.items() if key not in pop_list}
+        rabbitmq_producer.publish(message, message_id=session_id)
         return GetFormResponse(success=True, detail="Data registered.")
     except ValueError:
         logger.warning("Invalid UUID.")
@@ -398,3 +455,129 @@ async def save_user_form(
         logger.exception("Something went wrong. Try again later.")
         return GetFormResponse(success=False,
                                         detail="Something went wrong. Try again later.")
+
+@router.get("/{session_id}/summary", response_model=SummaryResponse)
+async def get_summary(
+    token: str = Depends(get_token),
+    session_id: str = Depends(validate_session_id),
+    sessions: VerificationSessionStore = Depends(get_session_store),
+    form_collection: Collection = Depends(get_form_collection),
+    ):
+    """
+    Return a form's RAG summary and processing status.
+
+    Only the `summary` field of the form document is read.
+
+    Args:
+        token (str): The authorization token for the request.
+        session_id (str): The validated form ID.
+        sessions (VerificationSessionStore): Store for verification sessions.
+        form_collection (Collection): MongoDB collection holding the forms.
+
+    Returns:
+        SummaryResponse: The summary and its status.
+    """
+    logger.info("Starting get_summary")
+    try:
+        auth_token = json.loads(token)
+        uuid.UUID(auth_token["id"])
+        check_session(sessions, auth_token)
+
+        document = form_collection.find_one({"id": session_id}, {"_id": 0, "summary": 1})
+        if document is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+
+        summary = document.get("summary") or {}
+        return SummaryResponse(
+            success=True,
+            form_id=session_id,
+            status=summary.get("status", SUMMARY_PENDING),
+            summary=summary.get("text"),
+            model=summary.get("model"),
+            prompt_version=summary.get("prompt_version"),
+            timings=summary.get("timings"),
+            updated_at=summary.get("updated_at"),
+            detail="Summary found.",
+        )
+    except ValueError:
+        logger.warning("Invalid DoctorID.")
+        return SummaryResponse(success=False, detail="Doctor ID is not a valid UUID.")
+    except HTTPException as e:
+        logger.warning("HTTPException in get_summary")
+        return SummaryResponse(success=False, detail=e.detail)
+    except Exception:
+        logger.exception("Error in get_summary")
+        return SummaryResponse(success=False, detail="Something went wrong. Try again later.")
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Format a Server-Sent Events message.
+
+    Args:
+        event (str): Event name.
+        data (dict): Payload, sent as JSON.
+
+    Returns:
+        str: The encoded event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/{session_id}/summary/stream")
+async def stream_summary(
+    token: str = Depends(get_token),
+    session_id: str = Depends(validate_session_id),
+    sessions: VerificationSessionStore = Depends(get_session_store),
+    broker: SummaryBroker = Depends(get_summary_broker),
+    ):
+    """
+    Stream a form's RAG summary as Server-Sent Events once it is ready.
+
+    The stream sends a single `summary` event and closes, or an `error`
+    event if the worker gave up on the report. While waiting it sends
+    keep-alive comments, and it gives up with a `timeout` event after
+    `SUMMARY_STREAM_TIMEOUT` seconds.
+
+    Args:
+        token (str): The authorization token for the request.
+        session_id (str): The validated form ID.
+        sessions (VerificationSessionStore): Store for verification sessions.
+        broker (SummaryBroker): Broker delivering completed summaries.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response.
+
+    Raises:
+        HTTPException: If the token is invalid or does not match.
+    """
+    logger.info("Starting stream_summary")
+    try:
+        auth_token = json.loads(token)
+        uuid.UUID(auth_token["id"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=401, detail="Doctor ID is not a valid UUID.") from exc
+    check_session(sessions, auth_token)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SUMMARY_STREAM_TIMEOUT
+        try:
+            async with broker.subscribe(session_id) as summary:
+                while not summary.done():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        yield sse_event("timeout", {"form_id": session_id})
+                        return
+                    await asyncio.wait({summary}, timeout=min(SUMMARY_KEEPALIVE_INTERVAL, remaining))
+                    if not summary.done():
+                        yield ": keep-alive\n\n"
+                payload = summary.result()
+                yield sse_event("error" if payload.get("status") == SUMMARY_FAILED else "summary", payload)
+        except (RedisError, TimeoutError):
+            logger.warning("Summary stream unavailable")
+            yield sse_event("error", {"detail": "Summary stream unavailable."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,116 @@
+"""
+Delivery of completed RAG summaries to clients waiting on them.
+
+Each API process keeps one Redis pub/sub connection, pattern-subscribed to
+every form's summary channel, and fans messages out to in-process waiters
+keyed by form ID. An idle subscriber therefore costs one future and its open
+HTTP connection, not a Redis connection. Summaries published before a client
+subscribed are read from the stored summary key instead.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from common.summary_events import SUMMARY_CHANNEL_PATTERN, form_id_from_channel, summary_key
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SUBSCRIBE_TIMEOUT = float(os.getenv("SUMMARY_SUBSCRIBE_TIMEOUT", "5"))
+
+class SummaryBroker:
+    """
+    Fans summary notifications from Redis out to waiting requests.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis):
+        """
+        Initialize the broker.
+
+        Args:
+            redis_client (aioredis.Redis): Async Redis client with response
+                decoding enabled.
+        """
+        self.redis = redis_client
+        self.waiters: dict[str, set[asyncio.Future]] = {}
+        self._listener: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    @asynccontextmanager
+    async def subscribe(self, form_id: str) -> AsyncIterator[asyncio.Future]:
+        """
+        Wait for a form's summary.
+
+        Args:
+            form_id (str): ID of the form.
+
+        Yields:
+            asyncio.Future: Resolved with the summary payload when it is ready.
+
+        Raises:
+            TimeoutError: If the Redis subscription could not be established.
+            RedisError: If the stored summary could not be read.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(form_id, set()).add(future)
+        try:
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+            # Subscribe before reading the stored summary, so one published
+            # in between is not missed.
+            await asyncio.wait_for(self._subscribed.wait(), SUMMARY_SUBSCRIBE_TIMEOUT)
+            stored = await self.redis.get(summary_key(form_id))
+            if stored and not future.done():
+                future.set_result(json.loads(stored))
+            yield future
+        finally:
+            waiters = self.waiters.get(form_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self.waiters[form_id]
+
+    def _deliver(self, form_id: str, payload: dict):
+        """Resolve every waiter for a form."""
+        for future in self.waiters.get(form_id, ()):
+            if not future.done():
+                future.set_result(payload)
+
+    async def _recheck(self):
+        """Deliver summaries stored while the subscription was down."""
+        form_ids = list(self.waiters)
+        if not form_ids:
+            return
+        values = await self.redis.mget([summary_key(form_id) for form_id in form_ids])
+        for form_id, value in zip(form_ids, values):
+            if value:
+                self._deliver(form_id, json.loads(value))
+
+    async def _listen(self):
+        """Receive summary notifications until cancelled, resubscribing on errors."""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(SUMMARY_CHANNEL_PATTERN)
+                    self._subscribed.set()
+                    await self._recheck()
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            self._deliver(
+                                form_id_from_channel(message["channel"]),
+                                json.loads(message["data"]),
+                            )
+            except RedisError:
+                logger.warning("Summary subscription disconnected")
+            self._subscribed.clear()
+            await asyncio.sleep(1)
+
+summary_broker = SummaryBroker(
+    aioredis.Redis(host=os.getenv("REDIS_HOST", "redis"), port=6379, decode_responses=True)
+)
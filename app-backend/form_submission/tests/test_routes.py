@@ -4,7 +4,11 @@ import json
 import io
 
 from unittest.mock import MagicMock, patch
+
+import fakeredis
 from fastapi.testclient import TestClient
+
+from common.verification_session import VerificationSessionStore
 from main import app
 from routes import get_redis, get_form_collection
 
@@ -36,6 +40,26 @@ DATA = {
         "position": "{\"lat\":27.673798957817645,\"lng\":85.34505844116211}"
     }
 
+DRAFT = "{\"__id\": \"d0530636-c565-4770-ac3f-79c9cfe019b3\", \"ageIdentity\": \"36-45\", \"accompIdent\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusDisease\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusCondition\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusSymptom\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"province\": \"Bagmati Province\", \"district\": \"Kathmandu\", \"position\": \"null\", \"files\": []}"
+
+def session_redis(draft: str | None = DRAFT):
+    """
+    Build an in-memory Redis holding a verified session for DOCTOR_ID and,
+    optionally, a form draft for SESSION.
+
+    Args:
+        draft (str | None): Serialized draft to store, if any.
+
+    Returns:
+        fakeredis.FakeRedis: The seeded Redis client.
+    """
+    client = fakeredis.FakeRedis(decode_responses=True)
+    store = VerificationSessionStore(client)
+    store.start(DOCTOR_ID, 3)
+    if draft is not None:
+        store.save_draft(SESSION, draft)
+    return client
+
 FILE_CONTENT = b"dummy file content"
 FILES = [
     ("files", ("example.txt", io.BytesIO(FILE_CONTENT), "text/plain"))
@@ -48,13 +72,8 @@ def test_user_form_submission():
     Verifies successful submission when Redis returns a matching token step.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.set.return_value = True
-    mock_redis.get.return_value = "3"  # simulate fetched from Redis
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -80,11 +99,8 @@ def test_missing_headers():
     Test that the form submission endpoint returns 401 when authorization headers are missing.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    mock_redis.set.return_value = True
-    mock_redis.get.return_value = "3"  # simulate fetched from Redis
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -148,11 +164,8 @@ def test_invalid_token():
     headers = {
         "authorization": json.dumps(token)
     }
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    mock_redis.set.return_value = True
-    mock_redis.get.return_value = "3"  # simulate fetched from Redis
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -173,32 +186,6 @@ def test_invalid_token():
     app.dependency_overrides = {}
 
 # routes("/session=${}, GET)
-def redis_get_side_effect(key):
-    """
-    Side effect function to mock Redis `get` behavior based on key input.
-
-    This function simulates Redis responses for specific keys during unit testing.
-    It is used as a side effect for mocking the `redis.get` method.
-
-    Parameters:
-    ----------
-    key : str
-        The Redis key being queried.
-
-    Returns:
-    -------
-    str or None
-        - If the key is DOCTOR_ID, returns the string "3" (indicating step number).
-        - If the key is SESSION, returns a serialized JSON string representing session data.
-        - Otherwise, returns None.
-    """
-
-    if key == DOCTOR_ID:  # key for token step check
-        return "3"  # or whatever step string you expect
-    if key == SESSION:  # key for session data retrieval
-        return "{\"__id\": \"d0530636-c565-4770-ac3f-79c9cfe019b3\", \"ageIdentity\": \"36-45\", \"accompIdent\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusDisease\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusCondition\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"statusSymptom\": \"Lorem Ipsum is simply dummy text of the printing and typesetting industry. Lorem Ipsum has been the industry's standard dummy text ever since the 1500s, when an unknown printer took a galley of type and scrambled it to make a type specimen book. It has survived not only five centuries, but also the leap into electronic typesetting, remaining essentially unchanged. It was popularised in the 1960s with the release of Letraset sheets containing Lorem Ipsum passages, and more recently with desktop publishing software like Aldus PageMaker including versions of Lorem Ipsum.\", \"province\": \"Bagmati Province\", \"district\": \"Kathmandu\", \"position\": \"null\", \"files\": []}"
-    return None
-
 def test_get_user_form():
     """
     Test the GET /<SESSION> endpoint to ensure correct response and Redis interaction.
@@ -208,13 +195,8 @@ def test_get_user_form():
     the `get_redis` dependency to inject the mock and uses the TestClient to simulate 
     an HTTP GET request to the endpoint.
     """
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -241,17 +223,12 @@ def test_check_valid_session():
 
     This test simulates an invalid session scenario by mocking the Redis client and 
     overriding the FastAPI dependency. The mocked Redis client's `get` method uses 
-    `redis_get_side_effect` to simulate specific Redis responses. The goal is to ensure 
+    an in-memory Redis holding a verified session and draft. The goal is to ensure 
     the endpoint returns a 400 status code and a specific error message for invalid UUIDs.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -277,13 +254,8 @@ def test_check_empty_token():
     inject the mock client.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -309,13 +281,8 @@ def test_check_valid_token():
     client is mocked to simulate backend behavior without needing a real Redis instance.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -355,18 +322,8 @@ def test_session_not_found():
     and `None` for all other keys (especially the session key).
     """
 
-    def wrong_redis_key(key):
-        if key == DOCTOR_ID:
-            return "3"
-        return None
-
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
-
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = wrong_redis_key
-    mock_redis.set.return_value = True
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis(draft=None)
 
     # Override the FastAPI dependency
     app.dependency_overrides[get_redis] = lambda: mock_redis
@@ -396,15 +353,10 @@ def test_duplicate_entry(mock_get_form_collection):
         mock_get_form_collection (MagicMock): Mocked MongoDB collection provider.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
     mock_mongo = MagicMock()
 
-    # Let's say your FastAPI app calls something like `redis.set("key", value)`
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
-
     mock_mongo.find_one.return_value = {"_id": SESSION}
     mock_get_form_collection.return_value = mock_mongo
 
@@ -436,14 +388,10 @@ def test_save_user_form(mock_get_form_collection):
     returns a success response when valid data is provided.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
     mock_mongo = MagicMock()
 
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
-
     # Mock MongoDB behavior
     mock_mongo.find_one.return_value = False
 
@@ -485,14 +433,10 @@ def test_post_valid_session(mock_get_form_collection):
     - A valid UUID session not found in DB returns a 200 response with failure message.
     """
 
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
     mock_mongo = MagicMock()
 
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
-
     # Mock MongoDB behavior
     mock_mongo.find_one.return_value = False
 
@@ -539,14 +483,10 @@ def test_post_token(mock_get_form_collection):
     - A request without an Authorization header should return 401.
     - A request with an Authorization header but mismatched token should return 200 with failure.
     """
-    # Mock the Redis client methods here
-    mock_redis = MagicMock()
+    # In-memory Redis with a verified session and a form draft
+    mock_redis = session_redis()
     mock_mongo = MagicMock()
 
-    # We can mock the `set` and `get` method of the redis client
-    mock_redis.get.side_effect = redis_get_side_effect
-    mock_redis.set.return_value = True
-
     # Mock MongoDB behavior
     mock_mongo.find_one.return_value = False
 
@@ -0,0 +1,37 @@
+"""Test suite for publishing RAG tasks to RabbitMQ."""
+
+import time
+
+import pika
+
+from helper.send_rag import RabbitMQProducer, form_data
+
+FORM_ID = "d0530636-c565-4770-ac3f-79c9cfe019b3"
+
+
+class EncodingChannel:
+    """Channel stand-in that encodes the properties like pika does on the wire."""
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, b"".join(properties.encode())))
+
+
+def test_published_properties_encode():
+    """The task's properties, including its publish time, can be sent over AMQP."""
+    producer = object.__new__(RabbitMQProducer)
+    producer.channel = EncodingChannel()
+    producer.queue_name = "rag_tasks"
+
+    before = int(time.time() * 1000)
+    producer.publish(form_data, message_id=FORM_ID)
+
+    (routing_key, encoded), = producer.channel.published
+    properties = pika.BasicProperties()
+    properties.decode(encoded)
+    assert routing_key == "rag_tasks"
+    assert properties.message_id == FORM_ID
+    assert properties.delivery_mode == 2
+    assert before <= properties.headers["x-published-at-ms"] <= int(time.time() * 1000)
@@ -0,0 +1,124 @@
+"""Test suite for summary delivery over Redis pub/sub and Server-Sent Events."""
+
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from common.summary_events import SUMMARY_FAILED, summary_channel, summary_key
+from common.verification_session import VerificationSessionStore
+from main import app
+from routes import get_form_collection, get_redis, get_summary_broker
+from summaries import SummaryBroker
+
+DOCTOR_ID = "dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e"
+FORM_ID = "d0530636-c565-4770-ac3f-79c9cfe019b3"
+HEADERS = {"authorization": json.dumps({"id": DOCTOR_ID, "step": 3})}
+PAYLOAD = {"form_id": FORM_ID, "status": "done", "summary": "Likely dengue."}
+
+
+@pytest.mark.asyncio
+async def test_published_summary_reaches_every_waiter():
+    """All subscribers for a form are woken by one published summary."""
+    server = fakeredis.FakeServer()
+    broker = SummaryBroker(fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    publisher = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    async with broker.subscribe(FORM_ID) as first, broker.subscribe(FORM_ID) as second:
+        assert not first.done()
+        await publisher.publish(summary_channel(FORM_ID), json.dumps(PAYLOAD))
+        assert await asyncio.wait_for(first, 1) == PAYLOAD
+        assert await asyncio.wait_for(second, 1) == PAYLOAD
+    assert broker.waiters == {}
+    broker._listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_stored_summary_is_delivered_immediately():
+    """A client subscribing after the summary was published still receives it."""
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    await client.set(summary_key(FORM_ID), json.dumps(PAYLOAD))
+    broker = SummaryBroker(client)
+
+    async with broker.subscribe(FORM_ID) as summary:
+        assert summary.done() and summary.result() == PAYLOAD
+    broker._listener.cancel()
+
+
+def test_stream_summary():
+    """The SSE endpoint sends the summary event for a verified doctor."""
+    server = fakeredis.FakeServer()
+    sync_redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    VerificationSessionStore(sync_redis).start(DOCTOR_ID, 3)
+    sync_redis.set(summary_key(FORM_ID), json.dumps(PAYLOAD))
+
+    broker = SummaryBroker(fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    app.dependency_overrides[get_redis] = lambda: sync_redis
+    app.dependency_overrides[get_summary_broker] = lambda: broker
+
+    with TestClient(app) as client:
+        response = client.get(f"/{FORM_ID}/summary/stream", headers=HEADERS)
+        unverified = client.get(
+            f"/{FORM_ID}/summary/stream",
+            headers={"authorization": json.dumps({"id": DOCTOR_ID, "step": 2})},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == f"event: summary\ndata: {json.dumps(PAYLOAD)}\n\n"
+    assert unverified.status_code == 401
+    app.dependency_overrides = {}
+
+
+def test_stream_failed_summary():
+    """A dead-lettered report ends the stream with an error event."""
+    server = fakeredis.FakeServer()
+    sync_redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    VerificationSessionStore(sync_redis).start(DOCTOR_ID, 3)
+    failed = {"form_id": FORM_ID, "status": SUMMARY_FAILED,
+              "detail": "The summary could not be generated."}
+    sync_redis.set(summary_key(FORM_ID), json.dumps(failed))
+
+    broker = SummaryBroker(fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    app.dependency_overrides[get_redis] = lambda: sync_redis
+    app.dependency_overrides[get_summary_broker] = lambda: broker
+
+    with TestClient(app) as client:
+        response = client.get(f"/{FORM_ID}/summary/stream", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.text == f"event: error\ndata: {json.dumps(failed)}\n\n"
+    app.dependency_overrides = {}
+
+
+def test_get_summary_reads_projection():
+    """The summary endpoint returns the stored summary, reading only that field."""
+    sync_redis = fakeredis.FakeRedis(decode_responses=True)
+    VerificationSessionStore(sync_redis).start(DOCTOR_ID, 3)
+    mock_mongo = MagicMock()
+    mock_mongo.find_one.side_effect = lambda query, projection: {
+        "summary": {
+            "status": "done",
+            "text": "Likely dengue.",
+            "model": "ai/smollm2",
+            "prompt_version": "0123456789ab",
+            "timings": {"llm": 1.5},
+        },
+    } if query == {"id": FORM_ID} else None
+    app.dependency_overrides[get_redis] = lambda: sync_redis
+    app.dependency_overrides[get_form_collection] = lambda: mock_mongo
+
+    client = TestClient(app)
+    response = client.get(f"/{FORM_ID}/summary", headers=HEADERS).json()
+    missing = client.get(f"/{DOCTOR_ID}/summary", headers=HEADERS).json()
+
+    assert response["success"] is True
+    assert response["status"] == "done"
+    assert response["summary"] == "Likely dengue."
+    assert response["timings"] == {"llm": 1.5}
+    assert mock_mongo.find_one.call_args_list[0].args[1] == {"_id": 0, "summary": 1}
+    assert missing == {**missing, "success": False, "detail": "Form not found"}
+    app.dependency_overrides = {}
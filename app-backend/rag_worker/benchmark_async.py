@@ -0,0 +1,148 @@
+"""
+Throughput benchmark for the asyncio consumer against a slow LLM.
+
+Starts a stub OpenAI-compatible chat server that answers after a fixed
+delay, then summarizes the same reports with the blocking pipeline (one
+message at a time, as with prefetch 1) and with `asummarize` at several
+concurrency levels, printing messages per second for each as JSON lines.
+RabbitMQ is left out; the consumer only adds an ack per message.
+
+The summary cache and the case index are disabled so every message reaches
+the LLM.
+
+Usage:
+    python benchmark_async.py --messages 64 --latency-ms 500 --concurrency 1 4 16 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["SUMMARY_CACHE_ENABLED"] = "false"
+os.environ["CASE_INDEX_ENABLED"] = "false"
+
+from aiohttp import web
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_openai import ChatOpenAI
+
+from rag import asummarize, form_data, summarize_batch
+from resources import resources
+
+def start_stub_llm(latency: float) -> str:
+    """
+    Serve a chat completions endpoint that replies after `latency` seconds.
+
+    Args:
+        latency (float): Delay before each response, in seconds.
+
+    Returns:
+        str: Base URL of the stub.
+    """
+    async def completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        return web.json_response({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Likely dengue; check platelets."},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, name="stub-llm", daemon=True).start()
+    return f"http://127.0.0.1:{port}/v1"
+
+def measure_blocking(forms: list[dict], llm) -> float:
+    """Messages per second summarizing one form at a time."""
+    start = time.perf_counter()
+    for form in forms:
+        summarize_batch([form], llm)
+    return len(forms) / (time.perf_counter() - start)
+
+async def measure_async(forms: list[dict], llm, concurrency: int, threads: int) -> float:
+    """
+    Messages per second with up to `concurrency` summaries in flight.
+
+    Args:
+        forms (list[dict]): Forms to summarize.
+        llm: Language model client.
+        concurrency (int): Concurrent LLM requests, with twice as many
+            messages prefetched, as a consumer would be configured.
+        threads (int): Executor threads for embedding.
+
+    Returns:
+        float: Messages per second.
+    """
+    executor = ThreadPoolExecutor(max_workers=threads)
+    llm_slots = asyncio.Semaphore(concurrency)
+    prefetch = asyncio.Semaphore(2 * concurrency)
+
+    async def handle(form: dict):
+        async with prefetch:
+            await asummarize(form, llm, executor, llm_slots)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(form) for form in forms))
+    seconds = time.perf_counter() - start
+    executor.shutdown()
+    return len(forms) / seconds
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use random embeddings to check the harness without the model")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        resources._embeddings = FakeEmbeddings(size=384)
+    llm = ChatOpenAI(base_url=start_stub_llm(args.latency_ms / 1000), model="stub",
+                     api_key="not-needed", max_retries=0)
+    forms = [
+        {**form_data, "id": f"bench-{index}", "district": f"{form_data['district']} {index}"}
+        for index in range(args.messages)
+    ]
+    # Warm up the embedding model and the HTTP client
+    measure_blocking(forms[:1], llm)
+    print(json.dumps({
+        "consumer": "blocking",
+        "latency_ms": args.latency_ms,
+        "messages_per_second": round(measure_blocking(forms, llm), 2),
+    }))
+
+    # One event loop for every run: the async HTTP client is bound to it
+    async def run_async():
+        await measure_async(forms[:1], llm, 1, args.threads)
+        for concurrency in args.concurrency:
+            rate = await measure_async(forms, llm, concurrency, args.threads)
+            print(json.dumps({
+                "consumer": "async",
+                "concurrency": concurrency,
+                "latency_ms": args.latency_ms,
+                "messages_per_second": round(rate, 2),
+            }))
+    asyncio.run(run_async())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Throughput benchmark for micro-batched embedding.
+
+Splits and embeds a set of patient reports the way the worker does, once per
+batch size, and prints messages per second for each. The LLM call is left
+out since batching doesn't change it.
+
+Usage:
+    python benchmark_batching.py --messages 64 --batch-sizes 1 4 8 16 32
+"""
+
+import argparse
+import json
+import time
+
+from langchain_core.embeddings import FakeEmbeddings
+
+from rag import build_vectorstores, form_data, format_patient_template, prepare_documents
+from resources import resources
+
+def make_reports(count: int) -> list[str]:
+    """Build `count` distinct reports from the sample form data."""
+    return [
+        format_patient_template({**form_data, "district": f"{form_data['district']} {index}"})
+        for index in range(count)
+    ]
+
+def measure(reports: list[str], batch_size: int, embedding) -> float:
+    """
+    Embed the reports `batch_size` at a time.
+
+    Args:
+        reports (list[str]): Formatted patient reports.
+        batch_size (int): Messages embedded together.
+        embedding: Embedding model to use.
+
+    Returns:
+        float: Messages processed per second.
+    """
+    start = time.perf_counter()
+    for offset in range(0, len(reports), batch_size):
+        batch = reports[offset:offset + batch_size]
+        build_vectorstores([prepare_documents(report) for report in batch], embedding)
+    return len(reports) / (time.perf_counter() - start)
+
+def main():
+    """Run the benchmark and print one JSON line per batch size."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use random embeddings to check the harness without the model")
+    args = parser.parse_args()
+
+    embedding = FakeEmbeddings(size=384) if args.fake_embeddings else resources.embeddings
+    reports = make_reports(args.messages)
+    # Warm up so the first batch size doesn't pay for model initialization
+    measure(reports[:1], 1, embedding)
+
+    for batch_size in args.batch_sizes:
+        print(json.dumps({
+            "batch_size": batch_size,
+            "messages": args.messages,
+            "messages_per_second": round(measure(reports, batch_size, embedding), 2),
+        }))
+
+if __name__ == "__main__":
+    main()
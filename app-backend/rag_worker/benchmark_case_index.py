@@ -0,0 +1,115 @@
+"""
+Memory and latency benchmark for the similar-case index.
+
+Appends synthetic unit vectors to one shard, compacts them into a base and
+reports, as JSON lines: append and build throughput, file sizes, resident
+memory after memory-mapping versus fully loading the base, and search
+latency percentiles for each nprobe.
+
+Usage:
+    python benchmark_case_index.py --vectors 1000000 --nprobe 8 16 64
+    python benchmark_case_index.py --vectors 1000000 --ivf-min 0   # force IVF
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from case_index import CASE_INDEX_IVF_MIN, Shard, normalized
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB (Linux)."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def synthetic(rng: np.random.Generator, count: int, dim: int, clusters: np.ndarray) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres, like embeddings of similar reports."""
+    centres = clusters[rng.integers(len(clusters), size=count)]
+    return normalized(centres + 1.5 * rng.standard_normal((count, dim), dtype="float32"))
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p99 of latencies in milliseconds."""
+    values = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3)}
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 64])
+    parser.add_argument("--ivf-min", type=int, default=CASE_INDEX_IVF_MIN)
+    parser.add_argument("--path", help="index directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="case-index-bench-")
+    rng = np.random.default_rng(0)
+    clusters = rng.standard_normal((1000, args.dim), dtype="float32")
+    shard = Shard(os.path.join(path, "bench"), args.dim)
+
+    start = time.perf_counter()
+    for offset in range(0, args.vectors, 100_000):
+        count = min(100_000, args.vectors - offset)
+        shard.append(np.arange(offset, offset + count, dtype="int64"),
+                     synthetic(rng, count, args.dim, clusters))
+    append_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shard.compact(force=True, ivf_min=args.ivf_min)
+    build_seconds = time.perf_counter() - start
+    manifest = shard.read_manifest()
+    print(json.dumps({
+        "vectors": args.vectors,
+        "dim": args.dim,
+        "append_vectors_per_second": round(args.vectors / append_seconds),
+        "build_seconds": round(build_seconds, 2),
+        "base_mb": round(os.path.getsize(shard.file(manifest["base"])) / 2**20, 1),
+        "vectors_mb": round(os.path.getsize(shard.file(manifest["vectors"])) / 2**20, 1),
+    }))
+
+    queries = synthetic(rng, args.queries, args.dim, clusters)
+    exact = faiss.IndexFlatIP(args.dim)
+    records = np.memmap(shard.file(manifest["vectors"]), dtype=shard.dtype, mode="r")
+    for offset in range(0, len(records), 100_000):
+        exact.add(np.ascontiguousarray(records["vector"][offset:offset + 100_000]))
+    _, truth = exact.search(queries, args.k)
+    del exact, records
+
+    before = rss_mb()
+    mapped = Shard(shard.path, args.dim)
+    mapped.refresh()
+    opened = rss_mb()
+
+    for nprobe in args.nprobe:
+        latencies, found = [], 0
+        for row, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = mapped.search(query[None, :], args.k, nprobe)
+            latencies.append(time.perf_counter() - start)
+            found += len(np.intersect1d(ids[0], truth[row]))
+        print(json.dumps({
+            "index": type(faiss.downcast_index(mapped.base.index)).__name__,
+            "nprobe": nprobe,
+            f"recall_at_{args.k}": round(found / (args.k * args.queries), 4),
+            **percentiles(latencies),
+            "rss_after_mmap_mb": round(opened - before, 1),
+            "rss_after_search_mb": round(rss_mb() - before, 1),
+        }))
+
+    before = rss_mb()
+    loaded = faiss.read_index(shard.file(manifest["base"]))
+    print(json.dumps({"rss_full_load_mb": round(rss_mb() - before, 1), "ntotal": loaded.ntotal}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Recall and latency benchmark for filtered similar-case search.
+
+Indexes synthetic reports spread over provinces, districts and the last year,
+then for each filter (none, province, district, date range) and nprobe
+reports, as JSON lines, recall@k against an exact filtered brute-force search
+and p50/p99 latency of `CaseIndex.search`.
+
+Usage:
+    python benchmark_case_search.py --cases 200000 --nprobe 4 16 64
+    python benchmark_case_search.py --cases 200000 --ivf-min 0   # force IVF
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_case_index import percentiles, synthetic
+from case_index import CASE_INDEX_IVF_MIN, CaseIndex
+
+PROVINCES = 7
+DISTRICTS_PER_PROVINCE = 11
+DAY = 24 * 3600
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--ivf-min", type=int, default=CASE_INDEX_IVF_MIN)
+    parser.add_argument("--path", help="index directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clusters = rng.standard_normal((1000, args.dim), dtype="float32")
+    now = time.time()
+    province = rng.integers(PROVINCES, size=args.cases)
+    district = province * DISTRICTS_PER_PROVINCE + rng.integers(DISTRICTS_PER_PROVINCE, size=args.cases)
+    created_at = now - rng.uniform(0, 365 * DAY, size=args.cases)
+    vectors = synthetic(rng, args.cases, args.dim, clusters)
+
+    index = CaseIndex(args.path or tempfile.mkdtemp(prefix="case-search-bench-"),
+                      compact_threshold=args.cases + 1)
+    start = time.perf_counter()
+    for offset in range(0, args.cases, 10_000):
+        rows = range(offset, min(offset + 10_000, args.cases))
+        index.add([{"form_id": f"form-{row}", "province": f"province-{province[row]}",
+                    "district": f"district-{district[row]}", "created_at": created_at[row]}
+                   for row in rows], vectors[offset:offset + len(rows)])
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in index.shard_names():
+        index.shard(name).compact(force=True, ivf_min=args.ivf_min)
+    print(json.dumps({
+        "cases": args.cases,
+        "dim": args.dim,
+        "shards": len(index.shard_names()),
+        "index_cases_per_second": round(args.cases / index_seconds),
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }))
+
+    # Province and district filters follow a random case per query so every filter has matches
+    filters = {
+        "none": lambda row: {},
+        "province": lambda row: {"provinces": [f"province-{province[row]}"]},
+        "district": lambda row: {"provinces": [f"province-{province[row]}"],
+                                 "districts": [f"district-{district[row]}"]},
+        "last_30_days": lambda row: {"since": now - 30 * DAY},
+    }
+    masks = {
+        "none": lambda row: np.ones(args.cases, dtype=bool),
+        "province": lambda row: province == province[row],
+        "district": lambda row: district == district[row],
+        "last_30_days": lambda row: created_at >= now - 30 * DAY,
+    }
+    queries = synthetic(rng, args.queries, args.dim, clusters)
+    anchors = rng.integers(args.cases, size=args.queries)
+
+    truths = {}
+    for name, mask in masks.items():
+        truths[name] = []
+        for query, row in zip(queries, anchors):
+            allowed = np.flatnonzero(mask(row))
+            scores = vectors[allowed] @ query
+            best = allowed[np.argsort(-scores)[:args.k]]
+            truths[name].append({f"form-{case}" for case in best})
+
+    for name, make_filter in filters.items():
+        for nprobe in args.nprobe:
+            latencies, found = [], 0
+            for query, row, truth in zip(queries, anchors, truths[name]):
+                start = time.perf_counter()
+                results = index.search(query, args.k, nprobe=nprobe, **make_filter(row))
+                latencies.append(time.perf_counter() - start)
+                found += len(truth & {case["form_id"] for case in results})
+            print(json.dumps({
+                "filter": name,
+                "nprobe": nprobe,
+                f"recall_at_{args.k}": round(found / (args.k * args.queries), 4),
+                **percentiles(latencies),
+            }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark of the chunk embedding cache.
+
+Builds reports whose fields are drawn from pools of common sentences, the way
+doctors reuse phrasing, splits them the way the worker does and embeds each
+message's chunks with and without the cache. Prints one JSON line with the
+chunk hit rate and the per-message embedding time of both runs, and the time
+the cache estimates it saved.
+
+Usage:
+    python benchmark_embedding_cache.py --messages 500 --pool 40
+    python benchmark_embedding_cache.py --fake-embeddings   # check the harness without the model
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from langchain_core.embeddings import FakeEmbeddings
+
+from benchmark_case_index import percentiles
+from embedding_cache import CachedEmbeddings, record_stats
+from embeddings import EMBEDDING_BACKEND, make_embeddings
+from rag import form_data, format_patient_template, prepare_documents
+from resources import EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL
+
+AGE_GROUPS = ["0-17", "18-35", "36-45", "46-60", "60+"]
+PROVINCES = ["Koshi", "Madhesh", "Bagmati", "Gandaki", "Lumbini", "Karnali", "Sudurpashchim"]
+DISTRICTS = ["Kathmandu", "Lalitpur", "Morang", "Kaski", "Rupandehi", "Surkhet"]
+TEXT_FIELDS = ("disease_symptoms", "current_condition", "disease_status")
+
+def sentence_pools(size: int) -> dict[str, list[str]]:
+    """
+    Pools of `size` sentences per text field, from the sample form.
+
+    Sentences are reused with a numbered variant once the sample runs out.
+    """
+    pools = {}
+    for field in TEXT_FIELDS:
+        sentences = [part.strip().rstrip(".") for part in form_data[field].split(". ") if part.strip()]
+        pools[field] = []
+        for index in range(size):
+            variant, position = divmod(index, len(sentences))
+            suffix = f" (variant {variant})" if variant else ""
+            pools[field].append(f"{sentences[position]}{suffix}.")
+    return pools
+
+def make_reports(count: int, pool_size: int, rng: random.Random) -> list[str]:
+    """Build `count` reports from the sentence pools."""
+    pools = sentence_pools(pool_size)
+    reports = []
+    for _ in range(count):
+        form = {
+            "age_group": rng.choice(AGE_GROUPS),
+            "province": rng.choice(PROVINCES),
+            "district": rng.choice(DISTRICTS),
+        }
+        for field in TEXT_FIELDS:
+            form[field] = " ".join(rng.sample(pools[field], k=min(6, pool_size)))
+        reports.append(format_patient_template(form))
+    return reports
+
+def embed_messages(chunk_lists: list[list[str]], embedding, timings: dict | None = None) -> list[float]:
+    """Embed each message's chunks in turn, returning seconds per message."""
+    seconds = []
+    for texts in chunk_lists:
+        start = time.perf_counter()
+        with record_stats(timings):
+            embedding.embed_documents(texts)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def main():
+    """Run the benchmark and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool", type=int, default=40, help="sentences per field to draw from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use random embeddings to check the harness without the model")
+    args = parser.parse_args()
+
+    model = FakeEmbeddings(size=384) if args.fake_embeddings else make_embeddings(
+        EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
+    )
+    reports = make_reports(args.messages, args.pool, random.Random(args.seed))
+    chunk_lists = [[document.page_content for document in prepare_documents(report)] for report in reports]
+    # Warm up so neither run pays for model initialization
+    model.embed_documents(chunk_lists[0])
+
+    uncached = embed_messages(chunk_lists, model)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CachedEmbeddings(model, f"{EMBEDDING_BACKEND}:{EMBEDDING_MODEL}", directory)
+        timings = {}
+        cached = embed_messages(chunk_lists, cache, timings)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "chunks": cache.hits + cache.misses,
+        "hit_rate": round(cache.hits / max(1, cache.hits + cache.misses), 4),
+        "uncached_ms": percentiles(uncached),
+        "cached_ms": percentiles(cached),
+        "measured_saved_ms_per_message": round((sum(uncached) - sum(cached)) / args.messages * 1000, 3),
+        "estimated_saved_ms_per_message": round(timings.get("embed_saved", 0.0) / args.messages * 1000, 3),
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of the torch and ONNX int8 embedding backends.
+
+Each backend runs in a fresh interpreter so startup and memory aren't shared.
+For each one it prints, as a JSON line: model load time, first-call latency,
+resident and peak memory, and chunks embedded per second over report chunks
+split the way the worker splits them.
+
+Usage:
+    python benchmark_embeddings.py --reports 256 --backends torch onnx
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+def memory_mb() -> dict:
+    """Resident and peak resident memory of this process in MB (Linux)."""
+    values = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                values[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return values
+
+def run_backend(backend: str, reports: int, batch_size: int) -> dict:
+    """
+    Load a backend in this process and embed the sample chunks.
+
+    Args:
+        backend (str): `torch` or `onnx`.
+        reports (int): Number of sample reports to split and embed.
+        batch_size (int): Texts per forward pass.
+
+    Returns:
+        dict: Measurements for the backend.
+    """
+    from benchmark_batching import make_reports
+    from embeddings import make_embeddings
+    from rag import prepare_documents
+    from resources import EMBEDDING_MODEL
+
+    texts = [doc.page_content for report in make_reports(reports) for doc in prepare_documents(report)]
+    before = memory_mb()
+
+    start = time.perf_counter()
+    embedding = make_embeddings(backend, EMBEDDING_MODEL, batch_size)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    embedding.embed_query("Patient Diagnosis Report")
+    first_call_seconds = time.perf_counter() - start
+    loaded = memory_mb()
+
+    start = time.perf_counter()
+    embedding.embed_documents(texts)
+    seconds = time.perf_counter() - start
+    after = memory_mb()
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "first_call_seconds": round(first_call_seconds, 3),
+        "rss_model_mb": round(loaded["VmRSS"] - before["VmRSS"], 1),
+        "peak_rss_mb": round(after["VmHWM"], 1),
+        "chunks": len(texts),
+        "chunks_per_second": round(len(texts) / seconds, 1),
+    }
+
+def main():
+    """Run every backend in a subprocess and print its results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reports", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.reports, args.batch_size)))
+        return
+
+    for backend in args.backends:
+        start = time.perf_counter()
+        child = subprocess.run(
+            [sys.executable, __file__, "--child", backend,
+             "--reports", str(args.reports), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True,
+        )
+        if child.returncode != 0:
+            print(json.dumps({"backend": backend, "error": child.stderr.strip().splitlines()[-1:]}))
+            continue
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        result["process_seconds"] = round(time.perf_counter() - start, 3)
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
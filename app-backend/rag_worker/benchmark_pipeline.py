@@ -0,0 +1,185 @@
+"""
+Per-stage latency benchmark of the RAG pipeline, runnable offline.
+
+Runs every report of a synthetic corpus through the stages of `rag.py` one
+at a time: `format_patient_template`, `prepare_documents`, `build_vectorstore`,
+`build_qa_chain` and the chain's invoke. Deterministic fake embeddings and a
+stub LLM stand in for MiniLM and the model runner, so no network is needed
+and results are comparable across commits. Reports vary in length from a few
+sentences per field to several times the sample form, so chunking and
+retrieval are exercised at different sizes.
+
+Prints one JSON document with the p50/p99 latency and throughput of each
+stage and of the whole pipeline, overall and per report length, and the
+commit it was run on. Given the output of an earlier run as `--baseline`, it
+also reports each stage's p50 relative to that run.
+
+Usage:
+    python benchmark_pipeline.py --reports 300 --sentences 2 8 32 --output bench.json
+    python benchmark_pipeline.py --baseline bench.json   # compare with an earlier commit
+    python benchmark_pipeline.py --llm-latency-ms 50   # make the stub LLM slow
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+
+os.environ["SUMMARY_CACHE_ENABLED"] = "false"
+os.environ["CASE_INDEX_ENABLED"] = "false"
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake import FakeListLLM
+
+from benchmark_case_index import percentiles
+from rag import (SUMMARY_QUESTION, build_qa_chain, build_vectorstore, form_data,
+                 format_patient_template, prepare_documents)
+
+STAGES = ("format", "split", "vectorstore", "chain", "invoke")
+TEXT_FIELDS = ("disease_symptoms", "current_condition", "disease_status")
+
+class StubLLM(FakeListLLM):
+    """Fake LLM that optionally waits before answering, like a model runner would."""
+
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+def make_forms(count: int, sentence_counts: list[int]) -> list[tuple[int, dict]]:
+    """
+    Build synthetic forms of varied length from the sample form's sentences.
+
+    Args:
+        count (int): Number of forms.
+        sentence_counts (list[int]): Sentences per text field, cycled over
+            the forms.
+
+    Returns:
+        list[tuple[int, dict]]: Each form with its sentences per field.
+    """
+    sentences = {
+        field: [part.strip() for part in form_data[field].split(". ") if part.strip()]
+        for field in TEXT_FIELDS
+    }
+    forms = []
+    for index in range(count):
+        length = sentence_counts[index % len(sentence_counts)]
+        form = {**form_data, "district": f"{form_data['district']} {index}"}
+        for field, pool in sentences.items():
+            # Numbered repeats keep long reports from being one sentence over and over
+            form[field] = ". ".join(
+                f"{pool[(index + position) % len(pool)]} ({position // len(pool)})"
+                for position in range(length)
+            ) + "."
+        forms.append((length, form))
+    return forms
+
+def run_report(form: dict, embedding, llm) -> dict[str, float]:
+    """
+    Summarize one report stage by stage.
+
+    Args:
+        form (dict): Patient form data.
+        embedding: Embedding model for the vector store.
+        llm: Language model for the chain.
+
+    Returns:
+        dict[str, float]: Seconds spent in each of `STAGES`.
+    """
+    seconds = {}
+    start = time.perf_counter()
+    report = format_patient_template(form)
+    seconds["format"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    documents = prepare_documents(report)
+    seconds["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorstore = build_vectorstore(documents, embedding)
+    seconds["vectorstore"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chain = build_qa_chain(llm, vectorstore.as_retriever(search_type="similarity", k=3))
+    seconds["chain"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chain.invoke({"query": SUMMARY_QUESTION})
+    seconds["invoke"] = time.perf_counter() - start
+    return seconds
+
+def summarize(samples: list[float]) -> dict:
+    """p50/p99 latency and the throughput they add up to."""
+    total = sum(samples)
+    return {**percentiles(samples), "per_second": round(len(samples) / total, 2) if total else None}
+
+def compare(result: dict, baseline: dict) -> dict:
+    """p50 of each stage and of the total as a ratio of the baseline's; above 1 is slower."""
+    ratios = {}
+    for name, current, previous in [
+        *((stage, result["stages"][stage], baseline["stages"].get(stage)) for stage in STAGES),
+        ("total", result["total"], baseline.get("total")),
+    ]:
+        if previous and previous["p50_ms"]:
+            ratios[name] = round(current["p50_ms"] / previous["p50_ms"], 3)
+    return {"commit": baseline.get("commit"), "p50_ratio": ratios}
+
+def current_commit() -> str | None:
+    """Short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """Run the benchmark and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reports", type=int, default=300)
+    parser.add_argument("--sentences", type=int, nargs="+", default=[2, 8, 32],
+                        help="sentences per text field, cycled over the reports")
+    parser.add_argument("--dim", type=int, default=384, help="fake embedding dimension")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="also write the JSON to this file")
+    parser.add_argument("--baseline", help="JSON output of an earlier run to compare with")
+    args = parser.parse_args()
+
+    embedding = DeterministicFakeEmbedding(size=args.dim)
+    llm = StubLLM(responses=["Likely dengue; check platelets daily."], latency=args.llm_latency_ms / 1000)
+    forms = make_forms(args.reports, args.sentences)
+    # Warm up imports and lazy initialization outside the measurements
+    run_report(forms[0][1], embedding, llm)
+
+    samples = {stage: [] for stage in STAGES}
+    totals, by_length = [], {}
+    for length, form in forms:
+        seconds = run_report(form, embedding, llm)
+        for stage in STAGES:
+            samples[stage].append(seconds[stage])
+        totals.append(sum(seconds.values()))
+        by_length.setdefault(length, []).append(totals[-1])
+
+    result = {
+        "commit": current_commit(),
+        "reports": args.reports,
+        "llm_latency_ms": args.llm_latency_ms,
+        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+        "total": summarize(totals),
+        "by_sentences": {str(length): summarize(values) for length, values in sorted(by_length.items())},
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            result["baseline"] = compare(result, json.load(baseline))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+RabbitMQ connection settings and the queues the RAG worker uses.
+
+- `rag_tasks`: summarization tasks published by form_submission.
+- `rag_tasks.retry.<delay>s`: one queue per backoff step. Messages sit there
+  for the queue's TTL and are then dead-lettered back to `rag_tasks`.
+- `rag_tasks.dead`: tasks that failed permanently or ran out of attempts,
+  kept until inspected or replayed with `dead_letters.py`.
+
+Retry queues are named after their delay, so changing the backoff settings
+declares new queues instead of clashing with the arguments of existing ones.
+"""
+
+import os
+
+import pika
+
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
+RABBITMQ_DEFAULT_USER = os.getenv("RABBITMQ_DEFAULT_USER")
+RABBITMQ_DEFAULT_PASS = os.getenv("RABBITMQ_DEFAULT_PASS")
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", "60"))
+RABBITMQ_BLOCKED_TIMEOUT = float(os.getenv("RABBITMQ_BLOCKED_TIMEOUT", "300"))
+
+# Attempts per task, including the first, before it is dead-lettered
+RAG_RETRY_MAX_ATTEMPTS = max(1, int(os.getenv("RAG_RETRY_MAX_ATTEMPTS", "5")))
+RAG_RETRY_BASE_DELAY = float(os.getenv("RAG_RETRY_BASE_DELAY", "5"))
+RAG_RETRY_MAX_DELAY = float(os.getenv("RAG_RETRY_MAX_DELAY", "300"))
+
+TASK_QUEUE = "rag_tasks"
+DEAD_LETTER_QUEUE = f"{TASK_QUEUE}.dead"
+
+def connection_parameters() -> pika.ConnectionParameters:
+    """Connection parameters for the RabbitMQ service."""
+    # Create credentials object
+    credentials = pika.PlainCredentials(RABBITMQ_DEFAULT_USER, RABBITMQ_DEFAULT_PASS)
+    return pika.ConnectionParameters(
+        host=RABBITMQ_HOST,
+        port=5672,
+        credentials=credentials,
+        heartbeat=RABBITMQ_HEARTBEAT,
+        blocked_connection_timeout=RABBITMQ_BLOCKED_TIMEOUT,
+    )
+
+def retry_delay(attempt: int) -> float:
+    """
+    Backoff before retrying a task that has failed `attempt` times.
+
+    Args:
+        attempt (int): Failed attempts so far, starting at 1.
+
+    Returns:
+        float: Delay in seconds, doubling per attempt up to RAG_RETRY_MAX_DELAY.
+    """
+    return min(RAG_RETRY_MAX_DELAY, RAG_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+
+def retry_queue(attempt: int) -> str:
+    """Name of the retry queue holding tasks that have failed `attempt` times."""
+    return f"{TASK_QUEUE}.retry.{retry_delay(attempt):g}s"
+
+def queue_declarations() -> list[tuple[str, dict | None]]:
+    """
+    Queues to declare before consuming, with their arguments.
+
+    Returns:
+        list[tuple[str, dict | None]]: Durable queue names and arguments.
+    """
+    # The task queue keeps no arguments so it matches the producer's declaration
+    declarations = [(TASK_QUEUE, None), (DEAD_LETTER_QUEUE, None)]
+    for attempt in range(1, RAG_RETRY_MAX_ATTEMPTS):
+        declarations.append((retry_queue(attempt), {
+            "x-message-ttl": int(retry_delay(attempt) * 1000),
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": TASK_QUEUE,
+        }))
+    # Several attempts can share a delay once it reaches RAG_RETRY_MAX_DELAY
+    return list(dict(declarations).items())
@@ -0,0 +1,600 @@
+"""
+Persistent FAISS index of past report embeddings, sharded by province.
+
+Every summarized report is embedded once and appended to the shard of its
+province, so summarization can pull in similar past cases. On disk a shard
+directory holds:
+
+- `manifest.json`: the current generation, base files and journals.
+- `base-<g>.faiss` / `vectors-<g>.bin`: the compacted index, memory-mapped
+  at worker start, and the raw vectors it was built from.
+- `journal-<g>.bin`: vectors appended since the last compaction.
+
+Appends only write to the journal, under a file lock, so any number of
+worker processes can add cases; each process replays new journal records
+into a small in-memory index before searching. Once a journal grows past
+CASE_INDEX_COMPACT_THRESHOLD records a background thread folds it into a
+new base. Shards of CASE_INDEX_IVF_MIN vectors or more are rebuilt as IVF
+indexes, smaller ones stay exact.
+
+Case metadata (form ID, province, district, time, summary) lives in a
+SQLite table whose row IDs are the FAISS IDs.
+
+Usage:
+    python case_index.py compact [--shard NAME]
+    python case_index.py rebuild [--shard NAME]
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CASE_INDEX_ENABLED = os.getenv("CASE_INDEX_ENABLED", "true").lower() == "true"
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", "case_index")
+CASE_INDEX_COMPACT_THRESHOLD = int(os.getenv("CASE_INDEX_COMPACT_THRESHOLD", "10000"))
+CASE_INDEX_IVF_MIN = int(os.getenv("CASE_INDEX_IVF_MIN", "100000"))
+CASE_INDEX_NPROBE = int(os.getenv("CASE_INDEX_NPROBE", "16"))
+# Filters matching at most this many cases in a shard search every IVF list,
+# since the few matches are unlikely to sit in the lists nearest the query
+CASE_INDEX_EXHAUSTIVE_MAX = int(os.getenv("CASE_INDEX_EXHAUSTIVE_MAX", "20000"))
+
+# Vectors added to the new base per call while compacting
+BUILD_CHUNK = 100_000
+
+def shard_name(province: str | None) -> str:
+    """File-safe shard name for a province."""
+    name = re.sub(r"[^a-z0-9]+", "-", str(province or "").lower()).strip("-")
+    return name or "unknown"
+
+def record_dtype(dim: int) -> np.dtype:
+    """Layout of one journal/vectors record: an int64 ID and the vector."""
+    return np.dtype([("id", "<i8"), ("vector", "<f4", (dim,))])
+
+def normalized(vectors) -> np.ndarray:
+    """Copy vectors as float32 rows of unit length, so inner product is cosine."""
+    array = np.array(vectors, dtype="float32", ndmin=2)
+    faiss.normalize_L2(array)
+    return array
+
+def build_index(records: np.ndarray, dim: int, ivf_min: int = CASE_INDEX_IVF_MIN) -> faiss.Index:
+    """
+    Build a base index over vector records.
+
+    Args:
+        records (np.ndarray): Records with `id` and `vector` fields; may be a memmap.
+        dim (int): Vector dimension.
+        ivf_min (int): Smallest record count indexed with IVF instead of exact search.
+
+    Returns:
+        faiss.Index: An `IndexIDMap2` keyed by case ID.
+    """
+    count = len(records)
+    if count >= ivf_min:
+        nlist = int(4 * math.sqrt(count))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(count, min(count, nlist * 40), replace=False)
+        index.train(np.ascontiguousarray(records["vector"][np.sort(sample)]))
+    else:
+        index = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIDMap2(index)
+    for start in range(0, count, BUILD_CHUNK):
+        chunk = records[start:start + BUILD_CHUNK]
+        index.add_with_ids(np.ascontiguousarray(chunk["vector"]), np.ascontiguousarray(chunk["id"]))
+    return index
+
+class Shard:
+    """
+    One province's vectors: a memory-mapped base plus replayed journals.
+    """
+
+    def __init__(self, path: str, dim: int):
+        """
+        Initialize the shard. Nothing is read until the first refresh.
+
+        Args:
+            path (str): Shard directory.
+            dim (int): Vector dimension.
+        """
+        self.path = path
+        self.dim = dim
+        self.dtype = record_dtype(dim)
+        self.base: faiss.Index | None = None
+        self.base_file: str | None = None
+        self.delta = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self.offsets: dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, name: str) -> str:
+        """Path of a file in the shard directory."""
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def locked(self, operation: int = fcntl.LOCK_EX) -> Iterator[None]:
+        """Hold the shard's inter-process lock."""
+        with open(self.file("lock"), "a") as lock:
+            fcntl.flock(lock, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_manifest(self) -> dict:
+        """Current manifest; a new shard starts at generation 0 with one journal."""
+        try:
+            with open(self.file("manifest.json")) as manifest:
+                return json.load(manifest)
+        except FileNotFoundError:
+            return {"generation": 0, "base": None, "vectors": None, "journals": ["journal-0.bin"]}
+
+    def write_manifest(self, manifest: dict):
+        """Atomically replace the manifest."""
+        tmp = self.file("manifest.json.tmp")
+        with open(tmp, "w") as out:
+            json.dump(manifest, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.file("manifest.json"))
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray):
+        """
+        Append vectors to the shard's current journal.
+
+        Args:
+            ids (np.ndarray): int64 case IDs.
+            vectors (np.ndarray): Normalized float32 vectors.
+        """
+        records = np.empty(len(ids), dtype=self.dtype)
+        records["id"] = ids
+        records["vector"] = vectors
+        with self.locked():
+            manifest = self.read_manifest()
+            if not os.path.exists(self.file("manifest.json")):
+                self.write_manifest(manifest)
+            with open(self.file(manifest["journals"][-1]), "ab") as journal:
+                journal.write(records.tobytes())
+
+    def refresh(self):
+        """Load a new base if one was compacted and replay unseen journal records."""
+        with self._lock, self.locked(fcntl.LOCK_SH):
+            manifest = self.read_manifest()
+            if manifest["base"] != self.base_file:
+                self.base = None
+                if manifest["base"]:
+                    self.base = faiss.read_index(
+                        self.file(manifest["base"]), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    )
+                self.base_file = manifest["base"]
+                self.delta.reset()
+                self.offsets = {}
+            for name in manifest["journals"]:
+                self._replay(name)
+
+    def _replay(self, name: str):
+        """Add journal records past this process's offset to the delta index."""
+        path = self.file(name)
+        if not os.path.exists(path):
+            return
+        offset = self.offsets.get(name, 0)
+        count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if count <= 0:
+            return
+        records = np.fromfile(path, dtype=self.dtype, count=count, offset=offset)
+        self.delta.add_with_ids(np.ascontiguousarray(records["vector"]), records["id"])
+        self.offsets[name] = offset + count * self.dtype.itemsize
+
+    @property
+    def pending(self) -> int:
+        """Vectors not yet compacted into the base, as of the last refresh."""
+        return self.delta.ntotal
+
+    @property
+    def size(self) -> int:
+        """Total vectors, as of the last refresh."""
+        return self.delta.ntotal + (self.base.ntotal if self.base is not None else 0)
+
+    @property
+    def nlist(self) -> int:
+        """IVF lists in the base, 1 for an exact index."""
+        if self.base is None:
+            return 1
+        inner = faiss.downcast_index(self.base.index)
+        return inner.nlist if isinstance(inner, faiss.IndexIVF) else 1
+
+    def search(self, vectors: np.ndarray, k: int, nprobe: int = CASE_INDEX_NPROBE,
+               ids: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Search the base and the journal records together.
+
+        Args:
+            vectors (np.ndarray): Normalized float32 query vectors.
+            k (int): Results per query.
+            nprobe (int): IVF lists visited in the base.
+            ids (np.ndarray | None): Only consider these case IDs.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Scores and case IDs, best first,
+                padded with -inf / -1.
+        """
+        self.refresh()
+        selector = faiss.IDSelectorBatch(ids.astype("int64")) if ids is not None else None
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        with self._lock:
+            parts = [index.search(vectors, k, params=params)
+                     for index in (self.delta, self.base) if index is not None and index.ntotal]
+        if not parts:
+            return (np.full((len(vectors), k), -np.inf, dtype="float32"),
+                    np.full((len(vectors), k), -1, dtype="int64"))
+        scores = np.hstack([part[0] for part in parts])
+        ids = np.hstack([part[1] for part in parts])
+        scores[ids < 0] = -np.inf
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, 1), np.take_along_axis(ids, order, 1)
+
+    def compact(self, force: bool = False, ivf_min: int = CASE_INDEX_IVF_MIN) -> bool:
+        """
+        Fold the journals into a new base.
+
+        New appends go to a fresh journal while the base is rebuilt, so
+        writers are only blocked while the manifest is swapped. Only one
+        process compacts a shard at a time.
+
+        Args:
+            force (bool): Rebuild even if no journal records are pending,
+                e.g. to switch an index to IVF after changing `ivf_min`.
+            ivf_min (int): Smallest record count indexed with IVF.
+
+        Returns:
+            bool: Whether a new base was written.
+        """
+        with open(self.file("compact.lock"), "a") as compact_lock:
+            try:
+                fcntl.flock(compact_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+
+            with self.locked():
+                manifest = self.read_manifest()
+                frozen = [name for name in manifest["journals"]
+                          if os.path.exists(self.file(name))]
+                if not force and not any(os.path.getsize(self.file(name)) for name in frozen):
+                    return False
+                generation = manifest["generation"] + 1
+                journal = f"journal-{generation}.bin"
+                open(self.file(journal), "ab").close()
+                self.write_manifest({**manifest, "journals": manifest["journals"] + [journal]})
+
+            start = time.perf_counter()
+            vectors = f"vectors-{generation}.bin"
+            with open(self.file(vectors + ".tmp"), "wb") as out:
+                for name in [manifest["vectors"], *frozen]:
+                    if name:
+                        with open(self.file(name), "rb") as source:
+                            while chunk := source.read(1 << 24):
+                                out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(self.file(vectors + ".tmp"), self.file(vectors))
+
+            records = np.memmap(self.file(vectors), dtype=self.dtype, mode="r")
+            base = f"base-{generation}.faiss"
+            faiss.write_index(build_index(records, self.dim, ivf_min), self.file(base + ".tmp"))
+            os.replace(self.file(base + ".tmp"), self.file(base))
+            del records
+
+            with self.locked():
+                self.write_manifest({
+                    "generation": generation,
+                    "base": base,
+                    "vectors": vectors,
+                    "journals": [journal],
+                })
+                # Processes that mapped the old base keep it until they refresh
+                for name in [manifest["base"], manifest["vectors"], *frozen]:
+                    if name and os.path.exists(self.file(name)):
+                        os.remove(self.file(name))
+            logger.info(
+                f"Compacted case shard {os.path.basename(self.path)} generation {generation} "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+            return True
+
+class CaseMetadata:
+    """
+    SQLite table of indexed cases, shared by every worker process.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the table. The file is opened on first use.
+
+        Args:
+            path (str): SQLite database file.
+        """
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the table."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cases ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, form_id TEXT UNIQUE, shard TEXT NOT NULL, "
+                "province TEXT, district TEXT, created_at REAL NOT NULL, summary TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cases_filter ON cases (shard, district, created_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def insert(self, case: dict, shard: str) -> int | None:
+        """
+        Record a case and return its vector ID.
+
+        Args:
+            case (dict): `form_id`, `province`, `district`, `created_at` and `summary`.
+            shard (str): Shard the vector goes to.
+
+        Returns:
+            int | None: New case ID, or None if the form is already indexed.
+        """
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cases (form_id, shard, province, district, created_at, summary) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (case.get("form_id"), shard, case.get("province"), case.get("district"),
+                 case.get("created_at", time.time()), case.get("summary")),
+            )
+            conn.commit()
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def matching_ids(self, shard: str, districts: list[str] | None = None,
+                     since: float | None = None, until: float | None = None) -> np.ndarray:
+        """
+        IDs of a shard's cases that pass metadata filters.
+
+        Args:
+            shard (str): Shard name.
+            districts (list[str] | None): Allowed districts.
+            since (float | None): Earliest `created_at`, as a Unix time.
+            until (float | None): Latest `created_at`, as a Unix time.
+
+        Returns:
+            np.ndarray: Matching int64 case IDs.
+        """
+        query, args = "SELECT id FROM cases WHERE shard = ?", [shard]
+        if districts:
+            query += f" AND district IN ({','.join('?' * len(districts))})"
+            args += districts
+        if since is not None:
+            query += " AND created_at >= ?"
+            args.append(since)
+        if until is not None:
+            query += " AND created_at <= ?"
+            args.append(until)
+        with self._lock:
+            rows = self._connect().execute(query, args).fetchall()
+        return np.array([row[0] for row in rows], dtype="int64")
+
+    def fetch(self, ids) -> dict[int, dict]:
+        """
+        Look up cases by ID.
+
+        Args:
+            ids: Case IDs.
+
+        Returns:
+            dict[int, dict]: Case rows keyed by ID.
+        """
+        ids = [int(case_id) for case_id in ids]
+        if not ids:
+            return {}
+        with self._lock:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT * FROM cases WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+class CaseIndex:
+    """
+    Province-sharded index of past cases with background compaction.
+    """
+
+    def __init__(self, path: str = CASE_INDEX_DIR,
+                 compact_threshold: int = CASE_INDEX_COMPACT_THRESHOLD):
+        """
+        Initialize the index.
+
+        Args:
+            path (str): Index directory.
+            compact_threshold (int): Journal records that trigger a background compaction.
+        """
+        self.path = path
+        self.compact_threshold = compact_threshold
+        os.makedirs(os.path.join(path, "shards"), exist_ok=True)
+        self.metadata = CaseMetadata(os.path.join(path, "cases.sqlite3"))
+        self.shards: dict[str, Shard] = {}
+        self._compacting: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def dim(self) -> int | None:
+        """Vector dimension, fixed by the first vector ever added."""
+        try:
+            with open(os.path.join(self.path, "dim")) as dim:
+                return int(dim.read())
+        except FileNotFoundError:
+            return None
+
+    def shard_names(self) -> list[str]:
+        """Names of the shards on disk."""
+        return sorted(os.listdir(os.path.join(self.path, "shards")))
+
+    def shard(self, name: str) -> Shard:
+        """Return a shard, opening it on first use."""
+        with self._lock:
+            if name not in self.shards:
+                self.shards[name] = Shard(os.path.join(self.path, "shards", name), self.dim)
+            return self.shards[name]
+
+    def load(self):
+        """Memory-map every shard's base and replay its journal."""
+        if self.dim is None:
+            return
+        for name in self.shard_names():
+            self.shard(name).refresh()
+
+    def add(self, cases: list[dict], vectors):
+        """
+        Index the embeddings of processed reports.
+
+        Forms that are already indexed are skipped, so redelivered messages
+        don't add duplicates.
+
+        Args:
+            cases (list[dict]): `form_id`, `province`, `district` and
+                `summary` of each report.
+            vectors: One embedding per case.
+        """
+        vectors = normalized(vectors)
+        if self.dim is None:
+            with open(os.path.join(self.path, "dim"), "w") as dim:
+                dim.write(str(vectors.shape[1]))
+
+        by_shard: dict[str, list[tuple[int, np.ndarray]]] = {}
+        for case, vector in zip(cases, vectors):
+            name = shard_name(case.get("province"))
+            case_id = self.metadata.insert(case, name)
+            if case_id is not None:
+                by_shard.setdefault(name, []).append((case_id, vector))
+
+        for name, entries in by_shard.items():
+            shard = self.shard(name)
+            shard.append(np.array([case_id for case_id, _ in entries], dtype="int64"),
+                         np.stack([vector for _, vector in entries]))
+            shard.refresh()
+            if shard.pending >= self.compact_threshold:
+                self.compact_in_background(name)
+
+    def compact_in_background(self, name: str):
+        """Start compacting a shard in a daemon thread, unless one is running."""
+        with self._lock:
+            if name in self._compacting:
+                return
+            self._compacting.add(name)
+
+        def run():
+            try:
+                self.shard(name).compact()
+            except Exception:
+                logger.exception(f"Compaction of case shard {name} failed")
+            finally:
+                with self._lock:
+                    self._compacting.discard(name)
+
+        threading.Thread(target=run, name=f"compact-{name}", daemon=True).start()
+
+    def search(self, vector, k: int, provinces: list[str] | None = None,
+               districts: list[str] | None = None, since: float | None = None,
+               until: float | None = None, exclude: str | None = None,
+               nprobe: int = CASE_INDEX_NPROBE) -> list[dict]:
+        """
+        Find the cases most similar to an embedding.
+
+        Province picks the shards to search. District and time filters are
+        resolved against the metadata first and restrict the search to the
+        matching IDs; small matching sets are searched exhaustively.
+
+        Args:
+            vector: Query embedding.
+            k (int): Number of cases to return.
+            provinces (list[str] | None): Restrict the search to these
+                provinces' shards. Defaults to every shard.
+            districts (list[str] | None): Only cases from these districts.
+            since (float | None): Only cases indexed at or after this Unix time.
+            until (float | None): Only cases indexed at or before this Unix time.
+            exclude (str | None): Form ID to leave out, e.g. the query's own form.
+            nprobe (int): IVF lists visited per shard; higher is slower but
+                finds more of the true nearest cases.
+
+        Returns:
+            list[dict]: Case rows with a `score`, best first.
+        """
+        if self.dim is None:
+            return []
+        query = normalized(vector)
+        names = [shard_name(province) for province in provinces] if provinces else self.shard_names()
+        filtered = bool(districts) or since is not None or until is not None
+        fetch_k = k + (1 if exclude else 0)
+
+        hits = []
+        for name in names:
+            if not os.path.isdir(os.path.join(self.path, "shards", name)):
+                continue
+            shard = self.shard(name)
+            ids, shard_nprobe = None, nprobe
+            if filtered:
+                ids = self.metadata.matching_ids(name, districts, since, until)
+                if not len(ids):
+                    continue
+                if len(ids) <= CASE_INDEX_EXHAUSTIVE_MAX:
+                    shard.refresh()
+                    shard_nprobe = shard.nlist
+            scores, found = shard.search(query, fetch_k, shard_nprobe, ids)
+            hits.extend((score, case_id) for score, case_id in zip(scores[0], found[0]) if case_id >= 0)
+        hits.sort(reverse=True)
+
+        rows = self.metadata.fetch(case_id for _, case_id in hits)
+        results = []
+        for score, case_id in hits:
+            row = rows.get(case_id)
+            if row is None or (exclude and row["form_id"] == exclude):
+                continue
+            results.append({**row, "score": float(score)})
+            if len(results) == k:
+                break
+        return results
+
+case_index = CaseIndex() if CASE_INDEX_ENABLED else None
+
+def main():
+    """Compact or rebuild shards from the command line."""
+    parser = argparse.ArgumentParser(description="Maintain the similar-case index.")
+    parser.add_argument("command", choices=["compact", "rebuild"])
+    parser.add_argument("--shard", help="only this shard (default: all)")
+    parser.add_argument("--path", default=CASE_INDEX_DIR)
+    args = parser.parse_args()
+
+    index = CaseIndex(args.path)
+    if index.dim is None:
+        print("Case index is empty.")
+        return
+    for name in [args.shard] if args.shard else index.shard_names():
+        done = index.shard(name).compact(force=args.command == "rebuild")
+        print(f"{name}: {'compacted' if done else 'nothing to do'}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
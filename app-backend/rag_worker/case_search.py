@@ -0,0 +1,192 @@
+"""
+Similar-case search API over the report embedding index.
+
+Epidemiologists type a symptom description and get the most similar past
+reports, optionally filtered by province, district or date. The query is
+embedded with the same model the worker uses for reports and searched in
+the shared `case_index` directory.
+
+Run with:
+    uvicorn case_search:app --host 0.0.0.0 --port 8002
+"""
+
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timezone
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from common.logger import setup_logging
+from common.verification_session import STEP_VERIFIED, VerificationSessionStore
+from case_index import CASE_INDEX_NPROBE, CaseIndex, case_index
+from notify import redis_client
+from resources import resources
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+SEARCH_LATENCY = Histogram(
+    "case_search_duration_seconds",
+    "Similar-case search latency by stage",
+    ["stage"],
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Map the index and load the embedding model before serving."""
+    if case_index is not None:
+        case_index.load()
+    _ = resources.embeddings
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+class CaseMatch(BaseModel):
+    """
+    A past report similar to the query.
+
+    Attributes:
+        form_id (str): ID of the form.
+        score (float): Cosine similarity to the query, higher is closer.
+        province (str | None): Province of the report.
+        district (str | None): District of the report.
+        created_at (datetime): When the report was indexed.
+    """
+    form_id: str
+    score: float
+    province: str | None = None
+    district: str | None = None
+    created_at: datetime
+
+class CaseSearchResponse(BaseModel):
+    """
+    Response model for the similar-case search endpoint.
+
+    Attributes:
+        success (bool): Denote the success of the search.
+        results (list[CaseMatch]): Matches, best first.
+        detail (str): Message to be returned.
+    """
+    success: bool
+    results: list[CaseMatch] = []
+    detail: str
+
+def get_token(request: Request) -> dict:
+    """
+    Parse the 'Authorization' header.
+
+    Args:
+        request (Request): The incoming HTTP request object.
+
+    Returns:
+        dict: The token with the doctor's `id` and verification `step`.
+
+    Raises:
+        HTTPException: If the header is missing or malformed.
+    """
+    auth = request.headers.get("authorization")
+    if not auth:
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+    try:
+        token = json.loads(auth)
+        uuid.UUID(token["id"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=401, detail="Doctor ID is not a valid UUID.") from exc
+    return token
+
+def get_case_index() -> CaseIndex:
+    """
+    Return the process-wide case index.
+
+    Raises:
+        HTTPException: If the case index is disabled.
+    """
+    if case_index is None:
+        raise HTTPException(status_code=503, detail="Case index is disabled.")
+    return case_index
+
+def check_verified(token: dict = Depends(get_token)):
+    """
+    Require a fully verified doctor session.
+
+    Args:
+        token (dict): Parsed authorization token.
+
+    Raises:
+        HTTPException: If the token or the stored session is not verified.
+    """
+    sessions = VerificationSessionStore(redis_client)
+    if (str(token.get("step")) != str(STEP_VERIFIED)
+            or sessions.require_step(token["id"], STEP_VERIFIED) is None):
+        raise HTTPException(status_code=401, detail="Token does not match.")
+
+def day_bound(day: date | None, end: bool = False) -> float | None:
+    """Unix time of the start (or end) of a UTC day."""
+    if day is None:
+        return None
+    moment = datetime.combine(day, time.max if end else time.min, tzinfo=timezone.utc)
+    return moment.timestamp()
+
+@app.get("/cases/search", response_model=CaseSearchResponse,
+         dependencies=[Depends(check_verified)])
+def search_cases(
+    q: str = Query(..., min_length=3, description="Symptom description"),
+    k: int = Query(10, ge=1, le=100),
+    province: list[str] | None = Query(None),
+    district: list[str] | None = Query(None),
+    since: date | None = Query(None, description="Earliest report date (UTC)"),
+    until: date | None = Query(None, description="Latest report date (UTC)"),
+    nprobe: int = Query(CASE_INDEX_NPROBE, ge=1, le=4096,
+                        description="IVF lists searched per shard; higher trades latency for recall"),
+    index: CaseIndex = Depends(get_case_index),
+    ):
+    """
+    Return the past reports most similar to a symptom description.
+
+    Args:
+        q (str): Free-text symptom description.
+        k (int): Number of results.
+        province (list[str] | None): Only search these provinces.
+        district (list[str] | None): Only return reports from these districts.
+        since (date | None): Only reports from this day on.
+        until (date | None): Only reports up to this day.
+        nprobe (int): IVF lists searched per shard.
+        index (CaseIndex): The case index.
+
+    Returns:
+        CaseSearchResponse: Ranked form IDs with similarity scores.
+    """
+    logger.info("Starting search_cases")
+    with SEARCH_LATENCY.labels("embed").time():
+        vector = resources.embeddings.embed_query(q)
+    with SEARCH_LATENCY.labels("search").time():
+        cases = index.search(
+            vector, k, provinces=province, districts=district,
+            since=day_bound(since), until=day_bound(until, end=True), nprobe=nprobe,
+        )
+    results = [
+        CaseMatch(
+            form_id=case["form_id"],
+            score=case["score"],
+            province=case["province"],
+            district=case["district"],
+            created_at=datetime.fromtimestamp(case["created_at"], timezone.utc),
+        )
+        for case in cases
+    ]
+    return CaseSearchResponse(success=True, results=results, detail=f"{len(results)} cases found.")
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Endpoint to expose Prometheus metrics.
+
+    Returns:
+        Response: Prometheus-formatted metrics.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,115 @@
+"""
+Inspect and replay summarization tasks in the dead-letter queue.
+
+`list` prints the dead-lettered tasks as JSON lines without removing them.
+`replay` moves tasks back to `rag_tasks` with a fresh attempt count, e.g.
+once the model runner is back or a producer bug has been fixed. Both take
+`--form-id` to pick out the tasks of particular forms.
+
+Usage:
+    python dead_letters.py list [--limit N] [--form-id ID ...]
+    python dead_letters.py replay [--limit N] [--form-id ID ...]
+"""
+
+import argparse
+import json
+
+import pika
+
+from broker import DEAD_LETTER_QUEUE, TASK_QUEUE, connection_parameters
+from failures import ATTEMPTS_HEADER, ERROR_HEADERS
+
+def describe(properties, body: bytes) -> dict:
+    """
+    Summarize a dead-lettered task for display.
+
+    Args:
+        properties: pika.spec.BasicProperties - Message properties.
+        body (bytes): Message body.
+
+    Returns:
+        dict: Form ID, attempt count and the last error.
+    """
+    headers = properties.headers or {}
+    try:
+        form_id = json.loads(body).get("id")
+    except (ValueError, AttributeError):
+        form_id = None
+    return {
+        "form_id": form_id or properties.message_id,
+        "attempts": headers.get(ATTEMPTS_HEADER),
+        "failure": headers.get("x-failure"),
+        "error_type": headers.get("x-error-type"),
+        "error": headers.get("x-error"),
+        "failed_at": headers.get("x-failed-at"),
+    }
+
+def replay_properties(properties) -> pika.BasicProperties:
+    """Properties for a replayed task: the same message without failure headers."""
+    headers = {
+        key: value for key, value in (properties.headers or {}).items()
+        if key != ATTEMPTS_HEADER and key not in ERROR_HEADERS and key != "x-death"
+    }
+    return pika.BasicProperties(
+        delivery_mode=2,
+        message_id=properties.message_id,
+        content_type=properties.content_type,
+        headers=headers or None,
+    )
+
+def walk(channel, limit: int | None, form_ids: set[str] | None):
+    """
+    Yield dead-lettered tasks, holding each one unacknowledged.
+
+    Tasks that aren't acknowledged go back to the queue, in their original
+    order, when the connection closes.
+
+    Args:
+        channel: pika.Channel - Channel to read from.
+        limit (int | None): Largest number of matching tasks to yield.
+        form_ids (set[str] | None): Only yield tasks of these forms.
+
+    Yields:
+        tuple: Delivery method, properties, body and description of each task.
+    """
+    found = 0
+    while limit is None or found < limit:
+        method, properties, body = channel.basic_get(DEAD_LETTER_QUEUE, auto_ack=False)
+        if method is None:
+            return
+        info = describe(properties, body)
+        if form_ids and info["form_id"] not in form_ids:
+            continue
+        found += 1
+        yield method, properties, body, info
+
+def main():
+    """List or replay dead-lettered tasks from the command line."""
+    parser = argparse.ArgumentParser(description="Inspect and replay dead-lettered RAG tasks.")
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument("--limit", type=int, help="at most this many tasks")
+    parser.add_argument("--form-id", nargs="+", help="only tasks of these forms")
+    args = parser.parse_args()
+
+    connection = pika.BlockingConnection(connection_parameters())
+    channel = connection.channel()
+    channel.queue_declare(queue=DEAD_LETTER_QUEUE, durable=True)
+    form_ids = set(args.form_id) if args.form_id else None
+    count = 0
+    try:
+        if args.command == "replay":
+            # Raises if the broker doesn't accept a replayed task, before it is acked
+            channel.confirm_delivery()
+        for method, properties, body, info in walk(channel, args.limit, form_ids):
+            if args.command == "replay":
+                channel.basic_publish(exchange="", routing_key=TASK_QUEUE, body=body,
+                                      properties=replay_properties(properties))
+                channel.basic_ack(delivery_tag=method.delivery_tag)
+            print(json.dumps(info))
+            count += 1
+    finally:
+        connection.close()
+    print(f"{count} tasks {'replayed' if args.command == 'replay' else 'dead-lettered'}.")
+
+if __name__ == "__main__":
+    main()
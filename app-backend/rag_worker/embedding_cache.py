@@ -0,0 +1,335 @@
+"""
+Cache of text embeddings keyed by a hash of the text and the model.
+
+Every report is built from the same template (`format_patient_template`), so
+its title, section headers and common symptom sentences produce the same
+chunks message after message. `CachedEmbeddings` wraps the embedding model
+and only sends texts it hasn't embedded before to the model.
+
+Keys are the SHA-256 of the model id and the text, so switching
+EMBEDDING_MODEL or EMBEDDING_BACKEND never serves another model's vectors.
+There are two tiers:
+
+- an in-process LRU of EMBEDDING_CACHE_MEMORY_ENTRIES vectors;
+- a memory-mapped file in EMBEDDING_CACHE_DIR, shared by the worker
+  processes and kept across restarts. It is a direct-mapped table of
+  EMBEDDING_CACHE_DISK_ENTRIES slots: a key always lives in the slot picked
+  by its hash and a new key evicts whatever was there, so lookups and
+  inserts never scan the file. The file is sparse; only written slots take
+  up disk space.
+
+`record_stats` adds the model time the cache saved to a message's stage
+timings as `embed_saved`; hits and misses are counted in
+`rag_embedding_cache_requests_total`.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096"))
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "65536"))
+
+KEY_BYTES = 32
+
+# Weight of the newest model call in the running per-text embedding cost
+COST_SMOOTHING = 0.2
+
+CACHE_REQUESTS = Counter(
+    "rag_embedding_cache_requests_total",
+    "Embedding cache lookups by tier and result",
+    ["tier", "result"],
+)
+SECONDS_SAVED = Counter(
+    "rag_embedding_cache_seconds_saved_total",
+    "Estimated embedding model time saved by cache hits",
+)
+
+_stats = threading.local()
+
+@contextmanager
+def record_stats(timings: dict | None) -> Iterator[None]:
+    """
+    Add the model time saved by cache hits in this block to `timings`.
+
+    Only embeddings made on the calling thread are counted.
+
+    Args:
+        timings (dict | None): Stage timings receiving `embed_saved` seconds.
+            Nothing is recorded when None.
+    """
+    previous = getattr(_stats, "saved", None)
+    _stats.saved = 0.0
+    try:
+        yield
+    finally:
+        saved, _stats.saved = _stats.saved, previous
+        if timings is not None and saved:
+            timings["embed_saved"] = timings.get("embed_saved", 0.0) + saved
+
+class MappedStore:
+    """
+    Direct-mapped table of vectors in a memory-mapped `.npy` file.
+
+    A slot holds a key and its vector. Writers hold an exclusive file lock
+    and clear the key before replacing the vector; readers copy the vector
+    and check the key is still the same afterwards, so a reader never
+    returns a vector that is being overwritten.
+    """
+
+    def __init__(self, path: str, slots: int, dim: int):
+        """
+        Open the table, creating it if needed.
+
+        Args:
+            path (str): `.npy` file holding the table.
+            slots (int): Number of slots.
+            dim (int): Vector dimension.
+        """
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        dtype = np.dtype([("key", "u1", (KEY_BYTES,)), ("vector", "<f4", (dim,))])
+        with self._file_lock():
+            if not os.path.exists(path):
+                # Created aside and moved into place so no process maps a partial header
+                fd, staging = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npy")
+                os.close(fd)
+                np.lib.format.open_memmap(staging, mode="w+", dtype=dtype, shape=(slots,)).flush()
+                os.replace(staging, path)
+        self.table = np.load(path, mmap_mode="r+")
+        if self.table.dtype != dtype or self.table.shape != (slots,):
+            raise ValueError(f"{path} doesn't hold a table of {slots} vectors of {dim} dimensions")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the lock file shared by every process using the table."""
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def slot(self, key: bytes) -> int:
+        """Slot a key lives in."""
+        return int.from_bytes(key[:8], "little") % self.slots
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        """
+        Look up a vector.
+
+        Args:
+            key (bytes): Cache key.
+
+        Returns:
+            np.ndarray | None: A copy of the vector, or None on a miss.
+        """
+        record = self.table[self.slot(key)]
+        if record["key"].tobytes() != key:
+            return None
+        vector = np.array(record["vector"])
+        return vector if record["key"].tobytes() == key else None
+
+    def put(self, entries: dict[bytes, np.ndarray]):
+        """
+        Store vectors, evicting the keys that occupied their slots.
+
+        Args:
+            entries (dict[bytes, np.ndarray]): Vectors by cache key.
+        """
+        with self._lock, self._file_lock():
+            for key, vector in entries.items():
+                record = self.table[self.slot(key)]
+                record["key"] = 0
+                record["vector"] = vector
+                record["key"] = np.frombuffer(key, dtype="u1")
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that reuses the vectors of texts seen before.
+    """
+
+    def __init__(self, model: Embeddings, model_id: str,
+                 directory: str | None = EMBEDDING_CACHE_DIR,
+                 memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+                 disk_entries: int = EMBEDDING_CACHE_DISK_ENTRIES):
+        """
+        Initialize the cache. An existing disk table is opened right away;
+        otherwise one is created on the first miss, once the vector
+        dimension is known.
+
+        Args:
+            model (Embeddings): Embedding model computing the misses.
+            model_id (str): Identifies the model and backend in the keys.
+            directory (str | None): Directory of the disk table, or None to
+                keep the cache in memory only.
+            memory_entries (int): Vectors kept in the in-process LRU.
+            disk_entries (int): Slots of the disk table.
+        """
+        self.model = model
+        self.model_id = model_id
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self.disk: MappedStore | None = None
+        self.disk_failed = False
+        # Running estimate of the model's seconds per text, from the misses
+        self.seconds_per_text: float | None = None
+        # Texts answered from either tier and texts sent to the model
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._open_existing_disk()
+
+    def key(self, text: str, kind: str = "document") -> bytes:
+        """
+        Cache key of a text.
+
+        Args:
+            text (str): Text to embed.
+            kind (str): `document` or `query`, which some models embed differently.
+
+        Returns:
+            bytes: SHA-256 of the model id, the kind and the text.
+        """
+        return hashlib.sha256(f"{self.model_id}\0{kind}\0{text}".encode()).digest()
+
+    def _disk_path(self, dim: int) -> str:
+        """Disk table of this model for vectors of `dim` dimensions."""
+        model_hash = hashlib.sha256(self.model_id.encode()).hexdigest()[:12]
+        return os.path.join(self.directory, f"{model_hash}-{dim}x{self.disk_entries}.npy")
+
+    def _open_existing_disk(self):
+        """Open a disk table left by an earlier run, so it answers from the first lookup."""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        prefix = os.path.basename(self._disk_path(0)).split("-")[0]
+        suffix = f"x{self.disk_entries}.npy"
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix + "-") and name.endswith(suffix):
+                dim = name[len(prefix) + 1:-len(suffix)]
+                if dim.isdigit():
+                    self._open_disk(int(dim))
+                    return
+
+    def _open_disk(self, dim: int):
+        """Open the disk table for vectors of `dim` dimensions, once."""
+        if self.disk is not None or self.disk_failed or self.directory is None:
+            return
+        path = self._disk_path(dim)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.disk = MappedStore(path, self.disk_entries, dim)
+        except (OSError, ValueError):
+            logger.warning(f"Embedding disk cache {path} unavailable, caching in memory only")
+            self.disk_failed = True
+
+    def _lookup(self, key: bytes) -> np.ndarray | None:
+        """Find a vector in memory, then on disk, promoting disk hits."""
+        with self._lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+        CACHE_REQUESTS.labels("memory", "miss" if vector is None else "hit").inc()
+        if vector is not None or self.disk is None:
+            return vector
+
+        vector = self.disk.get(key)
+        CACHE_REQUESTS.labels("disk", "miss" if vector is None else "hit").inc()
+        if vector is not None:
+            self._remember({key: vector})
+        return vector
+
+    def _remember(self, entries: dict[bytes, np.ndarray]):
+        """Add vectors to the LRU, evicting the least recently used."""
+        with self._lock:
+            for key, vector in entries.items():
+                self.memory[key] = vector
+                self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _embed(self, texts: list[str], kind: str, compute) -> list[list[float]]:
+        """
+        Embed texts, sending only the cache misses to `compute`.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            kind (str): `document` or `query`.
+            compute: Callable embedding a list of texts with the model.
+
+        Returns:
+            list[list[float]]: One vector per text.
+        """
+        keys = [self.key(text, kind) for text in texts]
+        vectors = [self._lookup(key) for key in keys]
+        # Repeated texts within the call are embedded once
+        missing = {
+            key: text for key, text, vector in zip(keys, texts, vectors) if vector is None
+        }
+
+        if missing:
+            start = time.perf_counter()
+            computed = np.asarray(compute(list(missing.values())), dtype="float32")
+            cost = (time.perf_counter() - start) / len(missing)
+            self.seconds_per_text = cost if self.seconds_per_text is None else (
+                (1 - COST_SMOOTHING) * self.seconds_per_text + COST_SMOOTHING * cost
+            )
+            fresh = dict(zip(missing, computed))
+            self._remember(fresh)
+            self._open_disk(computed.shape[1])
+            if self.disk is not None:
+                try:
+                    self.disk.put(fresh)
+                except OSError:
+                    logger.warning("Embedding disk cache write failed")
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        hits = len(texts) - len(missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+        if hits and self.seconds_per_text is not None:
+            saved = hits * self.seconds_per_text
+            SECONDS_SAVED.inc(saved)
+            if getattr(_stats, "saved", None) is not None:
+                _stats.saved += saved
+        return [vector.tolist() for vector in vectors]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts, reusing cached vectors.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text.
+        """
+        return self._embed(texts, "document", self.model.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed a single query, reusing its cached vector.
+
+        Args:
+            text (str): Query text.
+
+        Returns:
+            list[float]: The query vector.
+        """
+        return self._embed([text], "query", lambda texts: [self.model.embed_query(texts[0])])[0]
@@ -0,0 +1,243 @@
+"""
+Embedding backends for the RAG worker.
+
+EMBEDDING_BACKEND picks how report chunks and queries are embedded:
+
+- `torch` (default): the sentence-transformer through `HuggingFaceEmbeddings`.
+- `onnx`: the same model exported to ONNX with dynamic int8 quantization and
+  run by ONNX Runtime, which is several times cheaper on CPU-only nodes.
+
+The ONNX model is exported from the sentence-transformer into
+EMBEDDING_ONNX_DIR the first time it is needed (or ahead of time with the
+command below) and reused afterwards. Both backends return unit-length,
+mean-pooled vectors with a cosine similarity close to 1 for the same text,
+so vectors already stored in the case index stay comparable after
+switching.
+
+Usage:
+    python embeddings.py export [--output DIR]
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_model")
+
+ONNX_MODEL_FILE = "model-int8.onnx"
+ONNX_CONFIG_FILE = "embedding.json"
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+def export_onnx(model_name: str, output_dir: str):
+    """
+    Export a sentence-transformer to a quantized ONNX model.
+
+    Writes the int8 model, the tokenizer and a small config with the
+    sequence length and normalization used by the original model. The
+    files are written to a temporary directory and moved into place, so a
+    concurrent reader never sees a half-written export.
+
+    Args:
+        model_name (str): Sentence-transformer name, e.g. `all-MiniLM-L6-v2`.
+        output_dir (str): Directory receiving the export.
+
+    Raises:
+        ValueError: If the model doesn't use mean pooling.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = model[1].get_pooling_mode_str()
+    if pooling != "mean":
+        raise ValueError(f"Only mean pooling can be exported, {model_name} uses {pooling}")
+    normalize = any(type(module).__name__ == "Normalize" for module in model)
+
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".onnx-export-", dir=parent)
+    try:
+        sample = model.tokenizer(["Patient Diagnosis Report"], return_tensors="pt")
+        fp32_path = os.path.join(staging, "model.onnx")
+        torch.onnx.export(
+            model[0].auto_model,
+            tuple(sample[name] for name in ONNX_INPUTS),
+            fp32_path,
+            input_names=list(ONNX_INPUTS),
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                **{name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,
+        )
+        quantize_dynamic(fp32_path, os.path.join(staging, ONNX_MODEL_FILE),
+                         weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+        model.tokenizer.save_pretrained(staging)
+        with open(os.path.join(staging, ONNX_CONFIG_FILE), "w") as config:
+            json.dump({
+                "model": model_name,
+                "max_seq_length": model.max_seq_length,
+                "normalize": normalize,
+            }, config)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(staging, output_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"Exported {model_name} to {output_dir}")
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings from an int8 ONNX export of a sentence-transformer.
+    """
+
+    def __init__(self, model_name: str, model_dir: str = EMBEDDING_ONNX_DIR,
+                 batch_size: int = 64, threads: int | None = None):
+        """
+        Load the exported model, exporting it first if it is missing.
+
+        Args:
+            model_name (str): Sentence-transformer the export is made from.
+            model_dir (str): Directory of the export.
+            batch_size (int): Texts run through the model at once.
+            threads (int | None): ONNX Runtime intra-op threads. Defaults to
+                OMP_NUM_THREADS, as set per worker by the supervisor.
+
+        Raises:
+            ValueError: If `model_dir` holds an export of another model.
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.ensure_export(model_name, model_dir)
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE)) as config_file:
+            config = json.load(config_file)
+        if config["model"] != model_name:
+            raise ValueError(f"{model_dir} holds {config['model']}, not {model_name}")
+        self.normalize = config["normalize"]
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_seq_length"])
+        self.tokenizer.enable_padding()
+
+        if threads is None:
+            threads = int(os.getenv("OMP_NUM_THREADS", "0"))
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    @staticmethod
+    def ensure_export(model_name: str, model_dir: str):
+        """Export the model unless another process already has, under a file lock."""
+        if os.path.exists(os.path.join(model_dir, ONNX_CONFIG_FILE)):
+            return
+        lock_path = os.path.abspath(model_dir) + ".lock"
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(os.path.join(model_dir, ONNX_CONFIG_FILE)):
+                logger.info(f"No ONNX export in {model_dir}, exporting {model_name}")
+                export_onnx(model_name, model_dir)
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        """Embed one batch into float32 rows."""
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype="int64"),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype="int64"),
+        }
+        hidden = self.session.run(
+            None, {name: value for name, value in inputs.items() if name in self.input_names}
+        )[0]
+        mask = inputs["attention_mask"][..., None].astype("float32")
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype("float32")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed texts in batches.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One vector per text.
+        """
+        vectors = [
+            self._embed(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed a single query.
+
+        Args:
+            text (str): Query text.
+
+        Returns:
+            list[float]: The query vector.
+        """
+        return self._embed([text])[0].tolist()
+
+def make_embeddings(backend: str, model_name: str, batch_size: int) -> Embeddings:
+    """
+    Create the embedding model for a backend.
+
+    Args:
+        backend (str): `torch` or `onnx`.
+        model_name (str): Sentence-transformer name.
+        batch_size (int): Texts embedded per forward pass.
+
+    Returns:
+        Embeddings: The embedding model.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name, batch_size=batch_size)
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            encode_kwargs={"batch_size": batch_size},
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected 'torch' or 'onnx'")
+
+def main():
+    """Export the ONNX embedding model from the command line."""
+    from resources import EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description="Export the quantized ONNX embedding model.")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", default=EMBEDDING_ONNX_DIR)
+    args = parser.parse_args()
+    export_onnx(args.model, args.output)
+    print(f"Exported {args.model} to {args.output}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,131 @@
+"""
+Classification and routing of failed summarization tasks.
+
+A failure is permanent when retrying can't help: the message isn't valid
+JSON, the form lacks a field the report needs, or the model rejects the
+request outright. Those tasks go straight to the dead-letter queue. Any
+other error (the model runner being down or timing out, Redis or MongoDB
+hiccups) is treated as transient and the task is retried through the
+delayed retry queues until RAG_RETRY_MAX_ATTEMPTS is reached, after which it
+is dead-lettered as well.
+
+The number of failed attempts travels with the message in the `x-attempts`
+header; the last error is kept in `x-error` and `x-error-type`.
+"""
+
+import logging
+import time
+
+import openai
+import pika
+from prometheus_client import Counter
+
+from broker import DEAD_LETTER_QUEUE, RAG_RETRY_MAX_ATTEMPTS, retry_delay, retry_queue
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS_HEADER = "x-attempts"
+ERROR_HEADERS = ("x-error", "x-error-type", "x-failure", "x-failed-at")
+
+# Longest error message copied into the message headers
+MAX_ERROR_LENGTH = 1000
+
+TASK_RETRIES = Counter(
+    "rag_task_retries_total",
+    "Summarization tasks scheduled for a retry, by error type",
+    ["error_type"],
+)
+TASK_DEAD_LETTERS = Counter(
+    "rag_task_dead_letters_total",
+    "Summarization tasks moved to the dead-letter queue, by reason",
+    ["reason"],
+)
+
+class PermanentError(Exception):
+    """
+    A task that can never be summarized as sent, e.g. a malformed form.
+    """
+
+# Errors that fail the same way however often they are retried
+PERMANENT_ERRORS = (
+    PermanentError,
+    KeyError,
+    TypeError,
+    ValueError,
+    openai.BadRequestError,
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.NotFoundError,
+    openai.UnprocessableEntityError,
+)
+
+def is_transient(error: Exception) -> bool:
+    """
+    Decide whether a failed task may succeed if retried.
+
+    Args:
+        error (Exception): The error the task failed with.
+
+    Returns:
+        bool: False for permanent errors, True for anything else.
+    """
+    return not isinstance(error, PERMANENT_ERRORS)
+
+def attempts_of(properties) -> int:
+    """
+    Failed attempts recorded on a message.
+
+    Args:
+        properties: pika.spec.BasicProperties - Message properties.
+
+    Returns:
+        int: Value of the `x-attempts` header, 0 for a first delivery.
+    """
+    headers = getattr(properties, "headers", None) or {}
+    try:
+        return int(headers.get(ATTEMPTS_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+def failure_route(properties, error: Exception) -> tuple[str, pika.BasicProperties, bool]:
+    """
+    Pick where a failed task goes next and count it.
+
+    Args:
+        properties: pika.spec.BasicProperties - Properties of the failed message.
+        error (Exception): The error the task failed with.
+
+    Returns:
+        tuple[str, pika.BasicProperties, bool]: Queue to publish the message
+            to, its new properties, and whether it was dead-lettered.
+    """
+    attempt = attempts_of(properties) + 1
+    transient = is_transient(error)
+    error_type = type(error).__name__
+    headers = {
+        **(getattr(properties, "headers", None) or {}),
+        ATTEMPTS_HEADER: attempt,
+        "x-error": str(error)[:MAX_ERROR_LENGTH],
+        "x-error-type": error_type,
+        "x-failure": "transient" if transient else "permanent",
+        "x-failed-at": int(time.time()),
+    }
+    new_properties = pika.BasicProperties(
+        delivery_mode=2,
+        message_id=getattr(properties, "message_id", None),
+        content_type=getattr(properties, "content_type", None),
+        headers=headers,
+    )
+
+    if transient and attempt < RAG_RETRY_MAX_ATTEMPTS:
+        TASK_RETRIES.labels(error_type).inc()
+        logger.warning(
+            f"Task failed with {error_type} (attempt {attempt}/{RAG_RETRY_MAX_ATTEMPTS}), "
+            f"retrying in {retry_delay(attempt):g}s"
+        )
+        return retry_queue(attempt), new_properties, False
+
+    reason = "exhausted" if transient else "permanent"
+    TASK_DEAD_LETTERS.labels(reason).inc()
+    logger.error(f"Task failed with {error_type} ({reason}, attempt {attempt}), dead-lettering it")
+    return DEAD_LETTER_QUEUE, new_properties, True
@@ -0,0 +1,101 @@
+"""
+Prometheus metrics of the RAG worker.
+
+Under the supervisor every worker process writes its metrics to
+PROMETHEUS_MULTIPROC_DIR and the supervisor serves the merged values on
+RAG_METRICS_PORT; a worker started on its own serves its metrics itself.
+
+- `rag_stage_duration_seconds{stage}`: time spent per summarization stage,
+  e.g. `embed`, `vectorstore` (building a report's FAISS index),
+  `retrieval`, `llm` and `index` (adding reports to the case index).
+- `rag_messages_processed_total{path}`, `rag_messages_failed_total{failure}`
+  and `rag_messages_redelivered_total`: task outcomes.
+- `rag_message_age_seconds`: how long the latest task waited between being
+  published (the producer's `x-published-at-ms` header) and being consumed.
+
+Retry, dead-letter and cache counters are defined next to the code that
+updates them (`failures.py`, `summary_cache.py`, `embedding_cache.py`) and
+served alongside these.
+"""
+
+import logging
+import os
+import time
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
+
+logger = logging.getLogger(__name__)
+
+RAG_METRICS_PORT = int(os.getenv("RAG_METRICS_PORT", "9100"))
+
+# Unix time in milliseconds; AMQP header tables can't hold floats
+PUBLISHED_AT_HEADER = "x-published-at-ms"
+
+# Timings that aren't stage durations
+NON_STAGE_TIMINGS = ("batch_size", "embed_saved")
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each summarization stage, per batch or async message",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+MESSAGES_PROCESSED = Counter(
+    "rag_messages_processed_total",
+    "Tasks summarized and acknowledged, by summarization path",
+    ["path"],
+)
+MESSAGES_FAILED = Counter(
+    "rag_messages_failed_total",
+    "Tasks that failed and were sent to a retry or dead-letter queue",
+    ["failure"],
+)
+MESSAGES_REDELIVERED = Counter(
+    "rag_messages_redelivered_total",
+    "Tasks the broker delivered again after an earlier delivery wasn't acknowledged",
+)
+MESSAGE_AGE = Gauge(
+    "rag_message_age_seconds",
+    "Seconds between a task being published and consumed, for the latest task",
+    multiprocess_mode="livemostrecent",
+)
+
+def observe_timings(timings: dict):
+    """
+    Record the stage durations of a summarized batch or message.
+
+    Args:
+        timings (dict): Stage timings as filled in by `summarize_batch` or `asummarize`.
+    """
+    for stage, seconds in timings.items():
+        if stage not in NON_STAGE_TIMINGS:
+            STAGE_DURATION.labels(stage).observe(seconds)
+
+def observe_delivery(method, properties):
+    """
+    Count a redelivery and record how long the task waited in the queues.
+
+    Args:
+        method: pika.spec.Basic.Deliver - Delivery method.
+        properties: pika.spec.BasicProperties - Message properties.
+    """
+    if getattr(method, "redelivered", False):
+        MESSAGES_REDELIVERED.inc()
+    headers = getattr(properties, "headers", None) or {}
+    published_at_ms = headers.get(PUBLISHED_AT_HEADER)
+    if isinstance(published_at_ms, int):
+        MESSAGE_AGE.set(max(0.0, time.time() - published_at_ms / 1000))
+
+def start_metrics_server(port: int = RAG_METRICS_PORT):
+    """
+    Serve the metrics over HTTP on a background thread.
+
+    Args:
+        port (int): Port to listen on.
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+    logger.info(f"Serving metrics on port {port}")
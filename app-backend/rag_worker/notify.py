@@ -0,0 +1,68 @@
+"""
+Publishes completed summaries to Redis so the API can push them to clients.
+
+Reports that were dead-lettered are published too, with a `failed` status,
+so clients waiting on them stop waiting.
+"""
+
+import json
+import logging
+import os
+
+import redis
+from redis.exceptions import RedisError
+
+from common.summary_events import (SUMMARY_DONE, SUMMARY_FAILED, SUMMARY_TTL, summary_channel,
+                                   summary_key)
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.Redis(
+    host=os.getenv("REDIS_HOST", "redis"), port=6379, decode_responses=True
+)
+
+def publish(form_id: str, payload: dict):
+    """
+    Store a form's summary payload and announce it to waiting clients.
+
+    The key and the message are written in one transaction. Redis errors are
+    logged and swallowed so a failed notification doesn't fail the task.
+
+    Args:
+        form_id (str): ID of the form the payload belongs to.
+        payload (dict): Payload with the form's `form_id` and summary `status`.
+    """
+    message = json.dumps(payload)
+    try:
+        with redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(summary_key(form_id), message, ex=SUMMARY_TTL)
+            pipe.publish(summary_channel(form_id), message)
+            pipe.execute()
+    except RedisError:
+        logger.warning(f"Failed to publish {payload['status']} summary")
+
+def publish_summary(form_id: str, summary: str):
+    """
+    Publish a form's completed summary.
+
+    Args:
+        form_id (str): ID of the form the summary belongs to.
+        summary (str): Generated clinical summary.
+    """
+    publish(form_id, {"form_id": form_id, "status": SUMMARY_DONE, "summary": summary})
+
+def publish_failure(form_id: str):
+    """
+    Publish that a form's summary won't be generated.
+
+    Called once its task is dead-lettered; the error itself is only
+    recorded on the form's document, not sent to clients.
+
+    Args:
+        form_id (str): ID of the form whose summary failed.
+    """
+    publish(form_id, {
+        "form_id": form_id,
+        "status": SUMMARY_FAILED,
+        "detail": "The summary could not be generated.",
+    })
@@ -1,55 +1,281 @@
 """
-RabbitMQ worker that listens for tasks and runs the summarize_patient_data function.
+RabbitMQ worker that listens for tasks and summarizes the patient forms they carry.
+
+Summaries are generated on a task thread while the connection thread keeps
+servicing the connection, so AMQP heartbeats flow during long generations;
+acknowledgements are handed back to the connection thread with
+`add_callback_threadsafe`. With RAG_BATCH_SIZE above 1 the worker prefetches
+up to that many messages, waits at most RAG_BATCH_WAIT_MS for a batch to
+fill, embeds the chunks of the whole batch in one pass and acknowledges each
+message as its summary is published.
+
+Heartbeats are sent every RABBITMQ_HEARTBEAT seconds. The broker's
+`consumer_timeout` (set in docker-compose) must exceed the longest batch,
+which LLM_TIMEOUT bounds per generation.
+
+With RAG_CONSUMER=async the worker instead runs an asyncio consumer: up to
+RAG_PREFETCH messages are in flight at once, embedding runs on a small thread
+pool, at most RAG_LLM_CONCURRENCY requests wait on the LLM, and each message
+is acknowledged as soon as its own summary is done.
+
+A task that fails is acknowledged and republished: transient failures to a
+delayed retry queue with exponential backoff, permanent failures and tasks
+out of attempts to the dead-letter queue (see `failures.py` and `broker.py`).
+
+Progress and the finished summary are also recorded on the form's MongoDB
+document through a coalescing `SummaryStatusWriter`. Stage latencies, task
+outcomes and queue lag are exported to Prometheus (see `metrics.py`).
 """
 
+import asyncio
+import functools
 import logging
 import json
 import os
 import pika
+import queue
+import signal
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pika.adapters.asyncio_connection import AsyncioConnection
 
 from common.logger import set_request_id, setup_logging
-from rag import summarize_patient_data
+from common.summary_events import SUMMARY_DONE, SUMMARY_FAILED, SUMMARY_PROCESSING
+from broker import TASK_QUEUE, connection_parameters, queue_declarations
+from case_index import case_index
+from failures import PermanentError, failure_route
+from metrics import (MESSAGES_FAILED, MESSAGES_PROCESSED, observe_delivery, observe_timings,
+                     start_metrics_server)
+from notify import publish_failure, publish_summary
+from rag import asummarize, missing_fields, normalize_form, summarize_batch
+from resources import LLM_MODEL, PROMPT_VERSION, format_timings, resources
+from status import SummaryStatusWriter, form_collection
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-RABBITMQ_DEFAULT_USER = os.getenv("RABBITMQ_DEFAULT_USER")
-RABBITMQ_DEFAULT_PASS = os.getenv("RABBITMQ_DEFAULT_PASS")
+RAG_BATCH_SIZE = max(1, int(os.getenv("RAG_BATCH_SIZE", "1")))
+RAG_BATCH_WAIT_MS = int(os.getenv("RAG_BATCH_WAIT_MS", "50"))
 
-# Create credentials object
-credentials = pika.PlainCredentials(RABBITMQ_DEFAULT_USER, RABBITMQ_DEFAULT_PASS)
+# "blocking" (default) or "async"
+RAG_CONSUMER = os.getenv("RAG_CONSUMER", "blocking").lower()
+RAG_PREFETCH = max(1, int(os.getenv("RAG_PREFETCH", "16")))
+RAG_LLM_CONCURRENCY = max(1, int(os.getenv("RAG_LLM_CONCURRENCY", "8")))
+# Torch and ONNX Runtime already use every core the worker has, so one thread is usually enough
+RAG_EXECUTOR_THREADS = max(1, int(os.getenv("RAG_EXECUTOR_THREADS", "1")))
 
-# Retry logic to wait for RabbitMQ to be ready
-for attempt in range(10):
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host="rabbitmq",
-                port=5672,
-                credentials=credentials
-            )
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue="rag_tasks", durable=True)
-        print("[*] Connected to RabbitMQ and queue declared.")
-        break
-    except pika.exceptions.AMQPConnectionError:
-        print(f"[!] RabbitMQ not ready. Retrying in 3 seconds... (Attempt {attempt + 1}/10)")
-        time.sleep(3)
-else:
+# Set once SIGTERM/SIGINT asks the worker to finish its current work and exit
+shutdown = threading.Event()
+
+# Created in run(), after the supervisor has forked this process
+status_writer: SummaryStatusWriter | None = None
+
+# Deliveries handed from the connection thread to the task thread; None stops it
+deliveries: queue.Queue = queue.Queue()
+
+def connect() -> tuple[pika.BlockingConnection, pika.adapters.blocking_connection.BlockingChannel]:
+    """
+    Connect to RabbitMQ and declare the task, retry and dead-letter queues,
+    retrying while it starts up.
+
+    Returns:
+        tuple: The connection and a channel on it.
+
+    Raises:
+        Exception: If RabbitMQ is still unreachable after 10 attempts.
+    """
+    # Retry logic to wait for RabbitMQ to be ready
+    for attempt in range(10):
+        try:
+            connection = pika.BlockingConnection(connection_parameters())
+            channel = connection.channel()
+            for name, arguments in queue_declarations():
+                channel.queue_declare(queue=name, durable=True, arguments=arguments)
+            print("[*] Connected to RabbitMQ and queue declared.")
+            return connection, channel
+        except pika.exceptions.AMQPConnectionError:
+            print(f"[!] RabbitMQ not ready. Retrying in 3 seconds... (Attempt {attempt + 1}/10)")
+            time.sleep(3)
     raise Exception("Failed to connect to RabbitMQ after 10 attempts.")
 
+def on_connection_thread(ch, action):
+    """
+    Run a channel operation on the thread that owns the connection.
+
+    A BlockingConnection may only be used from its own thread, so the
+    action is scheduled there with `add_callback_threadsafe`. Asyncio
+    channels are only used from the event loop and run it directly.
+
+    Args:
+        ch: pika.Channel - The channel the action uses.
+        action: Callable taking no arguments.
+    """
+    add_callback = getattr(ch.connection, "add_callback_threadsafe", None)
+    if add_callback is None:
+        action()
+    else:
+        add_callback(action)
+
+def acknowledge(ch, method):
+    """
+    Acknowledge a delivery from whichever thread finished it.
+
+    Args:
+        ch: pika.Channel - The channel the message was delivered on.
+        method: pika.spec.Basic.Deliver - Delivery method.
+    """
+    on_connection_thread(ch, functools.partial(ch.basic_ack, delivery_tag=method.delivery_tag))
+
+def parse_message(body) -> dict:
+    """
+    Decode a task message into report form data.
+
+    Args:
+        body: bytes - The message body, expected to be a JSON object.
+
+    Returns:
+        dict: Patient form data with report field names.
+
+    Raises:
+        PermanentError: If the body isn't a JSON object or lacks report fields.
+    """
+    print(f" [x] Received {body}")
+
+    try:
+        form_data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise PermanentError(f"Invalid JSON: {e}") from e
+    if not isinstance(form_data, dict):
+        raise PermanentError("Task message is not a JSON object")
+    form_data = normalize_form(form_data)
+    missing = missing_fields(form_data)
+    if missing:
+        raise PermanentError(f"Form is missing {', '.join(missing)}")
+    return form_data
+
+def form_id_of(form_data: dict | None, properties) -> str | None:
+    """
+    Return the ID of the form a task is about.
+
+    Args:
+        form_data (dict | None): Decoded message body, None if it couldn't be decoded.
+        properties: pika.spec.BasicProperties - Message properties.
+
+    Returns:
+        str | None: The form's `id`, falling back to the message ID.
+    """
+    return (form_data or {}).get("id") or properties.message_id
+
+def record_status(form_id: str | None, status: str, **fields):
+    """Queue a summary status update for a form, if it is known."""
+    if form_id and status_writer is not None:
+        status_writer.update(form_id, status, **fields)
+
+def complete(ch, method, form_id: str | None, summary: str, details: dict, timings: dict):
+    """
+    Publish and record a finished summary, then acknowledge its message.
+
+    Args:
+        ch: pika.Channel - The channel object.
+        method: pika.spec.Basic.Deliver - Delivery method.
+        form_id (str | None): ID of the form the summary belongs to.
+        summary (str): Generated clinical summary.
+        details (dict): Path taken and token count for the report.
+        timings (dict): Stage timings of the batch the form was part of.
+    """
+    logger.info(summary)
+    logger.info(f"Summary path={details['path']} tokens={details['tokens']}")
+    if form_id:
+        publish_summary(form_id, summary)
+    record_status(
+        form_id, SUMMARY_DONE,
+        text=summary, model=LLM_MODEL, prompt_version=PROMPT_VERSION,
+        path=details["path"], tokens=details["tokens"], timings=timings,
+    )
+    MESSAGES_PROCESSED.labels(details["path"]).inc()
+    acknowledge(ch, method)
+
+def fail(ch, method, properties, body, form_id: str | None, error: Exception):
+    """
+    Move a failed task to a retry queue or the dead-letter queue.
+
+    The message is republished with its attempt count and error in the
+    headers and then acknowledged, both on the connection's thread. Clients
+    waiting on a dead-lettered form are told its summary failed.
+
+    Args:
+        ch: pika.Channel - The channel object.
+        method: pika.spec.Basic.Deliver - Delivery method.
+        properties: pika.spec.BasicProperties - Message properties.
+        body: bytes - The message body, republished unchanged.
+        form_id (str | None): ID of the form the task is about.
+        error (Exception): The error the task failed with.
+    """
+    queue_name, new_properties, dead = failure_route(properties, error)
+    MESSAGES_FAILED.labels(new_properties.headers["x-failure"]).inc()
+    record_status(form_id, SUMMARY_FAILED, error=str(error), retrying=not dead)
+    if dead and form_id:
+        publish_failure(form_id)
+
+    def settle():
+        ch.basic_publish(exchange="", routing_key=queue_name, body=body, properties=new_properties)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    on_connection_thread(ch, settle)
+
+def process(ch, deliveries: list):
+    """
+    Summarize a batch of deliveries and complete or fail each one.
+
+    Args:
+        ch: pika.Channel - The channel object.
+        deliveries (list): `(method, properties, body)` tuples.
+    """
+    tasks = []
+    for method, properties, body in deliveries:
+        try:
+            form_data = parse_message(body)
+        except PermanentError as e:
+            fail(ch, method, properties, body, form_id_of(None, properties), e)
+            continue
+        form_id = form_id_of(form_data, properties)
+        record_status(form_id, SUMMARY_PROCESSING)
+        tasks.append((method, properties, body, form_id, form_data))
+    if not tasks:
+        return
+
+    timings, details = {}, []
+    try:
+        summaries = summarize_batch(
+            [form_data for *_, form_data in tasks], timings=timings, details=details
+        )
+    except Exception as e:
+        if len(tasks) > 1:
+            # Retry the reports one by one so a bad one doesn't fail the rest
+            logger.warning(f"Batch of {len(tasks)} failed with {type(e).__name__}, summarizing singly")
+            for method, properties, body, _, _ in tasks:
+                process(ch, [(method, properties, body)])
+            return
+        logger.exception("Summarization failed")
+        method, properties, body, form_id, _ = tasks[0]
+        fail(ch, method, properties, body, form_id, e)
+        return
+    logger.info(f"Batch of {len(tasks)} summary stages: {format_timings(timings)}")
+    observe_timings(timings)
+    timings = {**timings, "batch_size": len(tasks)}
+    for (method, _, _, form_id, _), summary, detail in zip(tasks, summaries, details):
+        complete(ch, method, form_id, summary, detail, timings)
 
 def callback(ch, method, properties, body):
     """
     RabbitMQ message callback function.
 
-    Processes a message from the 'rag_tasks' queue by:
-    - Parsing the message body as JSON to extract patient form data.
-    - Calling the summarize_patient_data function with the extracted data.
-    - Printing the resulting clinical summary.
-    - Acknowledging the message to RabbitMQ to mark it as processed.
+    Runs on the connection thread and only hands the delivery to the task
+    thread, which parses the form data, summarizes it, publishes and
+    records the summary keyed by the form's `id`, and acknowledges the
+    message.
 
     Args:
         ch: pika.Channel - The channel object.
@@ -57,21 +283,308 @@ def callback(ch, method, properties, body):
         properties: pika.spec.BasicProperties - Message properties.
         body: bytes - The message body received from the queue, expected to be a JSON string.
     """
-    print(f" [x] Received {body}")
+    observe_delivery(method, properties)
+    deliveries.put((method, properties, body))
+
+def next_batch(batch_size: int, wait_ms: int) -> list | None:
+    """
+    Wait for a delivery, then collect more until the batch is full or
+    `wait_ms` has passed since the first one.
+
+    Args:
+        batch_size (int): Largest number of messages summarized together.
+        wait_ms (int): Longest time to hold a message waiting for a full batch.
+
+    Returns:
+        list | None: `(method, properties, body)` tuples, or None once the
+            task thread has been told to stop and every delivery is handled.
+    """
+    first = deliveries.get()
+    if first is None:
+        return None
+    batch = [first]
+    deadline = time.monotonic() + wait_ms / 1000
+    while len(batch) < batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            delivery = deliveries.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if delivery is None:
+            # Keep the stop marker for the next call, after this batch
+            deliveries.put(None)
+            break
+        batch.append(delivery)
+    return batch
+
+class TaskThread(threading.Thread):
+    """
+    Summarizes deliveries in batches off the connection thread.
+
+    An exception ends the thread and is kept in `error`; its messages stay
+    unacknowledged and are redelivered once the connection closes.
+    """
+
+    def __init__(self, channel, batch_size: int, wait_ms: int):
+        """
+        Initialize the thread.
+
+        Args:
+            channel: pika.Channel - The consuming channel.
+            batch_size (int): Largest number of messages summarized together.
+            wait_ms (int): Longest time to hold a message waiting for a full batch.
+        """
+        super().__init__(name="rag-tasks", daemon=True)
+        self.channel = channel
+        self.batch_size = batch_size
+        self.wait_ms = wait_ms
+        self.error: Exception | None = None
+
+    def run(self):
+        """Process batches until a stop marker is received."""
+        try:
+            while (batch := next_batch(self.batch_size, self.wait_ms)) is not None:
+                process(self.channel, batch)
+        except Exception as e:
+            logger.exception("RAG task thread failed")
+            self.error = e
+
+def consume(connection, channel, batch_size: int, wait_ms: int):
+    """
+    Consume 'rag_tasks' until shutdown is requested or the task thread fails.
+
+    This thread only services the connection: it receives deliveries, sends
+    heartbeats and runs the acks scheduled by the task thread. On shutdown
+    the consumer is cancelled, the messages already received are finished
+    and acknowledged, and the function returns.
+
+    Args:
+        connection: pika.BlockingConnection - The worker's connection.
+        channel: pika.Channel - Channel with prefetch of at least `batch_size`.
+        batch_size (int): Largest number of messages summarized together.
+        wait_ms (int): Longest time to hold a message waiting for a full batch.
+
+    Raises:
+        Exception: The error that stopped the task thread.
+    """
+    tasks = TaskThread(channel, batch_size, wait_ms)
+    tasks.start()
+    consumer_tag = channel.basic_consume(queue=TASK_QUEUE, on_message_callback=callback)
+    while not shutdown.is_set() and tasks.is_alive():
+        connection.process_data_events(time_limit=1)
+
+    if tasks.is_alive():
+        channel.basic_cancel(consumer_tag)
+        # Messages received while stopping are summarized rather than redelivered
+        deliveries.put(None)
+        while tasks.is_alive():
+            connection.process_data_events(time_limit=0.1)
+    # Send the acks scheduled last
+    connection.process_data_events(time_limit=0)
+    if tasks.error is not None:
+        raise tasks.error
+
+def drain_on_signal():
+    """
+    Stop taking new messages on SIGTERM or SIGINT.
+
+    The messages being summarized are finished and acknowledged; prefetched
+    messages that were never processed are returned to the queue when the
+    consumer is cancelled.
+    """
+    def handle(signum, frame):
+        if shutdown.is_set():
+            return
+        logger.info(f"Received signal {signum}, draining RAG worker")
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+def resolve(future: asyncio.Future, result):
+    """Resolve a future from a pika callback, unless it is already done."""
+    if not future.done():
+        future.set_result(result)
+
+def open_failed(opened: asyncio.Future, connection, error):
+    """Fail a connection attempt's `opened` future."""
+    if not opened.done():
+        opened.set_exception(pika.exceptions.AMQPConnectionError(error))
+
+def connection_closed(closed: asyncio.Future, connection, reason):
+    """Resolve a connection's `closed` future with the reason."""
+    resolve(closed, reason)
+
+async def connect_async(prefetch: int) -> tuple[AsyncioConnection, pika.channel.Channel, asyncio.Future]:
+    """
+    Connect with pika's asyncio adapter, declare the queues and set the
+    prefetch, retrying while RabbitMQ starts up.
+
+    Args:
+        prefetch (int): Unacknowledged messages the broker may send at once.
 
+    Returns:
+        tuple: The connection, a channel on it, and a future resolved with
+            the reason when the connection closes.
+
+    Raises:
+        Exception: If RabbitMQ is still unreachable after 10 attempts.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(10):
+        opened, closed = loop.create_future(), loop.create_future()
+        connection = AsyncioConnection(
+            connection_parameters(),
+            # Each attempt's callbacks are bound to its own futures, so a late
+            # callback from an earlier failed connection can't resolve them
+            on_open_callback=functools.partial(resolve, opened),
+            on_open_error_callback=functools.partial(open_failed, opened),
+            on_close_callback=functools.partial(connection_closed, closed),
+            custom_ioloop=loop,
+        )
+        try:
+            await opened
+        except pika.exceptions.AMQPConnectionError:
+            print(f"[!] RabbitMQ not ready. Retrying in 3 seconds... (Attempt {attempt + 1}/10)")
+            await asyncio.sleep(3)
+            continue
+
+        channel_opened = loop.create_future()
+        connection.channel(on_open_callback=channel_opened.set_result)
+        channel = await channel_opened
+        for name, arguments in queue_declarations():
+            declared = loop.create_future()
+            channel.queue_declare(queue=name, durable=True, arguments=arguments,
+                                  callback=declared.set_result)
+            await declared
+        qos_set = loop.create_future()
+        channel.basic_qos(prefetch_count=prefetch, callback=qos_set.set_result)
+        await qos_set
+        print("[*] Connected to RabbitMQ and queue declared.")
+        return connection, channel, closed
+    raise Exception("Failed to connect to RabbitMQ after 10 attempts.")
+
+async def process_async(ch, method, properties, body, executor: ThreadPoolExecutor,
+                        llm_slots: asyncio.Semaphore):
+    """
+    Summarize one delivery and acknowledge it as soon as it is done.
+
+    A failed summary is routed to a retry queue or the dead-letter queue.
+
+    Args:
+        ch: pika.Channel - The channel object.
+        method: pika.spec.Basic.Deliver - Delivery method.
+        properties: pika.spec.BasicProperties - Message properties.
+        body: bytes - The message body, expected to be a JSON string.
+        executor (ThreadPoolExecutor): Executor for embedding and indexing.
+        llm_slots (asyncio.Semaphore): Bounds concurrent LLM requests.
+    """
+    form_id = form_id_of(None, properties)
     try:
-        # Assume body is JSON string representing form_data dict
-        form_data = json.loads(body)
-    except json.JSONDecodeError:
-        print(" [!] Received invalid JSON, ignoring message")
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        form_data = parse_message(body)
+        form_id = form_id_of(form_data, properties)
+        record_status(form_id, SUMMARY_PROCESSING)
+        timings, details = {}, {}
+        summary = await asummarize(
+            form_data, executor=executor, llm_slots=llm_slots, timings=timings, details=details
+        )
+    except Exception as e:
+        logger.exception(f"Summary of form {form_id} failed")
+        fail(ch, method, properties, body, form_id, e)
         return
-    summary = summarize_patient_data(form_data=form_data)
-    logger.info(summary)
-    ch.basic_ack(delivery_tag=method.delivery_tag)
+    logger.info(f"Summary stages: {format_timings(timings)}")
+    observe_timings(timings)
+    complete(ch, method, form_id, summary, details, timings)
+
+async def consume_async(prefetch: int, concurrency: int, threads: int):
+    """
+    Consume 'rag_tasks' with many summaries in flight until asked to stop.
+
+    Every delivery becomes its own task, so the worker keeps up to
+    `prefetch` reports moving while earlier ones wait on the LLM. On
+    SIGTERM or SIGINT the consumer is cancelled and the tasks already
+    started are finished and acknowledged before the connection closes.
+
+    Args:
+        prefetch (int): Unacknowledged messages held at once.
+        concurrency (int): Largest number of concurrent LLM requests.
+        threads (int): Threads for embedding and indexing.
+
+    Raises:
+        pika.exceptions.AMQPConnectionError: If the connection is lost
+            while consuming.
+    """
+    loop = asyncio.get_running_loop()
+    connection, channel, closed = await connect_async(prefetch)
+    llm_slots = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="rag-cpu")
+    tasks = set()
+
+    def on_message(ch, method, properties, body):
+        observe_delivery(method, properties)
+        task = loop.create_task(process_async(ch, method, properties, body, executor, llm_slots))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    consumer_tag = channel.basic_consume(queue=TASK_QUEUE, on_message_callback=on_message)
+
+    stopping = asyncio.Event()
+    def handle(signum):
+        if shutdown.is_set():
+            return
+        logger.info(f"Received signal {signum}, draining RAG worker")
+        shutdown.set()
+        stopping.set()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, handle, signum)
+
+    stop_requested = loop.create_task(stopping.wait())
+    await asyncio.wait([stop_requested, closed], return_when=asyncio.FIRST_COMPLETED)
+    stop_requested.cancel()
+    if not closed.done():
+        cancelled = loop.create_future()
+        channel.basic_cancel(consumer_tag, callback=cancelled.set_result)
+        await cancelled
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    executor.shutdown()
+
+    if not closed.done():
+        connection.close()
+        await closed
+    elif not shutdown.is_set():
+        raise pika.exceptions.AMQPConnectionError(closed.result())
+
+def run():
+    """
+    Load the RAG resources, then consume 'rag_tasks' until asked to stop.
+    """
+    global status_writer
+
+    # Load models and clients before taking any message off the queue
+    resources.load()
+    if case_index is not None:
+        case_index.load()
+    status_writer = SummaryStatusWriter(form_collection())
+
+    if RAG_CONSUMER == "async":
+        print("[*] RAG Worker listening for tasks (async)...")
+        asyncio.run(consume_async(RAG_PREFETCH, RAG_LLM_CONCURRENCY, RAG_EXECUTOR_THREADS))
+    else:
+        connection, channel = connect()
+        drain_on_signal()
+        channel.basic_qos(prefetch_count=RAG_BATCH_SIZE)
+
+        print("[*] RAG Worker listening for tasks...")
+        consume(connection, channel, RAG_BATCH_SIZE, RAG_BATCH_WAIT_MS)
+        connection.close()
 
-channel.basic_qos(prefetch_count=1)
-channel.basic_consume(queue="rag_tasks", on_message_callback=callback)
+    status_writer.close()
+    logger.info("RAG worker stopped")
 
-print("[*] RAG Worker listening for tasks...")
-channel.start_consuming()
+if __name__ == "__main__":
+    # Under the supervisor, the supervisor serves the metrics of every worker
+    start_metrics_server()
+    run()
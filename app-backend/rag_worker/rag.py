@@ -6,23 +6,83 @@ It creates vector embeddings of clinical notes and generates concise summaries
 via a RetrievalQA chain using a local ChatOpenAI-compatible model.
 
 Functions:
+- normalize_form / missing_fields: Map submitted form keys to report fields and validate them.
 - format_patient_template: Formats raw patient input into a structured string.
 - prepare_documents: Splits the input text into smaller chunks for embedding.
 - build_vectorstore: Builds a FAISS vectorstore using HuggingFace embeddings.
+- build_vectorstores: Builds one vectorstore per report from a single embedding batch.
+- case_text / format_similar_cases: Embed a report for, and present results from, the case index.
+- find_similar_cases: Embeds reports once and looks up similar past cases.
 - get_prompt_template: Returns a structured clinical prompt template.
 - build_qa_chain: Creates a RetrievalQA chain using the prompt and retriever.
+- full_report_chain / summarize_full_report: Summarize a report that fits in the prompt as a whole.
+- choose_path: Picks full-report or retrieval summarization for a report.
+- prepare_reports: Runs every stage before the LLM call for several reports.
+- summary_chain: Builds the chain that summarizes a prepared report.
+- chain_timer: Times a summary chain call, separating retrieval from the LLM.
+- index_reports: Adds summarized reports to the case index.
+- index_cached_reports: Adds reports answered from the summary cache to the case index.
+- generate_summaries: Summarizes several reports, embedding all their chunks at once.
+- summarize_batch: Like generate_summaries, but answers repeated reports from the summary cache.
+- asummarize: Async summary of one report for the asyncio consumer.
 - summarize_patient_data: High-level interface to summarize the patient data.
+
+In the default adaptive mode a report whose tokens fit within
+RAG_CONTEXT_TOKEN_BUDGET is passed to the model whole; chunked retrieval is
+only used for oversized reports, where it keeps the prompt within the
+model's context window.
+
+Each report is also embedded once and looked up in the persistent case index
+(`case_index`), so summaries can draw on similar past cases from the same
+province; the report is then added to the index.
+
+Models, clients and the prompt come from the worker-level registry in
+`resources`, so they are created once per process rather than per message.
 """
+import asyncio
+import contextlib
+import os
+import time
+from collections.abc import Iterator
+from concurrent.futures import Executor
+from operator import itemgetter
 from typing import Optional
+from uuid import UUID
 
 from langchain.chains import RetrievalQA
+from langchain.embeddings.base import Embeddings
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
-from langchain.schema.runnable import Runnable
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema.runnable import Runnable, RunnableLambda
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI
+
+from case_index import case_index
+from embedding_cache import record_stats
+from resources import resources, stage_timer
+from summary_cache import REPORT_FIELDS, summary_cache
+
+# "adaptive" picks per report; "full" and "retrieval" force one path
+RAG_MODE = os.getenv("RAG_MODE", "adaptive").lower()
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "2048"))
+
+PATH_FULL = "full"
+PATH_RETRIEVAL = "retrieval"
+PATH_CACHE = "cache"
+
+SIMILAR_CASES_K = int(os.getenv("SIMILAR_CASES_K", "3"))
+SIMILAR_CASE_MAX_CHARS = 400
+
+SUMMARY_QUESTION = "Summarize this patient's diagnosis and symptoms."
+
+# Keys the form_submission service sends, mapped to the report fields used here
+FORM_FIELD_ALIASES = {
+    "ageIdentity": "age_group",
+    "statusSymptom": "disease_symptoms",
+    "statusCondition": "current_condition",
+    "statusDisease": "disease_status",
+}
 
 # Mocked form data
 form_data = {
@@ -52,6 +112,28 @@ form_data = {
                     "leeping patterns have been disturbed, and anxiety due to illness has made the patient irritable. No signs of severe respiratory distress yet.",
   }
 
+def normalize_form(form_data: dict) -> dict:
+    """
+    Rename the keys of a submitted form to the report fields.
+
+    Args:
+        form_data (dict): Form data as published by form_submission.
+
+    Returns:
+        dict: A copy with `FORM_FIELD_ALIASES` keys renamed; fields already
+            present under their report name are kept.
+    """
+    form = dict(form_data)
+    for alias, field in FORM_FIELD_ALIASES.items():
+        if alias in form:
+            value = form.pop(alias)
+            form.setdefault(field, value)
+    return form
+
+def missing_fields(form_data: dict) -> list[str]:
+    """Report fields a form lacks."""
+    return [field for field in REPORT_FIELDS if field not in form_data]
+
 def format_patient_template(form_data: dict) -> str:
     """
     Format the patient data dictionary into a structured diagnostic report string.
@@ -80,6 +162,44 @@ def format_patient_template(form_data: dict) -> str:
     {form_data['disease_status']}
     """
 
+def case_text(form_data: dict) -> str:
+    """
+    Text embedded for a report in the case index: its clinical fields.
+
+    Args:
+        form_data (dict): Patient form data.
+
+    Returns:
+        str: Symptoms, condition and status notes.
+    """
+    return "\n".join(
+        str(form_data.get(field, ""))
+        for field in ("disease_symptoms", "current_condition", "disease_status")
+    )
+
+def format_similar_cases(cases: list[dict]) -> str:
+    """
+    Render similar past cases as an extra report section, with each past
+    summary cut to SIMILAR_CASE_MAX_CHARS.
+
+    Args:
+        cases (list[dict]): Case index results.
+
+    Returns:
+        str: The section, or an empty string when there are no cases.
+    """
+    if not cases:
+        return ""
+    lines = [
+        f"    - {case['district']}, {case['province']} (similarity {case['score']:.2f}): "
+        f"{(case['summary'] or '')[:SIMILAR_CASE_MAX_CHARS]}"
+        for case in cases
+    ]
+    return (
+        "\n    Similar Past Cases (other patients, for reference only):\n"
+        + "\n".join(lines) + "\n"
+    )
+
 def prepare_documents(text: str) -> list[Document]:
     """
     Split a large text into smaller document chunks using a recursive character splitter.
@@ -90,23 +210,62 @@ def prepare_documents(text: str) -> list[Document]:
     Returns:
         list[Document]: A list of smaller Document chunks with metadata.
     """
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
     document = Document(page_content=text, metadata={"source": "patient_001"})
-    return splitter.split_documents([document])
+    return resources.splitter.split_documents([document])
 
 
-def build_vectorstore(documents: list[Document]) -> FAISS:
+def build_vectorstore(documents: list[Document],
+                      embedding: Optional[Embeddings] = None) -> FAISS:
     """
     Create a FAISS vector store from a list of LangChain Documents.
 
     Args:
         documents (list[Document]): List of document chunks to be embedded.
+        embedding (Optional[Embeddings], optional): Embedding model to use.
+            Defaults to the worker's shared HuggingFace model.
 
     Returns:
         FAISS: A FAISS vector store with embedded document representations.
     """
-    embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    return FAISS.from_documents(documents, embedding=embedding)
+    return FAISS.from_documents(documents, embedding=embedding or resources.embeddings)
+
+def build_vectorstores(document_lists: list[list[Document]],
+                       embedding: Optional[Embeddings] = None,
+                       timings: Optional[dict] = None) -> list[FAISS]:
+    """
+    Create one FAISS vector store per report, embedding every chunk in one call.
+
+    The embedding model is far more efficient on large batches than on the
+    handful of chunks a single report produces.
+
+    Args:
+        document_lists (list[list[Document]]): Document chunks of each report.
+        embedding (Optional[Embeddings], optional): Embedding model to use.
+            Defaults to the worker's shared HuggingFace model.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent embedding (`embed`) and building the stores (`vectorstore`).
+
+    Returns:
+        list[FAISS]: A vector store for each entry of `document_lists`.
+    """
+    embedding = embedding or resources.embeddings
+    texts = [document.page_content for documents in document_lists for document in documents]
+    if not texts:
+        return []
+    with stage_timer(timings, "embed"):
+        vectors = embedding.embed_documents(texts)
+
+    stores, offset = [], 0
+    with stage_timer(timings, "vectorstore"):
+        for documents in document_lists:
+            end = offset + len(documents)
+            stores.append(FAISS.from_embeddings(
+                zip(texts[offset:end], vectors[offset:end]),
+                embedding,
+                metadatas=[document.metadata for document in documents],
+            ))
+            offset = end
+    return stores
 
 def get_prompt_template() -> PromptTemplate:
     """
@@ -118,27 +277,7 @@ def get_prompt_template() -> PromptTemplate:
     Returns:
         PromptTemplate: The LangChain prompt template object.
     """
-    return PromptTemplate(
-        input_variables=["context", "question"],
-        template="""
-            You are a professional clinical assistant supporting doctors in a digital health surveillance system.
-
-            Your goal is to analyze the provided patient notes and return a medically sound, concise summary. Include:
-            - Key symptoms
-            - Likely diagnosis
-            - Any critical warning signs
-            - Suggested follow-ups or lab tests (if applicable)
-
-            Only use the given context and do not make up any new information.
-
-            Context:
-            {context}
-
-            Question: {question}
-
-            Answer (Clinical Summary):
-            """
-    )
+    return resources.prompt
 
 def build_qa_chain(llm, retriever) -> RetrievalQA:
     """
@@ -159,30 +298,401 @@ def build_qa_chain(llm, retriever) -> RetrievalQA:
         chain_type_kwargs={"prompt": prompt}
     )
 
-def summarize_patient_data(form_data: dict, llm:Optional[Runnable]=None) -> str:
+def find_similar_cases(forms: list[dict]) -> tuple[list, list[list[dict]]]:
     """
-    Generate a clinical summary from patient form data using a RetrievalQA chain.
+    Embed reports for the case index and find similar past cases.
 
     Args:
-        form_data (dict): Patient information and medical notes.
+        forms (list[dict]): Patient form data.
+
+    Returns:
+        tuple[list, list[list[dict]]]: The embedding of each report and its
+            most similar past cases from the same province.
+    """
+    vectors = resources.embeddings.embed_documents([case_text(form_data) for form_data in forms])
+    similar = [
+        case_index.search(vector, SIMILAR_CASES_K,
+                          provinces=[form_data.get("province")], exclude=form_data.get("id"))
+        for form_data, vector in zip(forms, vectors)
+    ]
+    return vectors, similar
+
+def full_report_chain(llm: Runnable) -> Runnable:
+    """
+    Chain that summarizes a report placed whole in the prompt context.
+
+    Args:
+        llm (Runnable): Language model to use.
+
+    Returns:
+        Runnable: Prompt, model and string parser, taking `context` and `question`.
+    """
+    return get_prompt_template() | llm | StrOutputParser()
+
+def summarize_full_report(report: str, llm: Runnable) -> str:
+    """
+    Summarize a report by placing all of it in the prompt context.
+
+    Args:
+        report (str): Formatted patient report.
+        llm (Runnable): Language model to use.
+
+    Returns:
+        str: Clinical summary generated by the model.
+    """
+    return full_report_chain(llm).invoke({"context": report, "question": SUMMARY_QUESTION})
+
+def choose_path(tokens: int, mode: str = RAG_MODE,
+                budget: int = RAG_CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Decide how a report is summarized.
+
+    Args:
+        tokens (int): Token count of the formatted report.
+        mode (str): `adaptive`, `full` or `retrieval`.
+        budget (int): Largest report, in tokens, sent whole in adaptive mode.
+
+    Returns:
+        str: `PATH_FULL` or `PATH_RETRIEVAL`.
+    """
+    if mode == PATH_FULL:
+        return PATH_FULL
+    if mode == PATH_RETRIEVAL or tokens > budget:
+        return PATH_RETRIEVAL
+    return PATH_FULL
+
+def prepare_reports(forms: list[dict], timings: Optional[dict] = None,
+                    details: Optional[list] = None) -> tuple[list[dict], Optional[list]]:
+    """
+    Do the CPU-bound work of summarizing reports, up to the LLM call.
+
+    Similar past cases are added to each report, the summarization path is
+    chosen, and the chunks of every report taking the retrieval path are
+    embedded in one batch.
+
+    Args:
+        forms (list[dict]): Patient information and medical notes, one dict per form.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent in each stage (`similar`, `format`, `tokens`, `split`, `embed`,
+            `vectorstore`), and `embed_saved`, the model time saved by the
+            embedding cache.
+        details (Optional[list], optional): List that receives, for each form,
+            a dict with the chosen `path` and the report's `tokens`.
+
+    Returns:
+        tuple[list[dict], Optional[list]]: For each form its `template`,
+            `path` and `vectorstore` (None on the full path), and the report
+            embeddings for the case index (None when it is disabled).
+    """
+    with record_stats(timings):
+        similar, case_vectors = [[] for _ in forms], None
+        if case_index is not None:
+            with stage_timer(timings, "similar"):
+                case_vectors, similar = find_similar_cases(forms)
+        with stage_timer(timings, "format"):
+            templates = [
+                format_patient_template(form_data) + format_similar_cases(cases)
+                for form_data, cases in zip(forms, similar)
+            ]
+        with stage_timer(timings, "tokens"):
+            token_counts = [resources.count_tokens(template) for template in templates]
+        paths = [choose_path(tokens) for tokens in token_counts]
+        if details is not None:
+            details.extend(
+                {"path": path, "tokens": tokens} for path, tokens in zip(paths, token_counts)
+            )
+
+        retrieval = [index for index, path in enumerate(paths) if path == PATH_RETRIEVAL]
+        vectorstores = {}
+        if retrieval:
+            with stage_timer(timings, "split"):
+                document_lists = [prepare_documents(templates[index]) for index in retrieval]
+            vectorstores = dict(zip(retrieval, build_vectorstores(document_lists, timings=timings)))
+
+        reports = [
+            {"template": template, "path": path, "vectorstore": vectorstores.get(index)}
+            for index, (template, path) in enumerate(zip(templates, paths))
+        ]
+    return reports, case_vectors
+
+def summary_chain(report: dict, llm: Runnable) -> tuple[Runnable, dict]:
+    """
+    Build the chain that summarizes a prepared report.
+
+    Args:
+        report (dict): A report from `prepare_reports`.
+        llm (Runnable): Language model to use.
+
+    Returns:
+        tuple[Runnable, dict]: The chain, returning the summary text, and its input.
+    """
+    if report["path"] == PATH_FULL:
+        return full_report_chain(llm), {"context": report["template"], "question": SUMMARY_QUESTION}
+    retriever = report["vectorstore"].as_retriever(search_type="similarity", k=3)
+    chain = build_qa_chain(llm, retriever) | RunnableLambda(itemgetter("result"))
+    return chain, {"query": SUMMARY_QUESTION}
+
+class RetrievalTimer(BaseCallbackHandler):
+    """
+    Callback handler adding up the time a chain spends in its retrievers.
+    """
+
+    # Called on the chain's own thread or loop rather than an executor
+    run_inline = True
+
+    def __init__(self):
+        """Initialize with no time recorded."""
+        self.seconds = 0.0
+        self._started: dict[UUID, float] = {}
+
+    def on_retriever_start(self, serialized, query, *, run_id: UUID, **kwargs):
+        """Note when a retriever call starts."""
+        self._started[run_id] = time.perf_counter()
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs):
+        """Add the duration of a finished retriever call."""
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.seconds += time.perf_counter() - started
+
+    on_retriever_error = on_retriever_end
+
+@contextlib.contextmanager
+def chain_timer(timings: Optional[dict]) -> Iterator[dict]:
+    """
+    Time a summary chain call, split into `retrieval` and `llm`.
+
+    Args:
+        timings (Optional[dict]): Dict receiving the seconds spent in the
+            chain's retrievers (`retrieval`, absent on the full-report path)
+            and the rest of the call (`llm`).
+
+    Yields:
+        dict: Config to invoke the chain with.
+    """
+    retrieval = RetrievalTimer()
+    start = time.perf_counter()
+    try:
+        yield {"callbacks": [retrieval]}
+    finally:
+        if timings is not None:
+            elapsed = time.perf_counter() - start
+            if retrieval.seconds:
+                timings["retrieval"] = timings.get("retrieval", 0.0) + retrieval.seconds
+            timings["llm"] = timings.get("llm", 0.0) + elapsed - retrieval.seconds
+
+def index_reports(forms: list[dict], summaries: list[str], case_vectors: Optional[list],
+                  timings: Optional[dict] = None):
+    """
+    Add summarized reports to the case index.
+
+    Args:
+        forms (list[dict]): Patient form data.
+        summaries (list[str]): Summary of each form.
+        case_vectors (Optional[list]): Report embeddings from `prepare_reports`.
+        timings (Optional[dict], optional): Dict that receives the `index` stage time.
+    """
+    if case_index is None:
+        return
+    with stage_timer(timings, "index"):
+        case_index.add([
+            {
+                "form_id": form_data.get("id"),
+                "province": form_data.get("province"),
+                "district": form_data.get("district"),
+                "summary": summary,
+            }
+            for form_data, summary in zip(forms, summaries)
+        ], case_vectors)
+
+def index_cached_reports(forms: list[dict], summaries: list[str],
+                         timings: Optional[dict] = None):
+    """
+    Add reports answered from the summary cache to the case index.
+
+    Their case text is embedded here since `prepare_reports` didn't run for
+    them; a resubmitted report usually hits the embedding cache.
+
+    Args:
+        forms (list[dict]): Patient form data.
+        summaries (list[str]): Cached summary of each form.
+        timings (Optional[dict], optional): Dict that receives the `similar`
+            and `index` stage times.
+    """
+    if case_index is None or not forms:
+        return
+    with record_stats(timings), stage_timer(timings, "similar"):
+        vectors = resources.embeddings.embed_documents([case_text(form_data) for form_data in forms])
+    index_reports(forms, summaries, vectors, timings)
+
+def generate_summaries(forms: list[dict], llm: Optional[Runnable] = None,
+                       timings: Optional[dict] = None,
+                       details: Optional[list] = None) -> list[str]:
+    """
+    Generate clinical summaries for several patient forms.
+
+    Similar past cases are added to each report first. Reports within the
+    token budget are then summarized whole. The chunks of all larger reports
+    are embedded in one batch, then each report is answered by a RetrievalQA
+    chain over its own chunks. Finally the reports are added to the case index.
+
+    Args:
+        forms (list[dict]): Patient information and medical notes, one dict per form.
         llm (Optional[Runnable], optional): Language model instance to use.
-            If None, a default ChatOpenAI instance is created. Defaults to None.
+            If None, the worker's shared ChatOpenAI client is used. Defaults to None.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent in each stage (`similar`, `format`, `tokens`, `split`, `embed`,
+            `vectorstore`, `chain`, `retrieval`, `llm`, `index`), summed over
+            the batch. Stages no form needed are absent.
+        details (Optional[list], optional): List that receives, for each form,
+            a dict with the chosen `path` and the report's `tokens`.
 
     Returns:
-        str: Clinical summary generated by the QA chain.
+        list[str]: Clinical summaries, in the order of `forms`.
     """
-    template = format_patient_template(form_data)
-    documents = prepare_documents(template)
-    vectorstore = build_vectorstore(documents)
-    retriever = vectorstore.as_retriever(search_type="similarity", k=3)
+    llm = llm or resources.llm
+    reports, case_vectors = prepare_reports(forms, timings, details)
+    summaries = []
+    for report in reports:
+        with stage_timer(timings, "chain"):
+            chain, inputs = summary_chain(report, llm)
+        with chain_timer(timings) as config:
+            summaries.append(chain.invoke(inputs, config=config))
+    index_reports(forms, summaries, case_vectors, timings)
+    return summaries
+
+def summarize_batch(forms: list[dict], llm: Optional[Runnable] = None,
+                    timings: Optional[dict] = None,
+                    details: Optional[list] = None) -> list[str]:
+    """
+    Generate clinical summaries, reusing cached ones for repeated reports.
+
+    Reports found in the summary cache skip chunking and generation and are
+    only embedded for the case index; the rest go through
+    `generate_summaries` and are cached afterwards.
 
-    if llm is None:
-        llm = ChatOpenAI(
-            base_url="http://host.docker.internal:12434/engines/v1", # using docker model runner
-            model="ai/smollm2",
-            api_key="not-needed"
+    Args:
+        forms (list[dict]): Patient information and medical notes, one dict per form.
+        llm (Optional[Runnable], optional): Language model instance to use.
+            If None, the worker's shared ChatOpenAI client is used. Defaults to None.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent in each stage, summed over the batch, including `cache`.
+        details (Optional[list], optional): List that receives, for each form,
+            a dict with the chosen `path` (`cache` for hits) and the report's
+            `tokens` (None for hits).
+
+    Returns:
+        list[str]: Clinical summaries, in the order of `forms`.
+    """
+    if summary_cache is None:
+        return generate_summaries(forms, llm, timings, details)
+
+    with stage_timer(timings, "cache"):
+        summaries = [summary_cache.get(form_data) for form_data in forms]
+    misses = [index for index, summary in enumerate(summaries) if summary is None]
+    miss_details = []
+    if misses:
+        generated = generate_summaries(
+            [forms[index] for index in misses], llm, timings, miss_details
+        )
+        with stage_timer(timings, "cache"):
+            for index, summary in zip(misses, generated):
+                summary_cache.set(forms[index], summary)
+                summaries[index] = summary
+    missed = set(misses)
+    hits = [index for index in range(len(forms)) if index not in missed]
+    index_cached_reports([forms[index] for index in hits], [summaries[index] for index in hits], timings)
+
+    if details is not None:
+        generated_details = dict(zip(misses, miss_details))
+        details.extend(
+            generated_details.get(index, {"path": PATH_CACHE, "tokens": None})
+            for index in range(len(forms))
         )
+    return summaries
+
+async def asummarize(form_data: dict, llm: Optional[Runnable] = None,
+                     executor: Optional[Executor] = None,
+                     llm_slots: Optional[asyncio.Semaphore] = None,
+                     timings: Optional[dict] = None,
+                     details: Optional[dict] = None) -> str:
+    """
+    Generate a clinical summary without blocking the event loop.
 
-    qa_chain = build_qa_chain(llm, retriever)
-    response = qa_chain.invoke("Summarize this patient's diagnosis and symptoms.")
-    return response["result"]
+    Cache lookups run on the loop's default executor, embedding and indexing
+    on `executor`, and the LLM is awaited directly while holding a slot of
+    `llm_slots`, so many reports can wait on the model at once.
+
+    Args:
+        form_data (dict): Patient information and medical notes.
+        llm (Optional[Runnable], optional): Language model instance to use.
+            If None, the worker's shared ChatOpenAI client is used. Defaults to None.
+        executor (Optional[Executor], optional): Executor for CPU-bound stages.
+            Defaults to the loop's default executor.
+        llm_slots (Optional[asyncio.Semaphore], optional): Bounds concurrent LLM requests.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent in each stage, as in `summarize_batch`.
+        details (Optional[dict], optional): Dict that receives the chosen
+            `path` and the report's `tokens`.
+
+    Returns:
+        str: Clinical summary generated by the model.
+    """
+    llm = llm or resources.llm
+    loop = asyncio.get_running_loop()
+    if details is None:
+        details = {}
+
+    if summary_cache is not None:
+        with stage_timer(timings, "cache"):
+            summary = await loop.run_in_executor(None, summary_cache.get, form_data)
+        if summary is not None:
+            details.update({"path": PATH_CACHE, "tokens": None})
+            await loop.run_in_executor(executor, index_cached_reports, [form_data], [summary], timings)
+            return summary
+
+    report_details = []
+    reports, case_vectors = await loop.run_in_executor(
+        executor, prepare_reports, [form_data], timings, report_details
+    )
+    details.update(report_details[0])
+    with stage_timer(timings, "chain"):
+        chain, inputs = summary_chain(reports[0], llm)
+    async with llm_slots or contextlib.nullcontext():
+        with chain_timer(timings) as config:
+            summary = await chain.ainvoke(inputs, config=config)
+
+    await loop.run_in_executor(executor, index_reports, [form_data], [summary], case_vectors, timings)
+    if summary_cache is not None:
+        with stage_timer(timings, "cache"):
+            await loop.run_in_executor(None, summary_cache.set, form_data, summary)
+    return summary
+
+def summarize_patient_data(form_data: dict, llm:Optional[Runnable]=None,
+                           timings: Optional[dict] = None,
+                           details: Optional[dict] = None) -> str:
+    """
+    Generate a clinical summary from patient form data.
+
+    Reports within the token budget are summarized whole; larger ones go
+    through a RetrievalQA chain over their chunks.
+
+    Args:
+        form_data (dict): Patient information and medical notes.
+        llm (Optional[Runnable], optional): Language model instance to use.
+            If None, the worker's shared ChatOpenAI client is used. Defaults to None.
+        timings (Optional[dict], optional): Dict that receives the seconds
+            spent in each stage (`format`, `tokens`, `split`, `embed`,
+            `vectorstore`, `chain`, `retrieval`, `llm`). Stages skipped by the
+            chosen path are absent.
+        details (Optional[dict], optional): Dict that receives the chosen
+            `path` and the report's `tokens`.
+
+    Returns:
+        str: Clinical summary generated by the model.
+    """
+    batch_details = []
+    summary, = summarize_batch([form_data], llm, timings, batch_details)
+    if details is not None:
+        details.update(batch_details[0])
+    return summary
@@ -0,0 +1,199 @@
+"""
+Worker-level registry of models and clients used by the RAG pipeline.
+
+Loading the embedding model takes seconds, so the embedding model, text
+splitter, prompt template, tokenizer and LLM client are created once per
+worker process and reused for every message. `load()` is called at worker
+start, optionally with a warm-up inference; anything not loaded yet is
+created on first use. EMBEDDING_BACKEND selects the embedding implementation
+(see `embeddings.py`), which is wrapped in the chunk embedding cache of
+`embedding_cache.py` unless EMBEDDING_CACHE_ENABLED is false.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import tiktoken
+from langchain.prompts import PromptTemplate
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
+from langchain_openai import ChatOpenAI
+
+from embedding_cache import EMBEDDING_CACHE_ENABLED, CachedEmbeddings
+from embeddings import EMBEDDING_BACKEND, make_embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://host.docker.internal:12434/engines/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "ai/smollm2")
+# Seconds one LLM request may take; keeps a batch within the broker's consumer_timeout
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+RAG_WARM_UP = os.getenv("RAG_WARM_UP", "true").lower() == "true"
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+PROMPT_TEMPLATE = """
+            You are a professional clinical assistant supporting doctors in a digital health surveillance system.
+
+            Your goal is to analyze the provided patient notes and return a medically sound, concise summary. Include:
+            - Key symptoms
+            - Likely diagnosis
+            - Any critical warning signs
+            - Suggested follow-ups or lab tests (if applicable)
+
+            Only use the given context and do not make up any new information.
+
+            Context:
+            {context}
+
+            Question: {question}
+
+            Answer (Clinical Summary):
+            """
+
+# Recorded with each summary so results can be traced to the prompt that made them
+PROMPT_VERSION = hashlib.sha256(PROMPT_TEMPLATE.encode()).hexdigest()[:12]
+
+@contextmanager
+def stage_timer(timings: dict | None, stage: str) -> Iterator[None]:
+    """
+    Record how long a pipeline stage takes.
+
+    Args:
+        timings (dict | None): Dict receiving `stage` -> seconds. Nothing is
+            recorded when None.
+        stage (str): Stage name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def format_timings(timings: dict) -> str:
+    """Render stage timings for a log line, e.g. `embed=0.120s llm=2.300s`."""
+    return " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
+
+class WorkerResources:
+    """
+    Lazily created, process-wide RAG resources.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._splitter = None
+        self._prompt = None
+        self._llm = None
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self.load_timings: dict[str, float] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Sentence-transformer embedding model on the configured backend, behind the cache."""
+        if self._embeddings is None:
+            with self._lock, stage_timer(self.load_timings, "embeddings"):
+                if self._embeddings is None:
+                    embeddings = make_embeddings(
+                        EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
+                    )
+                    if EMBEDDING_CACHE_ENABLED:
+                        embeddings = CachedEmbeddings(
+                            embeddings, f"{EMBEDDING_BACKEND}:{EMBEDDING_MODEL}"
+                        )
+                    self._embeddings = embeddings
+        return self._embeddings
+
+    @property
+    def splitter(self) -> RecursiveCharacterTextSplitter:
+        """Text splitter used to chunk patient reports."""
+        if self._splitter is None:
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+            )
+        return self._splitter
+
+    @property
+    def prompt(self) -> PromptTemplate:
+        """Clinical summarization prompt."""
+        if self._prompt is None:
+            self._prompt = PromptTemplate(
+                input_variables=["context", "question"], template=PROMPT_TEMPLATE
+            )
+        return self._prompt
+
+    @property
+    def llm(self) -> ChatOpenAI:
+        """Client for the model runner's OpenAI-compatible API."""
+        if self._llm is None:
+            with self._lock, stage_timer(self.load_timings, "llm"):
+                if self._llm is None:
+                    self._llm = ChatOpenAI(
+                        base_url=LLM_BASE_URL,  # using docker model runner
+                        model=LLM_MODEL,
+                        api_key="not-needed",
+                        timeout=LLM_TIMEOUT,
+                    )
+        return self._llm
+
+    @property
+    def tokenizer(self) -> tiktoken.Encoding | None:
+        """
+        Encoding used to count prompt tokens, or None if it can't be loaded.
+
+        tiktoken downloads encodings on first use, so an offline worker falls
+        back to the character estimate in `count_tokens`.
+        """
+        if not self._tokenizer_loaded:
+            with self._lock:
+                if not self._tokenizer_loaded:
+                    try:
+                        self._tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                    except Exception:
+                        logger.warning(f"Tokenizer {TOKENIZER_ENCODING} unavailable, estimating token counts")
+                    self._tokenizer_loaded = True
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens in a piece of text.
+
+        Args:
+            text (str): Text to count.
+
+        Returns:
+            int: Token count, or an estimate of four characters per token when
+                no tokenizer is available.
+        """
+        if self.tokenizer is None:
+            return len(text) // 4 + 1
+        return len(self.tokenizer.encode(text))
+
+    def load(self, warm_up: bool = RAG_WARM_UP):
+        """
+        Create every resource up front.
+
+        Args:
+            warm_up (bool): Run one embedding so the first message doesn't pay
+                for lazy initialization inside the model.
+        """
+        _ = self.embeddings, self.splitter, self.prompt, self.llm, self.tokenizer
+        if warm_up:
+            with stage_timer(self.load_timings, "warm_up"):
+                self.embeddings.embed_query("Patient Diagnosis Report")
+        logger.info(f"RAG resources loaded: {format_timings(self.load_timings)}")
+
+resources = WorkerResources()
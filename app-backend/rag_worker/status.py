@@ -0,0 +1,160 @@
+"""
+Records summaries and their processing status on the form documents.
+
+Updates are buffered per form and flushed as one unordered bulk write every
+STATUS_FLUSH_INTERVAL seconds, or sooner once STATUS_FLUSH_MAX forms are
+pending. Several updates to the same form in one interval (e.g. processing
+then done) collapse into a single write.
+
+Each status has a rank and a write only applies when the stored rank is not
+higher, so a redelivered message or a slow worker process can never move a
+finished summary back to `processing`. Replaying an update is harmless.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+from common.summary_events import (
+    SUMMARY_DONE,
+    SUMMARY_FAILED,
+    SUMMARY_PENDING,
+    SUMMARY_PROCESSING,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_FLUSH_INTERVAL = float(os.getenv("STATUS_FLUSH_INTERVAL", "1"))
+STATUS_FLUSH_MAX = int(os.getenv("STATUS_FLUSH_MAX", "100"))
+
+# A failed attempt can still be retried and finish, so it ranks below done
+STATUS_RANKS = {
+    SUMMARY_PENDING: 0,
+    SUMMARY_PROCESSING: 1,
+    SUMMARY_FAILED: 1,
+    SUMMARY_DONE: 2,
+}
+
+class SummaryStatusWriter:
+    """
+    Buffers and coalesces `summary` updates to form documents.
+    """
+
+    def __init__(self, collection: Collection, interval: float = STATUS_FLUSH_INTERVAL,
+                 max_pending: int = STATUS_FLUSH_MAX):
+        """
+        Initialize the writer. The flush thread starts on first use.
+
+        Args:
+            collection (Collection): The `form_data` collection.
+            interval (float): Seconds between flushes.
+            max_pending (int): Pending forms that trigger an early flush.
+        """
+        self.collection = collection
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    def update(self, form_id: str, status: str, **fields):
+        """
+        Queue a status change for a form.
+
+        A pending update of lower rank, or of equal rank but another status,
+        is replaced; a pending update with the same status is merged into.
+        `error` is cleared unless given.
+
+        Args:
+            form_id (str): ID of the form.
+            status (str): One of the `SUMMARY_*` statuses.
+            **fields: Extra `summary` fields such as `text`, `model` or `timings`.
+        """
+        rank = STATUS_RANKS[status]
+        entry = {
+            "status": status,
+            "status_rank": rank,
+            "updated_at": datetime.now(timezone.utc),
+            "error": None,
+            **fields,
+        }
+        with self._lock:
+            current = self.pending.get(form_id)
+            if current is not None and current["status"] == status:
+                current.update(entry)
+            elif current is None or current["status_rank"] <= rank:
+                self.pending[form_id] = entry
+            count = len(self.pending)
+        self._ensure_thread()
+        if count >= self.max_pending:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write every pending update in one bulk operation.
+
+        On failure the updates are put back, unless a newer one arrived
+        meanwhile, and retried on the next flush.
+        """
+        with self._lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        operations = [
+            UpdateOne(
+                {"id": form_id, "summary.status_rank": {"$not": {"$gt": entry["status_rank"]}}},
+                {"$set": {f"summary.{field}": value for field, value in entry.items()}},
+            )
+            for form_id, entry in batch.items()
+        ]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError:
+            logger.warning(f"Failed to write {len(batch)} summary status updates")
+            with self._lock:
+                for form_id, entry in batch.items():
+                    self.pending.setdefault(form_id, entry)
+
+    def close(self):
+        """Stop the flush thread and write what is still pending."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _ensure_thread(self):
+        """Start the flush thread in this process if it isn't running."""
+        if self._thread is None and not self._closed:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="summary-status-writer", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        """Flush periodically until closed."""
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+def form_collection() -> Collection:
+    """
+    Connect to the form database and make sure forms can be found by ID.
+
+    Returns:
+        Collection: The `form_data` collection.
+    """
+    client = MongoClient(os.getenv("MONGODB_URL"))
+    collection = client[os.getenv("MONGO_DB_FORM")]["form_data"]
+    collection.create_index("id")
+    return collection
@@ -0,0 +1,261 @@
+"""
+Cache of generated summaries keyed by report content.
+
+Doctors resubmit near-identical reports and the frontend retries saves, so
+summaries are cached under a hash of the normalized report fields. Keys also
+carry a version derived from the prompt template and the models, so changing
+any of them starts a fresh cache instead of serving stale summaries.
+
+Redis is the shared tier used by every worker. A local SQLite file, bounded
+by LRU eviction, answers when Redis is down or has expired the entry.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import redis
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+from embeddings import EMBEDDING_BACKEND
+from resources import EMBEDDING_MODEL, LLM_MODEL, PROMPT_TEMPLATE
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "summary_cache.sqlite3")
+SUMMARY_CACHE_DISK_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_DISK_MAX_ENTRIES", "10000"))
+
+KEY_PREFIX = "rag:summary-cache:"
+
+# Fields of the form that end up in the report; anything else doesn't change the summary
+REPORT_FIELDS = (
+    "age_group", "province", "district",
+    "disease_symptoms", "current_condition", "disease_status",
+)
+
+CACHE_REQUESTS = Counter(
+    "rag_summary_cache_requests_total",
+    "Summary cache lookups by tier and result",
+    ["tier", "result"],
+)
+
+def cache_version(*parts: str) -> str:
+    """
+    Version tag for cached summaries.
+
+    Args:
+        *parts (str): Everything that changes the generated text, e.g. the
+            prompt template and model names.
+
+    Returns:
+        str: Short hash of the parts.
+    """
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:12]
+
+CACHE_VERSION = cache_version(PROMPT_TEMPLATE, LLM_MODEL, EMBEDDING_MODEL, EMBEDDING_BACKEND)
+
+def normalize(value) -> str:
+    """Normalize a field so whitespace and Unicode form don't change its hash."""
+    return " ".join(unicodedata.normalize("NFC", str(value)).split())
+
+def content_hash(form_data: dict) -> str:
+    """
+    Hash the report fields of a form.
+
+    Args:
+        form_data (dict): Patient form data.
+
+    Returns:
+        str: Hex SHA-256 of the normalized report fields.
+    """
+    fields = {field: normalize(form_data.get(field, "")) for field in REPORT_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+class DiskCache:
+    """
+    SQLite-backed LRU of summaries, safe to share between worker processes.
+    """
+
+    def __init__(self, path: str, max_entries: int, version: str):
+        """
+        Initialize the cache. The file is opened on first use.
+
+        Args:
+            path (str): SQLite database file.
+            max_entries (int): Entries kept before the least recently used
+                ones are evicted.
+            version (str): Current cache version; entries of other versions
+                are dropped when the file is opened.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating the table and purging old versions."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, version TEXT NOT NULL, "
+                "summary TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed_at)")
+            conn.execute("DELETE FROM summaries WHERE version != ?", (self.version,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        """
+        Return a cached summary and mark it recently used.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            str | None: The summary, or None on a miss.
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def set(self, key: str, summary: str):
+        """
+        Store a summary, evicting the least recently used entries over the limit.
+
+        Args:
+            key (str): Cache key.
+            summary (str): Generated summary.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, version, summary, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, self.version, summary, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                "SELECT key FROM summaries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+class SummaryCache:
+    """
+    Two-tier (Redis + local SQLite) cache of generated summaries.
+    """
+
+    def __init__(self, redis_client: redis.Redis | None, disk: DiskCache | None,
+                 version: str = CACHE_VERSION, ttl: int = SUMMARY_CACHE_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_client (redis.Redis | None): Redis client for the shared
+                tier, or None to use only the disk.
+            disk (DiskCache | None): Local fallback tier, or None.
+            version (str): Version tag included in every key.
+            ttl (int): Redis expiry in seconds.
+        """
+        self.redis = redis_client
+        self.disk = disk
+        self.version = version
+        self.ttl = ttl
+
+    def key(self, form_data: dict) -> str:
+        """Cache key of a form under the current version."""
+        return f"{KEY_PREFIX}{self.version}:{content_hash(form_data)}"
+
+    def get(self, form_data: dict) -> str | None:
+        """
+        Return the cached summary of a report.
+
+        An entry found only on disk is copied back to Redis.
+
+        Args:
+            form_data (dict): Patient form data.
+
+        Returns:
+            str | None: The summary, or None on a miss.
+        """
+        key = self.key(form_data)
+        redis_up = self.redis is not None
+        if redis_up:
+            try:
+                summary = self.redis.get(key)
+            except RedisError:
+                logger.warning("Summary cache read failed, using disk cache")
+                summary, redis_up = None, False
+            if summary is not None:
+                CACHE_REQUESTS.labels("redis", "hit").inc()
+                return summary
+            CACHE_REQUESTS.labels("redis", "miss").inc()
+
+        summary = self._disk_get(key)
+        CACHE_REQUESTS.labels("disk", "miss" if summary is None else "hit").inc()
+        if summary is not None and redis_up:
+            self._redis_set(key, summary)
+        return summary
+
+    def set(self, form_data: dict, summary: str):
+        """
+        Cache a report's summary in both tiers.
+
+        Args:
+            form_data (dict): Patient form data.
+            summary (str): Generated summary.
+        """
+        key = self.key(form_data)
+        self._redis_set(key, summary)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, summary)
+            except sqlite3.Error:
+                logger.warning("Summary disk cache write failed")
+
+    def _disk_get(self, key: str) -> str | None:
+        """Read a key from the disk tier, treating errors as a miss."""
+        if self.disk is None:
+            return None
+        try:
+            return self.disk.get(key)
+        except sqlite3.Error:
+            logger.warning("Summary disk cache read failed")
+            return None
+
+    def _redis_set(self, key: str, summary: str):
+        """Write a key to Redis, ignoring errors."""
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(key, summary, ex=self.ttl)
+        except RedisError:
+            logger.warning("Summary cache write failed")
+
+summary_cache = SummaryCache(
+    redis.Redis(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=6379,
+        decode_responses=True,
+        socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5")),
+    ),
+    DiskCache(SUMMARY_CACHE_PATH, SUMMARY_CACHE_DISK_MAX_ENTRIES, CACHE_VERSION),
+) if SUMMARY_CACHE_ENABLED else None
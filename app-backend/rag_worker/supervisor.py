@@ -0,0 +1,191 @@
+"""
+Supervisor that runs a pool of RAG worker processes.
+
+Forks WORKER_PROCESSES workers (default: one per CPU), each with its own
+RabbitMQ connection and its own copy of the models, and restarts any that
+exit unexpectedly, backing off when one keeps crashing. On SIGTERM or SIGINT
+every worker is asked to drain; workers still busy after
+WORKER_DRAIN_TIMEOUT seconds are killed.
+
+Each worker is limited to WORKER_THREADS compute threads (default: the CPU
+count divided by the number of workers) so the pool doesn't oversubscribe
+the cores with torch and BLAS thread pools.
+
+Workers write their Prometheus metrics to PROMETHEUS_MULTIPROC_DIR, which is
+emptied at start, and the supervisor serves them merged on RAG_METRICS_PORT.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import time
+from multiprocessing.connection import wait
+
+# prometheus_client picks its multiprocess mode when imported, so set this first
+METRICS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "rag_worker_metrics")
+)
+
+from common.logger import setup_logging  # noqa: E402
+from prometheus_client import multiprocess  # noqa: E402
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(CPU_COUNT)))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", str(max(1, CPU_COUNT // WORKER_PROCESSES))))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "60"))
+
+# A worker that dies sooner than this after starting counts as crash-looping
+MIN_UPTIME = 30
+MAX_RESTART_DELAY = 60
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+def limit_threads(threads: int):
+    """
+    Cap the compute threads used by this process.
+
+    Must run before torch is imported for the environment variables to take
+    effect on the BLAS/OpenMP pools.
+
+    Args:
+        threads (int): Threads available to the process.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    # Each process already owns its share of the cores
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+def worker_main(threads: int):
+    """
+    Entry point of a worker process.
+
+    Args:
+        threads (int): Threads available to the worker.
+    """
+    # Only the supervisor reacts to Ctrl+C; it forwards a drain request
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_threads(threads)
+
+    import rabbitmq_bg
+    rabbitmq_bg.run()
+
+class Supervisor:
+    """
+    Keeps a fixed number of worker processes running.
+    """
+
+    def __init__(self, processes: int = WORKER_PROCESSES, threads: int = WORKER_THREADS,
+                 drain_timeout: float = WORKER_DRAIN_TIMEOUT):
+        """
+        Initialize the supervisor.
+
+        Args:
+            processes (int): Number of worker processes.
+            threads (int): Compute threads per worker.
+            drain_timeout (float): Seconds workers get to finish after SIGTERM.
+        """
+        self.processes = processes
+        self.threads = threads
+        self.drain_timeout = drain_timeout
+        self.context = multiprocessing.get_context("fork")
+        self.workers: dict[int, multiprocessing.Process] = {}
+        self.started_at: dict[int, float] = {}
+        self.failures: dict[int, int] = {}
+        self.restart_at: dict[int, float] = {}
+        self.stopping = False
+
+    def start_worker(self, slot: int):
+        """Fork the worker for a slot."""
+        process = self.context.Process(
+            target=worker_main, args=(self.threads,), name=f"rag-worker-{slot}"
+        )
+        process.start()
+        self.workers[slot] = process
+        self.started_at[slot] = time.monotonic()
+        logger.info(f"Started {process.name} (pid {process.pid}, {self.threads} threads)")
+
+    def reap(self):
+        """Schedule restarts for workers that have exited."""
+        now = time.monotonic()
+        for slot, process in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            multiprocess.mark_process_dead(process.pid)
+            del self.workers[slot]
+            if now - self.started_at[slot] < MIN_UPTIME:
+                self.failures[slot] = self.failures.get(slot, 0) + 1
+            else:
+                self.failures[slot] = 0
+            delay = min(MAX_RESTART_DELAY, 2 ** self.failures[slot] - 1)
+            self.restart_at[slot] = now + delay
+            logger.warning(
+                f"{process.name} exited with code {process.exitcode}, "
+                f"restarting in {delay}s"
+            )
+
+    def restart_due(self):
+        """Restart workers whose back-off delay has passed."""
+        now = time.monotonic()
+        for slot, due in list(self.restart_at.items()):
+            if due <= now:
+                del self.restart_at[slot]
+                self.start_worker(slot)
+
+    def request_stop(self, signum, frame):
+        """Signal handler that starts a graceful shutdown."""
+        if not self.stopping:
+            logger.info(f"Received signal {signum}, draining {len(self.workers)} workers")
+        self.stopping = True
+
+    def drain(self):
+        """Ask every worker to finish its current message, killing stragglers."""
+        for process in self.workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout
+        for process in self.workers.values():
+            process.join(max(0, deadline - time.monotonic()))
+        for process in self.workers.values():
+            if process.is_alive():
+                logger.warning(f"{process.name} did not drain in time, killing it")
+                process.kill()
+                process.join()
+
+    def run(self):
+        """Start the pool and supervise it until SIGTERM or SIGINT."""
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        # Drop the previous pool's metrics before any process writes new ones;
+        # metrics creates its files when imported
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        os.makedirs(METRICS_DIR)
+        from metrics import start_metrics_server
+        start_metrics_server()
+        for slot in range(self.processes):
+            self.start_worker(slot)
+
+        while not self.stopping:
+            wait([process.sentinel for process in self.workers.values()], timeout=1)
+            if self.stopping:
+                break
+            self.reap()
+            self.restart_due()
+
+        self.drain()
+        logger.info("All RAG workers stopped")
+
+if __name__ == "__main__":
+    Supervisor().run()
@@ -0,0 +1,208 @@
+"""Tests for the similar-case index."""
+
+import asyncio
+import math
+import os
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+os.environ.setdefault("CASE_INDEX_ENABLED", "false")
+os.environ.setdefault("SUMMARY_CACHE_ENABLED", "false")
+
+import case_index
+import rag
+from case_index import CaseIndex, build_index, normalized, record_dtype
+from resources import resources
+
+
+class StaticSummaryCache:
+    """Summary cache stand-in that answers every report with the same summary."""
+
+    def __init__(self, summary: str):
+        self.summary = summary
+
+    def get(self, form_data: dict) -> str:
+        return self.summary
+
+    def set(self, form_data: dict, summary: str):
+        raise AssertionError("cache hits shouldn't be written back")
+
+
+def use_cached_summaries(monkeypatch, tmp_path) -> CaseIndex:
+    """Answer every report from the summary cache and index cases under tmp_path."""
+    index = CaseIndex(str(tmp_path))
+    monkeypatch.setattr(resources, "_embeddings", DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(rag, "summary_cache", StaticSummaryCache("Likely dengue."))
+    monkeypatch.setattr(rag, "case_index", index)
+    return index
+
+
+def test_cached_batch_summaries_are_indexed(monkeypatch, tmp_path):
+    """Reports answered from the summary cache still become searchable cases."""
+    index = use_cached_summaries(monkeypatch, tmp_path)
+    forms = [{**rag.form_data, "id": f"form-{number}"} for number in range(2)]
+    timings = {}
+
+    assert rag.summarize_batch(forms, timings=timings) == ["Likely dengue."] * 2
+
+    vector = resources.embeddings.embed_query(rag.case_text(forms[0]))
+    found = index.search(vector, 5)
+    assert sorted(case["form_id"] for case in found) == ["form-0", "form-1"]
+    assert found[0]["summary"] == "Likely dengue."
+    assert timings["index"] > 0
+
+
+def test_cached_async_summary_is_indexed(monkeypatch, tmp_path):
+    """The asyncio consumer indexes a cache hit before returning it."""
+    index = use_cached_summaries(monkeypatch, tmp_path)
+    form = {**rag.form_data, "id": "form-async"}
+
+    assert asyncio.run(rag.asummarize(form)) == "Likely dengue."
+
+    found = index.search(resources.embeddings.embed_query(rag.case_text(form)), 1)
+    assert [case["form_id"] for case in found] == ["form-async"]
+
+
+DIM = 8
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    """Random unit vectors."""
+    return normalized(np.random.default_rng(seed).standard_normal((count, DIM)))
+
+
+def cases(count: int, start: int = 0, **fields) -> list[dict]:
+    """Cases with distinct form IDs, in Hanoi unless `fields` say otherwise."""
+    return [
+        {"form_id": f"form-{number}", "province": "Hanoi", "district": "Ba Dinh",
+         "summary": f"case {number}", **fields}
+        for number in range(start, start + count)
+    ]
+
+
+def form_ids(found: list[dict]) -> list[str]:
+    """Form IDs of search results, in result order."""
+    return [case["form_id"] for case in found]
+
+
+def test_journal_is_replayed_by_a_new_process(tmp_path):
+    """Appends only go to the journal, and a fresh index replays them on load."""
+    added = vectors(5)
+    CaseIndex(str(tmp_path)).add(cases(5), added)
+
+    shard_dir = tmp_path / "shards" / "hanoi"
+    assert (shard_dir / "journal-0.bin").stat().st_size == 5 * record_dtype(DIM).itemsize
+    assert not list(shard_dir.glob("base-*"))
+
+    reopened = CaseIndex(str(tmp_path))
+    reopened.load()
+    assert reopened.shard("hanoi").pending == 5
+    assert form_ids(reopened.search(added[3], 1)) == ["form-3"]
+
+
+def test_compaction_swaps_the_manifest(tmp_path):
+    """Compaction folds the journal into a new base and starts a new journal."""
+    index = CaseIndex(str(tmp_path))
+    added = vectors(6)
+    index.add(cases(4), added[:4])
+    shard = index.shard("hanoi")
+
+    assert shard.compact()
+    manifest = shard.read_manifest()
+    assert manifest == {"generation": 1, "base": "base-1.faiss",
+                        "vectors": "vectors-1.bin", "journals": ["journal-1.bin"]}
+    assert not os.path.exists(shard.file("journal-0.bin"))
+    assert not shard.compact()
+
+    index.add(cases(2, start=4), added[4:])
+    shard.refresh()
+    assert (shard.size, shard.pending) == (6, 2)
+    assert form_ids(index.search(added[1], 1)) == ["form-1"]
+    assert form_ids(index.search(added[5], 1)) == ["form-5"]
+
+
+def test_appends_during_compaction_are_kept(tmp_path, monkeypatch):
+    """A case added while the base is being rebuilt lands in the new journal."""
+    index = CaseIndex(str(tmp_path))
+    added = vectors(4)
+    index.add(cases(3), added[:3])
+    writer = CaseIndex(str(tmp_path))
+
+    def build_while_appending(records, dim, ivf_min):
+        writer.add(cases(1, start=3), added[3:])
+        return build_index(records, dim, ivf_min)
+
+    monkeypatch.setattr(case_index, "build_index", build_while_appending)
+    assert index.shard("hanoi").compact()
+
+    shard = index.shard("hanoi")
+    assert shard.read_manifest()["journals"] == ["journal-1.bin"]
+    assert os.path.getsize(shard.file("journal-1.bin")) == record_dtype(DIM).itemsize
+    shard.refresh()
+    assert (shard.size, shard.pending) == (4, 1)
+    assert form_ids(index.search(added[3], 1)) == ["form-3"]
+
+
+def test_large_shard_is_rebuilt_as_ivf(tmp_path):
+    """A forced rebuild past `ivf_min` switches the base to IVF without losing cases."""
+    index = CaseIndex(str(tmp_path))
+    added = vectors(300)
+    index.add(cases(300), added)
+    shard = index.shard("hanoi")
+    shard.compact()
+    shard.refresh()
+    assert shard.nlist == 1
+
+    assert shard.compact(force=True, ivf_min=200)
+    shard.refresh()
+    assert shard.nlist == int(4 * math.sqrt(300))
+    assert shard.size == 300
+    assert form_ids(index.search(added[42], 1, nprobe=shard.nlist)) == ["form-42"]
+
+
+def test_filtered_and_excluded_search(tmp_path):
+    """Province, district and time filters and the excluded form narrow the results."""
+    index = CaseIndex(str(tmp_path))
+    query = vectors(1, seed=1)[0]
+    # Every case is the query vector, so only the filters decide what comes back
+    index.add(cases(2, created_at=100.0), [query] * 2)
+    index.add(cases(1, start=2, district="Cau Giay", created_at=200.0), [query])
+    index.add(cases(1, start=3, province="Da Nang", district="Hai Chau", created_at=300.0), [query])
+
+    assert sorted(form_ids(index.search(query, 10))) == ["form-0", "form-1", "form-2", "form-3"]
+    assert sorted(form_ids(index.search(query, 10, provinces=["Da Nang"]))) == ["form-3"]
+    assert sorted(form_ids(index.search(query, 10, districts=["Cau Giay", "Hai Chau"]))) == ["form-2", "form-3"]
+    assert sorted(form_ids(index.search(query, 10, since=150.0, until=250.0))) == ["form-2"]
+    assert sorted(form_ids(index.search(query, 10, provinces=["Hanoi"], exclude="form-0"))) == ["form-1", "form-2"]
+    assert index.search(query, 10, districts=["Dong Da"]) == []
+    assert len(index.search(query, 2, exclude="form-0")) == 2
+
+
+def test_duplicate_forms_are_skipped(tmp_path):
+    """A redelivered report isn't indexed twice."""
+    index = CaseIndex(str(tmp_path))
+    added = vectors(3)
+    index.add(cases(2), added[:2])
+
+    index.add(cases(1, start=1) + cases(1, start=2), added[1:])
+
+    shard = index.shard("hanoi")
+    assert shard.size == 3
+    assert sorted(form_ids(index.search(added[1], 10))) == ["form-0", "form-1", "form-2"]
+
+
+def test_other_process_sees_appends_after_compaction(tmp_path):
+    """An index opened before a compaction picks up the new base and journal."""
+    writer = CaseIndex(str(tmp_path))
+    reader = CaseIndex(str(tmp_path))
+    added = vectors(4)
+    writer.add(cases(2), added[:2])
+    assert form_ids(reader.search(added[0], 1)) == ["form-0"]
+
+    writer.shard("hanoi").compact()
+    writer.add(cases(2, start=2), added[2:])
+
+    assert form_ids(reader.search(added[3], 1)) == ["form-3"]
+    assert form_ids(reader.search(added[1], 1)) == ["form-1"]
+    assert reader.shard("hanoi").size == 4
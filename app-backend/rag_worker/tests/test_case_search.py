@@ -0,0 +1,87 @@
+"""Tests for the similar-case search API."""
+
+import json
+import os
+from datetime import date
+
+import fakeredis
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+os.environ.setdefault("CASE_INDEX_ENABLED", "false")
+os.environ.setdefault("SUMMARY_CACHE_ENABLED", "false")
+
+import case_search
+from case_search import app, day_bound, get_case_index
+from common.verification_session import STEP_NAME, STEP_VERIFIED, VerificationSessionStore
+from resources import resources
+
+DOCTOR_ID = "dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e"
+
+
+class StubIndex:
+    """Case index stand-in that records its search arguments."""
+
+    def __init__(self):
+        self.calls = []
+
+    def search(self, vector, k, **filters):
+        self.calls.append({"k": k, **filters})
+        return [{"form_id": "form-1", "score": 0.9, "province": "Hanoi",
+                 "district": "Ba Dinh", "created_at": 1_700_000_000.0}]
+
+
+def headers(**token) -> dict:
+    """Authorization header for DOCTOR_ID with the given token fields."""
+    return {"authorization": json.dumps({"id": DOCTOR_ID, **token})}
+
+
+def search_client(monkeypatch, session_step: int = STEP_VERIFIED) -> tuple[TestClient, StubIndex]:
+    """Client whose doctor has a session at `session_step`, searching a stub index."""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    VerificationSessionStore(client).start(DOCTOR_ID, session_step)
+    index = StubIndex()
+    monkeypatch.setattr(case_search, "redis_client", client)
+    monkeypatch.setattr(resources, "_embeddings", DeterministicFakeEmbedding(size=8))
+    monkeypatch.setitem(app.dependency_overrides, get_case_index, lambda: index)
+    return TestClient(app), index
+
+
+def test_filtered_search(monkeypatch):
+    """A verified doctor's filters reach the index and the matches are returned."""
+    client, index = search_client(monkeypatch)
+
+    response = client.get("/cases/search", headers=headers(step=STEP_VERIFIED), params={
+        "q": "fever and rash", "k": 5, "province": ["Hanoi", "Da Nang"],
+        "district": "Ba Dinh", "since": "2024-01-01", "until": "2024-01-31",
+    })
+
+    assert response.status_code == 200
+    assert [case["form_id"] for case in response.json()["results"]] == ["form-1"]
+    assert index.calls == [{
+        "k": 5, "provinces": ["Hanoi", "Da Nang"], "districts": ["Ba Dinh"],
+        "since": day_bound(date(2024, 1, 1)), "until": day_bound(date(2024, 1, 31), end=True),
+        "nprobe": case_search.CASE_INDEX_NPROBE,
+    }]
+
+
+def test_unverified_session_is_rejected(monkeypatch):
+    """A token claiming the last step doesn't help if the session isn't there yet."""
+    client, index = search_client(monkeypatch, session_step=STEP_NAME)
+
+    response = client.get("/cases/search", headers=headers(step=STEP_VERIFIED),
+                          params={"q": "fever and rash"})
+
+    assert response.status_code == 401
+    assert index.calls == []
+
+
+def test_token_without_step_is_rejected(monkeypatch):
+    """A token missing its step is unauthorized, not a server error."""
+    client, index = search_client(monkeypatch)
+
+    response = client.get("/cases/search", headers=headers(), params={"q": "fever and rash"})
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token does not match."
+    assert index.calls == []
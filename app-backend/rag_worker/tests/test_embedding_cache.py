@@ -0,0 +1,74 @@
+"""Tests for the chunk embedding cache."""
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings, record_stats
+
+MODEL_ID = "test:fake"
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Deterministic fake model that records the texts it is asked to embed."""
+
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def counting_model() -> CountingEmbedding:
+    """A fresh counting model."""
+    return CountingEmbedding(size=16, calls=[])
+
+
+def test_only_misses_reach_the_model(tmp_path):
+    """Texts embedded before are served from the cache with the same vectors."""
+    model = counting_model()
+    cache = CachedEmbeddings(model, MODEL_ID, str(tmp_path))
+
+    first = cache.embed_documents(["Patient Diagnosis Report", "Fever and rash"])
+    second = cache.embed_documents(["Patient Diagnosis Report", "Dry cough", "Dry cough"])
+
+    assert model.calls == [["Patient Diagnosis Report", "Fever and rash"], ["Dry cough"]]
+    assert second[0] == first[0]
+    # Vectors are stored as float32, the precision the real models produce
+    assert second[0] == pytest.approx(model.embed_query("Patient Diagnosis Report"), rel=1e-6)
+    assert second[1] == second[2]
+
+
+def test_disk_tier_survives_restart_and_eviction(tmp_path):
+    """A new process, or a text evicted from memory, is answered from the mapped file."""
+    texts = [f"chunk {index}" for index in range(8)]
+    cache = CachedEmbeddings(counting_model(), MODEL_ID, str(tmp_path), memory_entries=2)
+    expected = cache.embed_documents(texts)
+
+    model = counting_model()
+    restarted = CachedEmbeddings(model, MODEL_ID, str(tmp_path), memory_entries=2)
+
+    assert restarted.embed_documents(texts) == expected
+    assert model.calls == []
+
+
+def test_model_id_separates_entries(tmp_path):
+    """Vectors of one model are never served for another."""
+    CachedEmbeddings(counting_model(), MODEL_ID, str(tmp_path)).embed_documents(["Fever"])
+    model = counting_model()
+
+    CachedEmbeddings(model, "test:other", str(tmp_path)).embed_documents(["Fever"])
+
+    assert model.calls == [["Fever"]]
+
+
+def test_saved_time_is_recorded(tmp_path):
+    """Hits add the estimated model time they saved to the stage timings."""
+    cache = CachedEmbeddings(counting_model(), MODEL_ID, None)
+    cache.embed_documents(["Fever", "Rash"])
+    timings = {}
+
+    with record_stats(timings):
+        cache.embed_documents(["Fever", "Rash", "Cough"])
+
+    assert timings["embed_saved"] > 0
+    assert len(cache.memory) == 3
@@ -0,0 +1,70 @@
+"""Parity tests for the quantized ONNX embedding backend against the torch backend."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from embeddings import OnnxEmbeddings, make_embeddings
+from resources import EMBEDDING_MODEL
+
+TEXTS = [
+    "Patient Diagnosis Report",
+    "Fever for three days with headache, joint pain and a rash on the arms.",
+    "Persistent dry cough, shortness of breath and low oxygen saturation.",
+    "Watery diarrhoea and vomiting since yesterday, signs of dehydration.",
+    "Age group: 18-35\nProvince: Koshi\nDistrict: Morang\nSymptoms: high fever, chills",
+    "Mild sore throat, no fever. Patient is stable and was sent home.",
+    "Severe abdominal pain in the lower right quadrant with nausea. " * 20,
+]
+
+# Dynamic int8 quantization of MiniLM keeps vectors within a few percent of fp32
+MIN_COSINE = 0.97
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    """Load the torch model and an ONNX export of it into a temporary directory."""
+    model_dir = str(tmp_path_factory.mktemp("onnx") / "model")
+    torch_backend = make_embeddings("torch", EMBEDDING_MODEL, batch_size=4)
+    onnx_backend = OnnxEmbeddings(EMBEDDING_MODEL, model_dir, batch_size=4)
+    return torch_backend, onnx_backend
+
+
+def test_documents_match_torch(backends):
+    """Document vectors of both backends point the same way."""
+    torch_backend, onnx_backend = backends
+    expected = np.array(torch_backend.embed_documents(TEXTS))
+    actual = np.array(onnx_backend.embed_documents(TEXTS))
+
+    assert actual.shape == expected.shape
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    assert cosine.min() >= MIN_COSINE
+
+
+def test_query_vectors_are_unit_length(backends):
+    """Query vectors are normalized like the sentence-transformer's."""
+    _, onnx_backend = backends
+    vector = np.array(onnx_backend.embed_query(TEXTS[1]))
+
+    assert np.linalg.norm(vector) == pytest.approx(1.0, abs=1e-4)
+
+
+def test_ranking_matches_torch(backends):
+    """Both backends rank documents the same way for a query."""
+    query = "fever, joint pain and rash"
+    rankings = []
+    for backend in backends:
+        documents = np.array(backend.embed_documents(TEXTS[1:4]))
+        rankings.append(np.argsort(-documents @ np.array(backend.embed_query(query))).tolist())
+
+    assert rankings[0] == rankings[1]
+
+
+def test_unknown_backend_is_rejected():
+    """A typo in EMBEDDING_BACKEND fails loudly instead of falling back."""
+    with pytest.raises(ValueError):
+        make_embeddings("tensorflow", EMBEDDING_MODEL, batch_size=4)
@@ -0,0 +1,74 @@
+"""Test cases for classifying and routing failed summarization tasks."""
+
+import json
+
+import httpx
+import openai
+import pika
+import pytest
+
+from broker import DEAD_LETTER_QUEUE, RAG_RETRY_MAX_ATTEMPTS, queue_declarations, retry_delay, retry_queue
+from failures import TASK_DEAD_LETTERS, TASK_RETRIES, PermanentError, failure_route, is_transient
+
+
+def bad_request() -> openai.BadRequestError:
+    """A 400 from the model runner, e.g. a prompt over the context length."""
+    request = httpx.Request("POST", "http://llm/v1/chat/completions")
+    return openai.BadRequestError("context length exceeded", response=httpx.Response(400, request=request), body=None)
+
+
+@pytest.mark.parametrize("error, transient", [
+    (ConnectionError("refused"), True),
+    (TimeoutError(), True),
+    (openai.APIConnectionError(request=httpx.Request("POST", "http://llm")), True),
+    (KeyError("age_group"), False),
+    (json.JSONDecodeError("bad", "x", 0), False),
+    (PermanentError("no report fields"), False),
+    (bad_request(), False),
+])
+def test_classification(error, transient):
+    """Outages are retried, malformed input and rejected requests are not."""
+    assert is_transient(error) is transient
+
+
+def test_backoff_doubles_per_attempt():
+    """Each retry waits twice as long as the previous one."""
+    assert retry_delay(2) == 2 * retry_delay(1)
+    assert retry_queue(1) != retry_queue(2)
+
+
+def test_retry_queues_feed_back_into_the_task_queue():
+    """Retry queues expire messages back to rag_tasks after their delay."""
+    declarations = dict(queue_declarations())
+
+    arguments = declarations[retry_queue(1)]
+    assert arguments["x-dead-letter-routing-key"] == "rag_tasks"
+    assert arguments["x-message-ttl"] == int(retry_delay(1) * 1000)
+    assert declarations["rag_tasks"] is None
+
+
+def test_attempts_are_counted_until_dead_lettered():
+    """A transient failure is retried until the attempt limit, then dead-lettered."""
+    properties = pika.BasicProperties(message_id="form-1")
+    retries = TASK_RETRIES.labels("ConnectionError")._value.get()
+    for attempt in range(1, RAG_RETRY_MAX_ATTEMPTS):
+        queue_name, properties, dead = failure_route(properties, ConnectionError("down"))
+        assert (queue_name, dead) == (retry_queue(attempt), False)
+        assert properties.headers["x-attempts"] == attempt
+
+    exhausted = TASK_DEAD_LETTERS.labels("exhausted")._value.get()
+    queue_name, properties, dead = failure_route(properties, ConnectionError("down"))
+
+    assert (queue_name, dead) == (DEAD_LETTER_QUEUE, True)
+    assert properties.message_id == "form-1"
+    assert TASK_RETRIES.labels("ConnectionError")._value.get() == retries + RAG_RETRY_MAX_ATTEMPTS - 1
+    assert TASK_DEAD_LETTERS.labels("exhausted")._value.get() == exhausted + 1
+
+
+def test_permanent_failure_skips_retries():
+    """A permanent failure is dead-lettered on the first attempt."""
+    queue_name, properties, dead = failure_route(pika.BasicProperties(), KeyError("age_group"))
+
+    assert (queue_name, dead) == (DEAD_LETTER_QUEUE, True)
+    assert properties.headers["x-failure"] == "permanent"
+    assert properties.headers["x-error-type"] == "KeyError"
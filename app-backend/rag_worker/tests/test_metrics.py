@@ -0,0 +1,65 @@
+"""Tests for the RAG worker's Prometheus metrics."""
+
+import os
+import time
+
+import pika
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake import FakeListLLM
+from prometheus_client import REGISTRY
+
+os.environ.setdefault("CASE_INDEX_ENABLED", "false")
+os.environ.setdefault("SUMMARY_CACHE_ENABLED", "false")
+
+import rag
+from metrics import PUBLISHED_AT_HEADER, observe_delivery, observe_timings
+from resources import resources
+
+
+def sample(name: str, **labels) -> float:
+    """Current value of a metric sample, 0 if it hasn't been recorded yet."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class Delivery:
+    """Minimal stand-in for a delivery's method and properties."""
+
+    def __init__(self, redelivered: bool = False, headers: dict | None = None):
+        self.redelivered = redelivered
+        self.headers = headers
+
+
+def test_message_age_and_redeliveries():
+    """The age gauge follows the publish header and redeliveries are counted."""
+    redelivered = sample("rag_messages_redelivered_total")
+    properties = pika.BasicProperties(headers={PUBLISHED_AT_HEADER: int((time.time() - 30) * 1000)})
+    # Round-trip the headers through AMQP encoding, as the broker delivers them
+    decoded = pika.BasicProperties()
+    decoded.decode(b"".join(properties.encode()))
+
+    observe_delivery(Delivery(redelivered=True), decoded)
+
+    assert 30 <= sample("rag_message_age_seconds") < 35
+    assert sample("rag_messages_redelivered_total") == redelivered + 1
+
+
+def test_only_stage_timings_are_observed():
+    """Batch size and cache savings aren't recorded as stage durations."""
+    observe_timings({"llm": 1.5, "batch_size": 4, "embed_saved": 0.2})
+
+    assert sample("rag_stage_duration_seconds_count", stage="llm") >= 1
+    assert sample("rag_stage_duration_seconds_count", stage="batch_size") == 0
+    assert sample("rag_stage_duration_seconds_count", stage="embed_saved") == 0
+
+
+def test_retrieval_path_separates_stages(monkeypatch):
+    """Embedding, index building, retrieval and generation are timed apart."""
+    monkeypatch.setattr(resources, "_embeddings", DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(rag, "case_index", None)
+    monkeypatch.setattr(rag, "choose_path", lambda tokens: rag.PATH_RETRIEVAL)
+    timings = {}
+
+    rag.generate_summaries([rag.form_data], FakeListLLM(responses=["Likely dengue."]), timings)
+
+    for stage in ("embed", "vectorstore", "retrieval", "llm"):
+        assert timings[stage] > 0
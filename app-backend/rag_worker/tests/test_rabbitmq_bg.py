@@ -0,0 +1,228 @@
+"""Tests that slow summaries don't starve the RabbitMQ connection of heartbeats."""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import pika.exceptions
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake import FakeListLLM
+
+# Keep the worker's module-level index and cache off disk and Redis
+os.environ.setdefault("CASE_INDEX_ENABLED", "false")
+os.environ.setdefault("SUMMARY_CACHE_ENABLED", "false")
+
+import rabbitmq_bg
+import rag
+from broker import DEAD_LETTER_QUEUE, retry_queue
+from resources import resources
+
+HEARTBEAT = 0.1
+LLM_SECONDS = 0.5
+
+
+class SlowLLM(FakeListLLM):
+    """Stub LLM that takes longer than the heartbeat timeout to answer."""
+
+    def _call(self, *args, **kwargs):
+        time.sleep(LLM_SECONDS)
+        return super()._call(*args, **kwargs)
+
+
+class FakeBroker:
+    """
+    Stand-in for a BlockingConnection and its channel.
+
+    Like RabbitMQ, it drops the connection when the client hasn't serviced
+    it for two heartbeat intervals, and requeues the unacked messages as
+    redeliveries.
+    """
+
+    def __init__(self, bodies: list[bytes], prefetch: int):
+        self.ready = deque((tag, body, False) for tag, body in enumerate(bodies, 1))
+        self.unacked = {}
+        self.acked = []
+        self.published = []
+        self.redeliveries = 0
+        self.prefetch = prefetch
+        self.on_message = None
+        self.callbacks = queue.Queue()
+        self.io_thread = None
+        self.last_io = time.monotonic()
+        self.connection = self
+
+    def _check_heartbeat(self):
+        if time.monotonic() - self.last_io > 2 * HEARTBEAT:
+            self.redeliveries += len(self.unacked)
+            self.ready.extendleft((tag, body, True) for tag, body in self.unacked.items())
+            self.unacked.clear()
+
+    def process_data_events(self, time_limit=None):
+        self.io_thread = threading.current_thread()
+        self._check_heartbeat()
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            while not self.callbacks.empty():
+                self.callbacks.get()()
+            while self.on_message and self.ready and len(self.unacked) < self.prefetch:
+                tag, body, redelivered = self.ready.popleft()
+                self.unacked[tag] = body
+                method = type("Deliver", (), {"delivery_tag": tag, "redelivered": redelivered})
+                # form_submission's producer sets the message ID to the form ID
+                properties = type("Properties", (), {"message_id": f"form-{tag - 1}"})
+                self.on_message(self, method, properties, body)
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.005)
+        self.last_io = time.monotonic()
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def basic_consume(self, queue, on_message_callback):
+        self.on_message = on_message_callback
+        return "consumer"
+
+    def basic_cancel(self, consumer_tag):
+        self.on_message = None
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        assert threading.current_thread() is self.io_thread
+        self.published.append((routing_key, body, properties.headers))
+
+    def basic_ack(self, delivery_tag):
+        assert threading.current_thread() is self.io_thread
+        self.unacked.pop(delivery_tag)
+        self.acked.append(delivery_tag)
+        if not self.ready and not self.unacked:
+            rabbitmq_bg.shutdown.set()
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """Run the pipeline offline with a slow LLM and fresh consumer state."""
+    monkeypatch.setattr(resources, "_embeddings", DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(resources, "_llm", SlowLLM(responses=["Likely dengue."]))
+    monkeypatch.setattr(rag, "case_index", None)
+    monkeypatch.setattr(rag, "summary_cache", None)
+    monkeypatch.setattr(rabbitmq_bg, "publish_summary", lambda form_id, summary: None)
+    monkeypatch.setattr(rabbitmq_bg, "publish_failure", lambda form_id: None)
+    monkeypatch.setattr(rabbitmq_bg, "status_writer", None)
+    monkeypatch.setattr(rabbitmq_bg, "deliveries", queue.Queue())
+    monkeypatch.setattr(rabbitmq_bg, "shutdown", threading.Event())
+
+
+def messages(count: int) -> list[bytes]:
+    """Task messages for distinct forms."""
+    return [json.dumps({**rag.form_data, "id": f"form-{index}"}).encode() for index in range(count)]
+
+
+def test_fake_broker_drops_starved_connection():
+    """The broker requeues messages when the client stops servicing the connection."""
+    broker = FakeBroker(messages(1), prefetch=1)
+    broker.basic_consume("rag_tasks", lambda *args: None)
+    broker.process_data_events(0)
+    time.sleep(3 * HEARTBEAT)
+    broker.process_data_events(0)
+
+    assert broker.redeliveries == 1
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+def test_slow_llm_causes_no_redeliveries(worker, batch_size):
+    """Every message is acked once, from the connection thread, despite generations outlasting heartbeats."""
+    broker = FakeBroker(messages(4), prefetch=batch_size)
+
+    consumer = threading.Thread(
+        target=rabbitmq_bg.consume, args=(broker, broker, batch_size, 10), daemon=True
+    )
+    consumer.start()
+    consumer.join(timeout=30)
+
+    assert not consumer.is_alive()
+    assert broker.redeliveries == 0
+    assert sorted(broker.acked) == [1, 2, 3, 4]
+
+
+def test_transient_failure_is_retried_with_backoff(worker, monkeypatch):
+    """A failing LLM call sends the task to the first retry queue and acks it."""
+    def fail(*args, **kwargs):
+        raise ConnectionError("model runner unavailable")
+    monkeypatch.setattr(rabbitmq_bg, "summarize_batch", fail)
+    failed = []
+    monkeypatch.setattr(rabbitmq_bg, "publish_failure", failed.append)
+    broker = FakeBroker(messages(1), prefetch=1)
+
+    rabbitmq_bg.consume(broker, broker, 1, 10)
+
+    assert broker.acked == [1]
+    (queue_name, body, headers), = broker.published
+    assert queue_name == retry_queue(1)
+    assert headers["x-attempts"] == 1
+    assert headers["x-failure"] == "transient"
+    # Clients keep waiting while the task is retried
+    assert failed == []
+
+
+def test_malformed_form_is_dead_lettered(worker, monkeypatch):
+    """A form without report fields goes straight to the dead-letter queue."""
+    failed = []
+    monkeypatch.setattr(rabbitmq_bg, "publish_failure", failed.append)
+    broker = FakeBroker([json.dumps({"id": "form-0", "province": "Koshi"}).encode()], prefetch=1)
+
+    rabbitmq_bg.consume(broker, broker, 1, 10)
+
+    assert broker.acked == [1]
+    (queue_name, _, headers), = broker.published
+    assert queue_name == DEAD_LETTER_QUEUE
+    assert headers["x-failure"] == "permanent"
+    assert "age_group" in headers["x-error"]
+    assert failed == ["form-0"]
+
+
+def test_bad_report_does_not_fail_its_batch(worker):
+    """Only the malformed message of a batch is dead-lettered."""
+    bodies = messages(2) + [b"not json"]
+    broker = FakeBroker(bodies, prefetch=3)
+
+    rabbitmq_bg.consume(broker, broker, 3, 50)
+
+    assert sorted(broker.acked) == [1, 2, 3]
+    assert [queue_name for queue_name, _, _ in broker.published] == [DEAD_LETTER_QUEUE]
+
+
+def test_producer_field_names_are_accepted(worker):
+    """Forms published by form_submission are summarized, not rejected."""
+    form = {
+        "id": "form-0", "province": "Koshi", "district": "Morang",
+        "ageIdentity": "36-45", "statusSymptom": "Fever and rash",
+        "statusCondition": "Stable", "statusDisease": "Suspected dengue",
+    }
+    broker = FakeBroker([json.dumps(form).encode()], prefetch=1)
+
+    rabbitmq_bg.consume(broker, broker, 1, 10)
+
+    assert broker.acked == [1]
+    assert broker.published == []
+
+
+def test_late_connection_callbacks_are_ignored():
+    """A callback arriving after its attempt's future is settled doesn't raise."""
+    loop = asyncio.new_event_loop()
+    try:
+        opened, closed = loop.create_future(), loop.create_future()
+        rabbitmq_bg.open_failed(opened, None, "refused")
+        rabbitmq_bg.open_failed(opened, None, "refused again")
+        rabbitmq_bg.resolve(opened, "connection")
+        rabbitmq_bg.connection_closed(closed, None, "first")
+        rabbitmq_bg.connection_closed(closed, None, "second")
+
+        assert isinstance(opened.exception(), pika.exceptions.AMQPConnectionError)
+        assert closed.result() == "first"
+    finally:
+        loop.close()
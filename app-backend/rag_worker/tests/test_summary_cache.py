@@ -0,0 +1,113 @@
+"""Tests for the two-tier summary cache."""
+
+import itertools
+import os
+import unicodedata
+
+import fakeredis
+import pytest
+
+os.environ.setdefault("SUMMARY_CACHE_ENABLED", "false")
+
+import summary_cache
+from summary_cache import DiskCache, SummaryCache, content_hash
+
+VERSION = "v1"
+FORM = {
+    "age_group": "36-45", "province": "Koshi", "district": "Morang",
+    "disease_symptoms": "Fever and rash", "current_condition": "Stable",
+    "disease_status": "Suspected dengue",
+}
+
+
+class Clock:
+    """Stand-in for the `time` module whose clock ticks once per call."""
+
+    def __init__(self):
+        self.ticks = itertools.count(1)
+
+    def time(self) -> float:
+        return float(next(self.ticks))
+
+
+@pytest.fixture
+def server():
+    """Shared in-memory Redis server."""
+    return fakeredis.FakeServer()
+
+
+def make_cache(server, tmp_path, version: str = VERSION, max_entries: int = 10) -> SummaryCache:
+    """Cache over a fake Redis server and a SQLite file under tmp_path."""
+    return SummaryCache(
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        DiskCache(str(tmp_path / "summaries.sqlite3"), max_entries, version),
+        version,
+    )
+
+
+def test_redis_hit(server, tmp_path):
+    """A summary in Redis is returned without reading the disk."""
+    cache = make_cache(server, tmp_path)
+    cache.redis.set(cache.key(FORM), "Likely dengue.")
+
+    assert cache.get(FORM) == "Likely dengue."
+    assert cache.disk.get(cache.key(FORM)) is None
+
+
+def test_redis_miss_is_answered_from_disk_and_written_back(server, tmp_path):
+    """An entry Redis has expired comes from disk and is copied back to Redis."""
+    cache = make_cache(server, tmp_path)
+    cache.set(FORM, "Likely dengue.")
+    cache.redis.flushall()
+
+    assert cache.get(FORM) == "Likely dengue."
+    assert cache.redis.get(cache.key(FORM)) == "Likely dengue."
+    assert 0 < cache.redis.ttl(cache.key(FORM)) <= cache.ttl
+
+
+def test_redis_errors_fall_back_to_disk(server, tmp_path):
+    """With Redis down, reads and writes still work against the disk."""
+    cache = make_cache(server, tmp_path)
+    server.connected = False
+
+    cache.set(FORM, "Likely dengue.")
+
+    assert cache.get(FORM) == "Likely dengue."
+    assert cache.get({**FORM, "district": "Jhapa"}) is None
+
+
+def test_disk_evicts_least_recently_used(tmp_path, monkeypatch):
+    """Past `max_entries` the entries read or written longest ago are dropped."""
+    monkeypatch.setattr(summary_cache, "time", Clock())
+    disk = DiskCache(str(tmp_path / "summaries.sqlite3"), 2, VERSION)
+    disk.set("a", "summary a")
+    disk.set("b", "summary b")
+    assert disk.get("a") == "summary a"
+
+    disk.set("c", "summary c")
+
+    assert disk.get("b") is None
+    assert disk.get("a") == "summary a"
+    assert disk.get("c") == "summary c"
+
+
+def test_version_change_purges_old_entries(server, tmp_path):
+    """A new prompt or model version misses and drops the old version's rows."""
+    make_cache(server, tmp_path).set(FORM, "Likely dengue.")
+
+    cache = make_cache(server, tmp_path, version="v2")
+
+    assert cache.get(FORM) is None
+    rows = cache.disk._connect().execute("SELECT version FROM summaries").fetchall()
+    assert rows == []
+
+
+def test_content_hash_ignores_whitespace_and_unicode_form():
+    """Reports differing only in spacing, composed accents or extra fields share a hash."""
+    composed = {**FORM, "district": unicodedata.normalize("NFC", "Hà Nội")}
+    decomposed = {**FORM, "district": unicodedata.normalize("NFD", "Hà Nội"),
+                  "disease_symptoms": "  Fever\tand\n rash ", "id": "another-form"}
+    assert composed["district"] != decomposed["district"]
+
+    assert content_hash(composed) == content_hash(decomposed)
+    assert content_hash(composed) != content_hash(FORM)
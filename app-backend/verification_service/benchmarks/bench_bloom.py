@@ -0,0 +1,68 @@
+"""
+Benchmark for the doctor ID Bloom filter.
+
+Builds a filter sized like production for `--doctors` random registered IDs,
+then probes it with `--probes` random unregistered IDs. Reports the bitmap
+memory, the measured and estimated false-positive rates and the per-check
+latency.
+
+Usage (from the verification_service directory):
+    python -m benchmarks.bench_bloom --doctors 1000000 --probes 1000000
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from bloom import BLOOM_ERROR_RATE, BloomFilter
+
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Build the filter and measure it.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        dict: Memory, error rate and timing summary.
+    """
+    bloom = BloomFilter.for_capacity(args.doctors, args.error_rate)
+
+    start = time.perf_counter()
+    for _ in range(args.doctors):
+        bloom.add(uuid.uuid4().bytes)
+    build_s = time.perf_counter() - start
+
+    probes = [uuid.uuid4().bytes for _ in range(args.probes)]
+    start = time.perf_counter()
+    false_positives = sum(probe in bloom for probe in probes)
+    check_s = time.perf_counter() - start
+
+    return {
+        "doctors": args.doctors,
+        "target_error_rate": args.error_rate,
+        "size_bits": bloom.size_bits,
+        "hashes": bloom.hashes,
+        "memory_bytes": bloom.nbytes,
+        "bits_per_doctor": round(bloom.size_bits / args.doctors, 2),
+        "measured_false_positive_rate": false_positives / args.probes,
+        "estimated_false_positive_rate": bloom.estimated_false_positive_rate(),
+        "build_s": round(build_s, 3),
+        "check_us": round(check_s / args.probes * 1e6, 3),
+    }
+
+
+def main():
+    """Parse arguments, run the benchmark and print the summary as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=BLOOM_ERROR_RATE)
+    print(json.dumps(run(parser.parse_args()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
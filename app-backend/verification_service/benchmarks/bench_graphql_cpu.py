@@ -0,0 +1,142 @@
+"""
+Benchmark of per-request CPU spent by the verification GraphQL schema.
+
+Executes the documents the frontend sends (see app-frontend/src/services/
+user_query.ts) against two schemas:
+
+- `uncached`: `strawberry.Schema(query=Query)`, parsing and validating every
+  request from scratch.
+- `cached`: the application schema with the parser and validation caches.
+
+Requests are paced at `--rate` requests per second so CPU is measured under a
+realistic steady load rather than a tight loop. Database and Redis calls are
+stubbed out, so the numbers cover GraphQL work only.
+
+Usage (from the verification_service directory):
+    DATABASE_URL=sqlite:// python -m benchmarks.bench_graphql_cpu --rate 200 --requests 4000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import strawberry
+
+import main
+
+DOCTOR_ID = "dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e"
+TOKEN = json.dumps({"id": DOCTOR_ID, "step": 1})
+
+DOCUMENTS = [
+    ("""
+query MyQuery($doctorid: String!) {
+    verifyDoctorId(doctorid: $doctorid) {
+        message
+        success
+        body {
+            id
+            step
+        }
+    }
+}
+""", {"doctorid": DOCTOR_ID}),
+    ("""
+query MyQuery($f_name: String!, $l_name: String!) {
+    verifyUsername(fName: $f_name, lName: $l_name) {
+        message
+        success
+        body {
+            id
+            step
+        }
+    }
+}
+""", {"f_name": "Pujan", "l_name": "Thing"}),
+    ("""
+query MyQuery($dob: String!){
+    verifyDob(dob: $dob) {
+        message
+        success
+        body {
+            id
+            step
+            }
+    }
+}
+""", {"dob": "1990-05-12"}),
+]
+
+
+async def measure(schema: strawberry.Schema, requests: int, rate: float) -> dict:
+    """
+    Execute the frontend documents round-robin and measure CPU per request.
+
+    Args:
+        schema (strawberry.Schema): Schema under test.
+        requests (int): Number of requests to execute.
+        rate (float): Target requests per second.
+
+    Returns:
+        dict: CPU microseconds per request and achieved rate.
+    """
+    request = MagicMock()
+    request.headers = {"authorization": TOKEN}
+    context = {"request": request}
+    interval = 1 / rate
+
+    cpu = 0.0
+    start = time.perf_counter()
+    for i in range(requests):
+        query, variables = DOCUMENTS[i % len(DOCUMENTS)]
+        cpu_start = time.process_time()
+        result = await schema.execute(query, variable_values=variables, context_value=context)
+        cpu += time.process_time() - cpu_start
+        assert result.errors is None, result.errors
+        # Pace requests to the target rate.
+        await asyncio.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    return {
+        "cpu_us_per_request": round(cpu / requests * 1e6, 1),
+        "achieved_rate": round(requests / elapsed, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """
+    Benchmark the uncached and cached schemas.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        dict: Results per schema.
+    """
+    schemas = {
+        "uncached": strawberry.Schema(query=main.Query),
+        "cached": main.schema,
+    }
+    results = {"rate": args.rate, "requests": args.requests}
+    with patch.object(main, "get_id", AsyncMock(return_value=True)), \
+            patch.object(main, "get_username", AsyncMock(return_value=True)), \
+            patch.object(main, "get_dob", AsyncMock(return_value=True)), \
+            patch.object(main, "r", MagicMock(get=MagicMock(return_value="1"))):
+        for name, schema in schemas.items():
+            # Warm up so the cached schema is measured in its steady state.
+            await measure(schema, len(DOCUMENTS), rate=10_000)
+            results[name] = await measure(schema, args.requests, args.rate)
+    return results
+
+
+def main_cli():
+    """Parse arguments, run the benchmark and print the summary as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,150 @@
+"""
+Load test for the doctor verification GraphQL API.
+
+Simulates many doctors logging in at the same time. Each simulated login runs
+the full stepwise flow (`verifyDoctorId` -> `verifyUsername` -> `verifyDob`)
+against a running service and the script reports throughput and latency
+percentiles.
+
+Usage:
+    python benchmarks/load_verification.py --url http://localhost:8000/graphql \
+        --doctor-id <uuid> --first-name Pujan --last-name Thing --dob 1990-05-12 \
+        --concurrency 50 --logins 1000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+VERIFY_ID = """
+query ($doctorid: String!) {
+    verifyDoctorId(doctorid: $doctorid) { success body { id step } }
+}
+"""
+
+VERIFY_USERNAME = """
+query ($fName: String!, $lName: String!) {
+    verifyUsername(fName: $fName, lName: $lName) { success body { id step } }
+}
+"""
+
+VERIFY_DOB = """
+query ($dob: String!) {
+    verifyDob(dob: $dob) { success body { id step } }
+}
+"""
+
+
+async def post(client: httpx.AsyncClient, url: str, query: str, variables: dict,
+               token: dict | None = None) -> dict:
+    """
+    Send a single GraphQL query.
+
+    Args:
+        client (httpx.AsyncClient): Shared HTTP client.
+        url (str): GraphQL endpoint.
+        query (str): GraphQL document.
+        variables (dict): Query variables.
+        token (dict | None): Verification token sent in the authorization header.
+
+    Returns:
+        dict: The `data` section of the GraphQL response.
+    """
+    headers = {"authorization": json.dumps(token)} if token else {}
+    response = await client.post(url, json={"query": query, "variables": variables},
+                                 headers=headers)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+async def login(client: httpx.AsyncClient, args: argparse.Namespace) -> bool:
+    """
+    Run one full stepwise login.
+
+    Args:
+        client (httpx.AsyncClient): Shared HTTP client.
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        bool: True if every step succeeded.
+    """
+    data = await post(client, args.url, VERIFY_ID, {"doctorid": args.doctor_id})
+    result = data["verifyDoctorId"]
+    if not result["success"]:
+        return False
+
+    data = await post(client, args.url, VERIFY_USERNAME,
+                      {"fName": args.first_name, "lName": args.last_name}, result["body"])
+    result = data["verifyUsername"]
+    if not result["success"]:
+        return False
+
+    data = await post(client, args.url, VERIFY_DOB, {"dob": args.dob}, result["body"])
+    return data["verifyDob"]["success"]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """
+    Run `args.logins` logins with at most `args.concurrency` in flight.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        dict: Throughput and latency summary.
+    """
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    failures = 0
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+
+        async def one_login():
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    ok = await login(client, args)
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(args.logins / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+def main():
+    """Parse arguments, run the load test and print the summary as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/graphql")
+    parser.add_argument("--doctor-id", required=True)
+    parser.add_argument("--first-name", required=True)
+    parser.add_argument("--last-name", required=True)
+    parser.add_argument("--dob", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=1000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Bloom filter of registered doctor IDs.
+
+`verifyDoctorId` is mostly called with mistyped or forged UUIDs. The filter
+answers "definitely not registered" for those without touching the cache
+tiers or Postgres; only possible members go on to the real lookup.
+
+One process at a time (the holder of a short Redis lock) builds the filter
+from the User table and publishes the bitmap to Redis. The other worker
+processes download it whenever its version changes. New rows are picked up
+incrementally by `created_at`, and the filter is rebuilt from scratch
+periodically so deleted doctors eventually drop out.
+
+A filter that hasn't synced for two refresh intervals, e.g. during a
+database or Redis outage, passes every ID so doctors registered in the
+meantime aren't rejected.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import redis.asyncio as aioredis
+from prometheus_client import Counter, Gauge
+from sqlalchemy import func, select
+
+from model import User
+
+logger = logging.getLogger(__name__)
+
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", "1000000"))
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_ERROR_RATE", "0.001"))
+BLOOM_REFRESH_INTERVAL = int(os.getenv("BLOOM_REFRESH_INTERVAL", "15"))
+BLOOM_REBUILD_INTERVAL = int(os.getenv("BLOOM_REBUILD_INTERVAL", "3600"))
+
+# Rows committed slightly out of `created_at` order are still picked up.
+WATERMARK_OVERLAP = timedelta(seconds=60)
+BUILD_BATCH_SIZE = 10000
+
+BITS_KEY = "registry:bloom:bits"
+META_KEY = "registry:bloom:meta"
+LOCK_KEY = "registry:bloom:lock"
+REBUILD_KEY = "registry:bloom:rebuild"
+
+FILTER_CHECKS = Counter(
+    "doctor_id_filter_checks_total",
+    "Doctor ID Bloom filter checks by result",
+    ["result"],
+)
+FILTER_FALSE_POSITIVES = Counter(
+    "doctor_id_filter_false_positives_total",
+    "Doctor IDs passed by the Bloom filter but not found in the database",
+)
+FILTER_BYTES = Gauge("doctor_id_filter_bytes", "Memory used by the doctor ID Bloom filter bitmap")
+FILTER_ITEMS = Gauge("doctor_id_filter_items", "Doctor IDs added to the Bloom filter")
+FILTER_ESTIMATED_FPR = Gauge(
+    "doctor_id_filter_estimated_fpr",
+    "False-positive rate estimated from the Bloom filter fill ratio",
+)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over byte strings.
+    """
+
+    def __init__(self, size_bits: int, hashes: int, bits: bytearray | None = None):
+        """
+        Initialize the filter.
+
+        Args:
+            size_bits (int): Number of bits in the bitmap.
+            hashes (int): Number of bit positions set per item.
+            bits (bytearray | None): Existing bitmap to load. Defaults to an
+                empty bitmap.
+        """
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        """
+        Create a filter sized for `capacity` items at the target error rate.
+
+        Args:
+            capacity (int): Expected number of items.
+            error_rate (float): Target false-positive rate.
+
+        Returns:
+            BloomFilter: An empty filter.
+        """
+        capacity = max(capacity, 1)
+        size_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hashes)
+
+    def _positions(self, item: bytes):
+        """Yield the bit positions for an item using double hashing."""
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item: bytes):
+        """
+        Add an item to the filter.
+
+        Args:
+            item (bytes): Item to add.
+        """
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the bitmap in bytes."""
+        return len(self.bits)
+
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Estimate the false-positive rate from the share of bits set.
+
+        Returns:
+            float: Probability that a non-member is reported as present.
+        """
+        fill = int.from_bytes(self.bits, "little").bit_count() / self.size_bits
+        return fill ** self.hashes
+
+class DoctorIdFilter:
+    """
+    Process-local view of the shared doctor ID Bloom filter.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis | None = None,
+                 capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        """
+        Initialize the filter holder.
+
+        Args:
+            redis_client (aioredis.Redis | None): Redis client (binary
+                responses) used to share the bitmap. Defaults to None, in
+                which case this process builds its own filter.
+            capacity (int): Minimum capacity when sizing the filter.
+            error_rate (float): Target false-positive rate.
+        """
+        self.redis = redis_client
+        self.token = uuid.uuid4().hex
+        self.loaded_version: str | None = None
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filter: BloomFilter | None = None
+        self.items = 0
+        self.version = 0
+        self.watermark: datetime | None = None
+        self.rebuilt_at = 0.0
+        # time.monotonic() of the last successful sync
+        self.synced_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether a filter has been built or loaded."""
+        return self.filter is not None
+
+    @property
+    def stale(self) -> bool:
+        """Whether the filter has gone two refresh intervals without a successful sync."""
+        return self.synced_at is None or \
+            time.monotonic() - self.synced_at > 2 * BLOOM_REFRESH_INTERVAL
+
+    def might_contain(self, doctor_uuid: uuid.UUID) -> bool:
+        """
+        Check whether a doctor ID may be registered.
+
+        Until a filter is available, and while it is stale, every ID is
+        passed through.
+
+        Args:
+            doctor_uuid (uuid.UUID): Doctor ID to check.
+
+        Returns:
+            bool: False if the ID is definitely not registered.
+        """
+        if self.filter is None or self.stale:
+            return True
+        if doctor_uuid.bytes in self.filter:
+            FILTER_CHECKS.labels("passed").inc()
+            return True
+        FILTER_CHECKS.labels("rejected").inc()
+        return False
+
+    def add(self, doctor_uuid: uuid.UUID):
+        """
+        Add a newly registered doctor ID to this process's filter.
+
+        Args:
+            doctor_uuid (uuid.UUID): Doctor ID to add.
+        """
+        if self.filter is not None:
+            self.filter.add(doctor_uuid.bytes)
+            self.items += 1
+
+    async def rebuild(self, session_factory):
+        """
+        Build a new filter from every User ID.
+
+        Args:
+            session_factory (async_sessionmaker): Session factory for the registry database.
+        """
+        async with session_factory() as db:
+            count, watermark = (await db.execute(
+                select(func.count(), func.max(User.created_at)).select_from(User)
+            )).one()
+            bloom = BloomFilter.for_capacity(max(self.capacity, count * 2), self.error_rate)
+            items = 0
+            result = await db.stream_scalars(
+                select(User.id).execution_options(yield_per=BUILD_BATCH_SIZE)
+            )
+            async for partition in result.partitions():
+                for doctor_id in partition:
+                    bloom.add(doctor_id.bytes)
+                items += len(partition)
+                # Yield to the event loop between batches.
+                await asyncio.sleep(0)
+
+        self.filter, self.items, self.watermark = bloom, items, watermark
+        self.rebuilt_at = time.time()
+        self.version += 1
+        self._update_metrics()
+        logger.info("Doctor ID filter rebuilt")
+
+    async def add_new(self, session_factory) -> bool:
+        """
+        Add User IDs created since the last build or refresh.
+
+        Args:
+            session_factory (async_sessionmaker): Session factory for the registry database.
+
+        Returns:
+            bool: Whether the filter changed. Rows inside the overlap window
+                are added again but were already in the filter.
+        """
+        if self.watermark is None:
+            await self.rebuild(session_factory)
+            return True
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(User.id, User.created_at)
+                .where(User.created_at > self.watermark - WATERMARK_OVERLAP)
+            )).all()
+        previous = self.watermark
+        new = sum(created_at > previous for _, created_at in rows)
+        if not new:
+            return False
+        for doctor_id, created_at in rows:
+            self.filter.add(doctor_id.bytes)
+            self.watermark = max(self.watermark, created_at)
+        self.items += new
+        self.version += 1
+        self._update_metrics()
+        return True
+
+    async def sync(self, session_factory):
+        """
+        Bring this process's filter up to date.
+
+        The lock holder refreshes the filter from the database and publishes
+        it when it changed; every other process loads the published bitmap
+        if it changed.
+
+        Args:
+            session_factory (async_sessionmaker): Session factory for the registry database.
+        """
+        if not await self._acquire_lock():
+            await self._load()
+        else:
+            if self.redis is not None and self.filter is None:
+                await self._load()
+            if self.filter is None or time.time() - self.rebuilt_at > BLOOM_REBUILD_INTERVAL \
+                    or await self._rebuild_requested():
+                await self.rebuild(session_factory)
+                changed = True
+            else:
+                changed = await self.add_new(session_factory)
+            if changed or not await self._published():
+                await self._publish()
+        self.synced_at = time.monotonic()
+
+    async def run(self, session_factory):
+        """
+        Keep the filter up to date until cancelled.
+
+        A failed sync is logged and retried on the next interval; asyncpg
+        connection errors (`OSError`, `TimeoutError`) aren't wrapped by
+        SQLAlchemy, so any error is caught rather than ending the task.
+
+        Args:
+            session_factory (async_sessionmaker): Session factory for the registry database.
+        """
+        while True:
+            try:
+                await self.sync(session_factory)
+            except Exception:
+                logger.exception("Doctor ID filter refresh failed")
+            await asyncio.sleep(BLOOM_REFRESH_INTERVAL)
+
+    async def request_rebuild(self):
+        """
+        Ask the process that builds the shared filter to rebuild it on its next sync.
+
+        Used after bulk writes that the incremental `created_at` refresh
+        could miss, such as a long-running registry import.
+        """
+        if self.redis is None:
+            self.rebuilt_at = 0.0
+            return
+        await self.redis.set(REBUILD_KEY, 1)
+
+    async def _rebuild_requested(self) -> bool:
+        """Consume a pending rebuild request."""
+        if self.redis is None:
+            return False
+        return bool(await self.redis.delete(REBUILD_KEY))
+
+    async def _acquire_lock(self) -> bool:
+        """Try to become the process that builds the shared filter."""
+        if self.redis is None:
+            return True
+        acquired = await self.redis.set(
+            LOCK_KEY, self.token, nx=True, ex=BLOOM_REFRESH_INTERVAL * 2
+        )
+        if acquired:
+            return True
+        holder = await self.redis.get(LOCK_KEY)
+        if holder is not None and holder.decode() == self.token:
+            await self.redis.expire(LOCK_KEY, BLOOM_REFRESH_INTERVAL * 2)
+            return True
+        return False
+
+    async def _publish(self):
+        """Write the bitmap and its metadata to Redis in one transaction."""
+        if self.redis is None:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(BITS_KEY, bytes(self.filter.bits))
+            pipe.hset(META_KEY, mapping={
+                "size_bits": self.filter.size_bits,
+                "hashes": self.filter.hashes,
+                "items": self.items,
+                "version": f"{self.token}:{self.version}",
+                "watermark": self.watermark.isoformat() if self.watermark else "",
+                "rebuilt_at": self.rebuilt_at,
+            })
+            await pipe.execute()
+
+    async def _published(self) -> bool:
+        """Whether a filter is published, e.g. not lost to a Redis restart."""
+        if self.redis is None:
+            return True
+        return bool(await self.redis.exists(META_KEY))
+
+    async def _load(self):
+        """Replace the local filter with the published one if it changed."""
+        if self.redis is None:
+            return
+        meta = {k.decode(): v.decode() for k, v in (await self.redis.hgetall(META_KEY)).items()}
+        if not meta or meta["version"] == self.loaded_version:
+            return
+        bits = await self.redis.get(BITS_KEY)
+        if bits is None:
+            return
+        self.filter = BloomFilter(int(meta["size_bits"]), int(meta["hashes"]), bytearray(bits))
+        self.items = int(meta["items"])
+        self.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        self.rebuilt_at = float(meta["rebuilt_at"])
+        self.loaded_version = meta["version"]
+        self._update_metrics()
+
+    def _update_metrics(self):
+        """Export the filter's size and estimated error rate."""
+        FILTER_BYTES.set(self.filter.nbytes)
+        FILTER_ITEMS.set(self.items)
+        FILTER_ESTIMATED_FPR.set(self.filter.estimated_false_positive_rate())
+
+doctor_id_filter = DoctorIdFilter(
+    aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=6379,
+        socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5")),
+    )
+)
@@ -0,0 +1,239 @@
+"""
+Tiered cache for doctor registry lookups.
+
+Lookups are answered by an in-process TTL'd LRU first, then Redis, then the
+database. Negative results are cached as well, with a shorter TTL, so repeated
+probes for unknown doctors don't reach Postgres. Entries are invalidated
+explicitly when a User row changes, and the invalidation is broadcast over
+Redis pub/sub so every worker process drops its local copy.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as aioredis
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_CACHE_TTL = int(os.getenv("REGISTRY_CACHE_TTL", "600"))
+REGISTRY_CACHE_NEGATIVE_TTL = int(os.getenv("REGISTRY_CACHE_NEGATIVE_TTL", "30"))
+REGISTRY_LOCAL_TTL = int(os.getenv("REGISTRY_LOCAL_TTL", "60"))
+REGISTRY_LOCAL_NEGATIVE_TTL = int(os.getenv("REGISTRY_LOCAL_NEGATIVE_TTL", "10"))
+REGISTRY_LOCAL_MAXSIZE = int(os.getenv("REGISTRY_LOCAL_MAXSIZE", "10000"))
+
+KEY_PREFIX = "registry:"
+INVALIDATE_CHANNEL = "registry:invalidate"
+
+CACHE_REQUESTS = Counter(
+    "registry_cache_requests_total",
+    "Doctor registry cache lookups by tier and result",
+    ["tier", "result"],
+)
+
+def id_key(doctorid) -> str:
+    """Cache key for a doctor ID lookup."""
+    return f"{KEY_PREFIX}id:{str(doctorid).lower()}"
+
+def name_key(f_name: str, l_name: str) -> str:
+    """Cache key for a first/last name lookup."""
+    return f"{KEY_PREFIX}name:{json.dumps([f_name, l_name])}"
+
+def dob_key(dob) -> str:
+    """Cache key for a date of birth lookup."""
+    return f"{KEY_PREFIX}dob:{dob}"
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache where every entry carries its own expiry.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of entries kept before the least
+                recently used one is evicted.
+        """
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[bool, float]] = OrderedDict()
+
+    def get(self, key: str) -> bool | None:
+        """
+        Return the cached value, or None if it is missing or expired.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            bool | None: The cached value.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bool, ttl: float):
+        """
+        Store a value for `ttl` seconds.
+
+        Args:
+            key (str): Cache key.
+            value (bool): Value to store.
+            ttl (float): Time to live in seconds.
+        """
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        """
+        Remove a key if present.
+
+        Args:
+            key (str): Cache key.
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        self._data.clear()
+
+class RegistryCache:
+    """
+    Two-tier (local LRU + Redis) cache in front of the registry lookups.
+
+    Redis is optional: when no client is given, or when Redis errors, the
+    cache falls back to the local tier and the database.
+    """
+
+    def __init__(self, redis_client: aioredis.Redis | None = None,
+                 local_maxsize: int = REGISTRY_LOCAL_MAXSIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_client (aioredis.Redis | None): Async Redis client for the
+                shared tier. Defaults to None (local tier only).
+            local_maxsize (int): Maximum entries in the local tier.
+        """
+        self.redis = redis_client
+        self.local = TTLCache(local_maxsize)
+
+    async def lookup(self, key: str, loader: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Return a cached lookup result, loading and caching it on a miss.
+
+        Args:
+            key (str): Cache key built with `id_key`, `name_key` or `dob_key`.
+            loader (Callable[[], Awaitable[bool]]): Database lookup to run
+                when neither tier has the key.
+
+        Returns:
+            bool: The lookup result.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels("local", "hit").inc()
+            return value
+        CACHE_REQUESTS.labels("local", "miss").inc()
+
+        value = await self._redis_get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels("redis", "hit").inc()
+            self.local.set(key, value, self._local_ttl(value))
+            return value
+        CACHE_REQUESTS.labels("redis", "miss").inc()
+
+        value = await loader()
+        CACHE_REQUESTS.labels("db", "hit" if value else "miss").inc()
+        await self._redis_set(key, value)
+        self.local.set(key, value, self._local_ttl(value))
+        return value
+
+    async def invalidate(self, *keys: str):
+        """
+        Drop keys from both tiers and tell other processes to do the same.
+
+        Args:
+            *keys (str): Cache keys to invalidate.
+        """
+        for key in keys:
+            self.local.delete(key)
+        if self.redis is None or not keys:
+            return
+        try:
+            await self.redis.delete(*keys)
+            await self.redis.publish(INVALIDATE_CHANNEL, json.dumps(list(keys)))
+        except RedisError:
+            logger.warning("Registry cache invalidation failed")
+
+    async def listen_invalidations(self):
+        """
+        Evict local entries invalidated by other processes.
+
+        Runs until cancelled; meant to be started as a background task. While
+        the subscription is down invalidations may be missed, so the local
+        tier is cleared before resubscribing.
+        """
+        if self.redis is None:
+            return
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATE_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            for key in json.loads(message["data"]):
+                                self.local.delete(key)
+            except RedisError:
+                logger.warning("Registry cache invalidation listener disconnected")
+            self.local.clear()
+            await asyncio.sleep(5)
+
+    def _local_ttl(self, value: bool) -> int:
+        """Local tier TTL for a positive or negative result."""
+        return REGISTRY_LOCAL_TTL if value else REGISTRY_LOCAL_NEGATIVE_TTL
+
+    async def _redis_get(self, key: str) -> bool | None:
+        """Read a key from Redis, treating errors as a miss."""
+        if self.redis is None:
+            return None
+        try:
+            value = await self.redis.get(key)
+        except RedisError:
+            logger.warning("Registry cache read failed")
+            return None
+        return None if value is None else value == "1"
+
+    async def _redis_set(self, key: str, value: bool):
+        """Write a key to Redis with the positive or negative TTL."""
+        if self.redis is None:
+            return
+        ttl = REGISTRY_CACHE_TTL if value else REGISTRY_CACHE_NEGATIVE_TTL
+        try:
+            await self.redis.set(key, "1" if value else "0", ex=ttl)
+        except RedisError:
+            logger.warning("Registry cache write failed")
+
+registry_cache = RegistryCache(
+    aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=6379,
+        decode_responses=True,
+        socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5")),
+    )
+)
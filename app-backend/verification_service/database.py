@@ -1,74 +1,254 @@
 """Database setup and utility functions for doctor verification."""
+import asyncio
+import logging
 import os
+import uuid
 from datetime import datetime
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, exists, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 
+from bloom import FILTER_FALSE_POSITIVES, doctor_id_filter
+from cache import dob_key, id_key, name_key, registry_cache
 from model import User
+from replicas import ReplicaRouter
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "2000"))
+
+def get_async_url(url: str):
+    """
+    Convert a database URL to its asyncio driver equivalent.
+
+    `DATABASE_URL` is shared with alembic, which uses the synchronous
+    psycopg2 driver, so the driver part is swapped here instead.
+
+    Args:
+        url (str): Database URL as found in the environment.
+
+    Returns:
+        URL: The same URL using `asyncpg` for Postgres or `aiosqlite` for SQLite.
+    """
+    db_url = make_url(url)
+    if db_url.get_backend_name() == "postgresql":
+        return db_url.set(drivername="postgresql+asyncpg")
+    if db_url.get_backend_name() == "sqlite":
+        return db_url.set(drivername="sqlite+aiosqlite")
+    return db_url
+
+def create_engine(url: str):
+    """
+    Create an async engine with explicit pool sizing and statement timeouts.
+
+    Args:
+        url (str): Database URL as found in the environment.
+
+    Returns:
+        AsyncEngine: SQLAlchemy async engine.
+    """
+    db_url = get_async_url(url)
+    if db_url.get_backend_name() != "postgresql":
+        return create_async_engine(db_url)
+    return create_async_engine(
+        db_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={
+            "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)},
+        },
+    )
+
 db_url = os.getenv("DATABASE_URL")
 engine = create_engine(db_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
-def get_db():
+# Comma-separated read replicas used for the verification lookups
+replica_urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+                if url.strip()]
+read_router = ReplicaRouter([create_engine(url) for url in replica_urls])
+
+async def get_db():
     """
     Dependency function to get a database session.
 
     Yields:
-        db (Session): SQLAlchemy session object.
+        db (AsyncSession): SQLAlchemy async session object.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def get_id(doctorid: str):
+async def user_exists(*criteria) -> bool:
+    """
+    Run an existence-only lookup against the User table.
+
+    Emits `SELECT EXISTS (...)` so the database can stop at the first
+    matching index entry and no ORM object is hydrated. The lookup goes to a
+    read replica when one is configured and caught up.
+
+    Args:
+        *criteria: SQLAlchemy filter expressions on User columns.
+
+    Returns:
+        bool: True if at least one row matches.
+    """
+    return bool(await read_router.scalar(select(exists().where(*criteria)), SessionLocal))
+
+async def get_id(doctorid: str) -> bool:
     """
     Verify if a doctor with the given ID exists.
 
+    IDs ruled out by the doctor ID Bloom filter are rejected without a
+    cache or database lookup.
+
     Params:
         doctorid (str): The doctor's unique identifier.
 
     Returns:
-        User | bool: User object if found, otherwise False.
+        bool: True if found, otherwise False.
     """
-    db = next(get_db())
-    doctor = db.query(User).filter_by(id=doctorid).first()
-    db.close()
-    return doctor if doctor else False
+    doctor_uuid = uuid.UUID(doctorid)
+    if not doctor_id_filter.might_contain(doctor_uuid):
+        return False
+
+    async def load() -> bool:
+        found = await user_exists(User.id == doctor_uuid)
+        if not found and doctor_id_filter.ready:
+            FILTER_FALSE_POSITIVES.inc()
+        return found
 
-def get_username(f_name: str, l_name: str):
+    return await registry_cache.lookup(id_key(doctor_uuid), load)
+
+async def get_username(f_name: str, l_name: str) -> bool:
     """
-    Retrieves a user from the database based on first and last name.
+    Check whether a user exists with the given first and last name.
 
     Args:
         f_name (str): First name of the user.
         l_name (str): Last name of the user.
 
     Returns:
-        User | bool: User object if found, else False.
+        bool: True if found, else False.
     """
-    db = next(get_db())
-    doctor = db.query(User).filter_by(first_name=f_name, last_name=l_name).first()
-    db.close()
-    return doctor if doctor else False
+    return await registry_cache.lookup(
+        name_key(f_name, l_name),
+        lambda: user_exists(User.first_name == f_name, User.last_name == l_name),
+    )
 
-def get_dob(dob: datetime):
+async def get_dob(dob: datetime) -> bool:
     """
-    Retrieves a user from the database based on date of birth.
+    Check whether a user exists with the given date of birth.
 
     Args:
         dob (datetime): Date of birth of the user.
 
     Returns:
-        User | bool: User object if found, else False.
+        bool: True if found, else False.
+    """
+    return await registry_cache.lookup(dob_key(dob), lambda: user_exists(User.dob == dob))
+
+async def get_doctor(doctorid: str, f_name: str, l_name: str, dob: datetime) -> bool:
     """
-    db = next(get_db())
-    doctor = db.query(User).filter_by(dob=dob).first()
-    db.close()
-    return doctor if doctor else False
+    Verify a doctor's ID, name and date of birth against a single row.
+
+    The lookup is driven by the primary key, so it is one indexed query
+    regardless of how many doctors share a name or date of birth.
+
+    Args:
+        doctorid (str): The doctor's unique identifier.
+        f_name (str): First name of the doctor.
+        l_name (str): Last name of the doctor.
+        dob (datetime): Date of birth of the doctor.
+
+    Returns:
+        bool: True if a doctor matches all fields, else False.
+    """
+    doctor_uuid = uuid.UUID(doctorid)
+    if not doctor_id_filter.might_contain(doctor_uuid):
+        return False
+    return await user_exists(
+        User.id == doctor_uuid,
+        User.first_name == f_name,
+        User.last_name == l_name,
+        User.dob == dob,
+    )
+
+def registry_keys(user: User) -> set[str]:
+    """
+    Build the cache keys a User row answers, for its current and previous values.
+
+    Args:
+        user (User): A new, modified or deleted User instance.
+
+    Returns:
+        set[str]: Cache keys to invalidate.
+    """
+    attrs = inspect(user).attrs
+    keys = set()
+    for attr, key in (("id", id_key), ("dob", dob_key)):
+        history = attrs[attr].history
+        keys.update(key(value) for value in history.sum() if value is not None)
+
+    first_names = [v for v in attrs.first_name.history.sum() if v is not None]
+    last_names = [v for v in attrs.last_name.history.sum() if v is not None]
+    keys.update(name_key(first, last) for first in first_names for last in last_names)
+    return keys
+
+async def invalidate_user(*users: User):
+    """
+    Invalidate cached lookups for the given User rows.
+
+    Call this from write paths that bypass the ORM session (e.g. raw SQL).
+
+    Args:
+        *users (User): Users whose cached lookups must be dropped.
+    """
+    keys = set()
+    for user in users:
+        keys.update(registry_keys(user))
+    await registry_cache.invalidate(*keys)
+
+_pending_invalidations: set[asyncio.Task] = set()
+
+@event.listens_for(Session, "after_flush")
+def _collect_registry_keys(session: Session, flush_context):
+    """Remember the cache keys touched by User rows in this flush."""
+    keys = session.info.setdefault("registry_keys", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            keys.update(registry_keys(obj))
+    for obj in session.new:
+        if isinstance(obj, User) and obj.id is not None:
+            doctor_id_filter.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_registry_keys(session: Session):
+    """Invalidate the collected cache keys once the transaction is committed."""
+    keys = session.info.pop("registry_keys", None)
+    if not keys:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning("No event loop to invalidate registry cache; entries expire by TTL")
+        return
+    task = loop.create_task(registry_cache.invalidate(*keys))
+    _pending_invalidations.add(task)
+    task.add_done_callback(_pending_invalidations.discard)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_registry_keys(session: Session):
+    """Forget collected cache keys when the transaction is rolled back."""
+    session.info.pop("registry_keys", None)
@@ -1,10 +1,12 @@
 """Main application module defining the GraphQL API for doctor ID verification."""
 
+import asyncio
 import json
 import logging
 import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import date
 
 import redis
@@ -16,12 +18,21 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
-from strawberry.fastapi import GraphQLRouter
+from strawberry.extensions import ParserCache, ValidationCache
 from strawberry.types import Info
 
+from bloom import doctor_id_filter
+from cache import registry_cache
 from common.logger import set_request_id, setup_logging
-from database import get_dob, get_id, get_username
+from common.verification_session import (
+    STEP_ID,
+    STEP_NAME,
+    STEP_VERIFIED,
+    VerificationSessionStore,
+)
+from database import SessionLocal, get_dob, get_doctor, get_id, get_username, read_router
 from dotenv import load_dotenv
+from persisted_queries import PERSISTED_QUERIES_PATH, PersistedQueryRegistry, PersistedQueryRouter
 
 load_dotenv()
 
@@ -31,13 +42,37 @@ origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
 # Optional: strip whitespace from each origin
 origins = [origin.strip() for origin in origins if origin.strip()]
 
+# Maximum number of parsed and validated GraphQL documents kept in memory
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "128"))
+
 REQUEST_COUNT = Counter("http_requests_total", "Total HTTP Requests", ["method", "endpoint", "http_status"])
 REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "endpoint"])
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run background tasks for the lifetime of the application.
+
+    Starts the registry cache invalidation listener so entries dropped by
+    other processes are evicted from this process's local cache, the
+    doctor ID Bloom filter refresh loop and the read replica health checks.
+
+    Args:
+        app (FastAPI): The application instance.
+    """
+    tasks = [
+        asyncio.create_task(registry_cache.listen_invalidations()),
+        asyncio.create_task(doctor_id_filter.run(SessionLocal)),
+        asyncio.create_task(read_router.run()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -82,6 +117,38 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
 app.add_middleware(RequestIDMiddleware)
 
 r = redis.Redis(host="redis", port=6379, decode_responses=True)
+sessions = VerificationSessionStore(r)
+
+def require_step(auth_token: dict, step: int):
+    """
+    Check that both the token and the stored verification session are at `step`.
+
+    Args:
+        auth_token (dict): Parsed authorization token with `id` and `step`.
+        step (int): Step the caller must have reached.
+
+    Raises:
+        HTTPException: If the token or the session is at another step, or
+        the session has expired.
+    """
+    if str(auth_token["step"]) != str(step) \
+            or sessions.require_step(auth_token["id"], step) is None:
+        raise HTTPException(status_code=401, detail="Token does not match.")
+
+def advance_step(auth_token: dict, expected: int, step: int):
+    """
+    Move the verification session to the next step.
+
+    Args:
+        auth_token (dict): Parsed authorization token with `id`.
+        expected (int): Step the session must still be at.
+        step (int): Step to move to.
+
+    Raises:
+        HTTPException: If another request advanced or reset the session first.
+    """
+    if not sessions.advance(auth_token["id"], expected, step):
+        raise HTTPException(status_code=401, detail="Token does not match.")
 
 @app.middleware("http")
 async def prometheus_middleware(request: Request, call_next):
@@ -145,7 +212,7 @@ class Query:
     """
 
     @strawberry.field
-    def verify_doctor_id(self, doctorid: str) -> VerificationResponse:
+    async def verify_doctor_id(self, doctorid: str) -> VerificationResponse:
         """
         Verifies if a doctor ID is valid UUID and exists in the database.
 
@@ -163,8 +230,8 @@ class Query:
             uuid.UUID(doctorid)
 
             # ID verification logic
-            if get_id(doctorid):
-                r.set(doctorid, 1, ex=None)
+            if await get_id(doctorid):
+                sessions.start(doctorid, STEP_ID)
                 logger.info("Doctor ID valid")
                 return VerificationResponse(
                     success=True, message=f"{doctorid}: Doctor ID is valid",
@@ -181,12 +248,12 @@ class Query:
                                         message="Something went wrong. Try again later.")
 
     @strawberry.field
-    def verify_username(self, f_name: str, l_name: str, info: Info) -> VerificationResponse:
+    async def verify_username(self, f_name: str, l_name: str, info: Info) -> VerificationResponse:
         """
         Verifies the provided first and last name against the system.
 
         Extracts the authorization token from request headers, verifies UUID,
-        checks Redis cache for step tracking, and updates verification progress.
+        checks the verification session step, and advances it on success.
 
         Args:
             f_name (str): First name of the user to verify.
@@ -215,19 +282,12 @@ class Query:
             auth_token = json.loads(token)
             uuid.UUID(auth_token["id"])
 
-            # Redis cache check
-            cache_id = r.get(auth_token["id"])
-            if cache_id:
-                if cache_id == str(auth_token["step"]):
-                    pass # Step matches; proceed
-                else:
-                    raise HTTPException(status_code=401, detail="Token does not match.")
-            else:
-                raise HTTPException(status_code=401, detail="Token does not match.")
+            # Verification session check
+            require_step(auth_token, STEP_ID)
 
             # Username verification logic
-            if get_username(f_name, l_name):
-                r.set(auth_token["id"], 2, ex=None)
+            if await get_username(f_name, l_name):
+                advance_step(auth_token, STEP_ID, STEP_NAME)
                 logger.info("Username verified")
                 return VerificationResponse(
                     success=True, message="Username is valid",
@@ -248,7 +308,7 @@ class Query:
                                         message="Something went wrong. Try again later.")
 
     @strawberry.field
-    def verify_dob(self, dob: str, info: Info ) -> VerificationResponse:
+    async def verify_dob(self, dob: str, info: Info ) -> VerificationResponse:
         """
         Verifies a doctor's date of birth using the provided token.
 
@@ -265,7 +325,7 @@ class Query:
             # Try parsing and validating the date using Pydantic
             try:
                 date_adapter = TypeAdapter(date)
-                date_adapter.validate_python(dob)
+                dob_date = date_adapter.validate_python(dob)
             except ValidationError:
                 # Return a custom error message when date is invalid
                 custom_message = f"Invalid date format: '{dob}'. Please use YYYY-MM-DD format."
@@ -283,19 +343,12 @@ class Query:
             auth_token = json.loads(token)
             uuid.UUID(auth_token["id"])
 
-            # Redis cache check
-            cache_id = r.get(auth_token["id"])
-            if cache_id:
-                if cache_id == str(auth_token["step"]):
-                    pass # Step matches; proceed
-                else:
-                    raise HTTPException(status_code=401, detail="Token does not match.")
-            else:
-                raise HTTPException(status_code=401, detail="Token does not match.")
+            # Verification session check
+            require_step(auth_token, STEP_NAME)
 
             # date-of-birth verification logic
-            if get_dob(dob):
-                r.set(auth_token["id"], 3, ex=None)
+            if await get_dob(dob_date):
+                advance_step(auth_token, STEP_NAME, STEP_VERIFIED)
                 logger.info("DOB verified")
                 return VerificationResponse(
                     success=True, message="Valid dob",
@@ -315,7 +368,66 @@ class Query:
             return VerificationResponse(success=False,
                                         message="Something went wrong. Try again later.")
 
-schema = strawberry.Schema(query=Query)
-graphql_app = GraphQLRouter(schema=schema)
+    @strawberry.field
+    async def verify_doctor(self, doctorid: str, f_name: str, l_name: str,
+                            dob: str) -> VerificationResponse:
+        """
+        Verifies a doctor's ID, name and date of birth in a single request.
+
+        All three are checked against the same registry row, and the
+        verification session is started at the final step with one write. The stepwise
+        fields remain available for existing clients.
+
+        Args:
+            doctorid (str): The doctor's UUID string.
+            f_name (str): First name of the doctor.
+            l_name (str): Last name of the doctor.
+            dob (str): Date of birth in YYYY-MM-DD format.
+
+        Returns:
+            VerificationResponse: Result of the verification.
+        """
+        logger.info("Start verify_doctor")
+
+        try:
+            try:
+                date_adapter = TypeAdapter(date)
+                dob_date = date_adapter.validate_python(dob)
+            except ValidationError:
+                custom_message = f"Invalid date format: '{dob}'. Please use YYYY-MM-DD format."
+                logger.warning("Invalid DOB format")
+                return VerificationResponse(success=False, message=custom_message)
+
+            # Validate UUID format first — this will raise ValueError if invalid
+            uuid.UUID(doctorid)
+
+            if await get_doctor(doctorid, f_name, l_name, dob_date):
+                sessions.start(doctorid, STEP_VERIFIED)
+                logger.info("Doctor verified")
+                return VerificationResponse(
+                    success=True, message="Doctor verified",
+                    body=Body(id=doctorid, step=3)
+                )
+            logger.warning("Invalid doctor details")
+            return VerificationResponse(success=False, message="Invalid doctor details.")
+        except ValueError:
+            logger.warning("Doctor ID not valid UUID")
+            return VerificationResponse(success=False, message="Doctor ID is not a valid UUID.")
+        except Exception:
+            logger.exception("Error in verify_doctor")
+            return VerificationResponse(success=False,
+                                        message="Something went wrong. Try again later.")
+
+schema = strawberry.Schema(
+    query=Query,
+    extensions=[
+        ParserCache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE),
+        ValidationCache(maxsize=GRAPHQL_DOCUMENT_CACHE_SIZE),
+    ],
+)
+graphql_app = PersistedQueryRouter(
+    schema=schema,
+    persisted_queries=PersistedQueryRegistry.from_manifest(PERSISTED_QUERIES_PATH),
+)
 
 app.include_router(graphql_app, prefix="/graphql")
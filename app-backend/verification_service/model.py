@@ -1,7 +1,7 @@
 """SQLAlchemy model for User entity used in doctor verification."""
 from datetime import datetime
 
-from sqlalchemy import DATE, Column, DateTime, String
+from sqlalchemy import DATE, Column, DateTime, Index, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 
@@ -12,9 +12,13 @@ class User(Base):
     Represents a user (doctor) record in the system.
     """
     __tablename__ = "User"
+    __table_args__ = (
+        Index("ix_User_first_name_last_name", "first_name", "last_name"),
+        Index("ix_User_dob", "dob"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, index=True, unique=True)
     first_name = Column(String(20), nullable=False)
     last_name = Column(String(20), nullable=False)
     dob = Column(DATE, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(), nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
     updated_at = Column(DateTime)
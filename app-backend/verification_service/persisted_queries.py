@@ -0,0 +1,229 @@
+"""
+Automatic persisted queries for the verification GraphQL API.
+
+Clients send the SHA-256 hash of a query document in
+`extensions.persistedQuery.sha256Hash` (the Apollo APQ protocol) instead of
+the full document. The router resolves the hash against a registry of
+pre-registered documents, loaded from a manifest, plus documents clients have
+registered by sending the query together with its hash. Unknown hashes are
+answered with a `PersistedQueryNotFound` error so the client retries with the
+full document.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.types import ExecutionResult
+
+logger = logging.getLogger(__name__)
+
+PERSISTED_QUERIES_PATH = os.getenv("PERSISTED_QUERIES_PATH", "")
+PERSISTED_QUERIES_ALLOW_REGISTRATION = (
+    os.getenv("PERSISTED_QUERIES_ALLOW_REGISTRATION", "true").lower() == "true"
+)
+PERSISTED_QUERIES_MAXSIZE = int(os.getenv("PERSISTED_QUERIES_MAXSIZE", "1000"))
+
+class PersistedQueryError(GraphQLError):
+    """
+    Error returned to the client when a persisted query cannot be used.
+    """
+
+    def __init__(self, message: str, code: str):
+        """
+        Initialize the error.
+
+        Args:
+            message (str): Error message, as expected by APQ clients.
+            code (str): Machine-readable error code.
+        """
+        super().__init__(message, extensions={"code": code})
+
+def query_hash(query: str) -> str:
+    """
+    Hash a query document the way APQ clients do.
+
+    Args:
+        query (str): GraphQL query document.
+
+    Returns:
+        str: Hex-encoded SHA-256 digest.
+    """
+    return hashlib.sha256(query.encode()).hexdigest()
+
+class PersistedQueryRegistry:
+    """
+    Map of query hashes to documents.
+
+    Pre-registered documents are always kept. Documents registered by
+    clients are kept in a bounded LRU.
+    """
+
+    def __init__(self, documents: dict[str, str] | None = None,
+                 allow_registration: bool = PERSISTED_QUERIES_ALLOW_REGISTRATION,
+                 maxsize: int = PERSISTED_QUERIES_MAXSIZE):
+        """
+        Initialize the registry.
+
+        Args:
+            documents (dict[str, str] | None): Pre-registered documents keyed by hash.
+            allow_registration (bool): Whether clients may register new documents.
+            maxsize (int): Maximum number of client-registered documents.
+        """
+        self.documents = dict(documents or {})
+        self.allow_registration = allow_registration
+        self.maxsize = maxsize
+        self.registered: OrderedDict[str, str] = OrderedDict()
+
+    @classmethod
+    def from_manifest(cls, path: str, **kwargs) -> "PersistedQueryRegistry":
+        """
+        Load pre-registered documents from a manifest file.
+
+        Accepts an Apollo persisted query manifest
+        (`{"operations": [{"id": ..., "body": ...}]}`) or a plain
+        `{hash: document}` object.
+
+        Args:
+            path (str): Path to the manifest. An empty path loads nothing.
+            **kwargs: Passed to the registry constructor.
+
+        Returns:
+            PersistedQueryRegistry: The loaded registry.
+        """
+        if not path:
+            return cls(**kwargs)
+        with open(path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if "operations" in manifest:
+            manifest = {op["id"]: op["body"] for op in manifest["operations"]}
+        for sha256_hash, document in manifest.items():
+            if query_hash(document) != sha256_hash:
+                raise ValueError(f"Persisted query manifest hash mismatch: {sha256_hash}")
+        logger.info("Loaded persisted query manifest")
+        return cls(manifest, **kwargs)
+
+    def resolve(self, query: str | None, sha256_hash: str) -> str:
+        """
+        Return the document for a hash, registering it if the query is given.
+
+        Args:
+            query (str | None): Query document sent along with the hash, if any.
+            sha256_hash (str): Hash sent by the client.
+
+        Returns:
+            str: The query document to execute.
+
+        Raises:
+            PersistedQueryError: If the hash is unknown, does not match the
+                query, or registration is disabled.
+        """
+        if query is None:
+            document = self.documents.get(sha256_hash)
+            if document is None:
+                document = self.registered.get(sha256_hash)
+                if document is None:
+                    raise PersistedQueryError(
+                        "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+                    )
+                self.registered.move_to_end(sha256_hash)
+            return document
+
+        if query_hash(query) != sha256_hash:
+            raise PersistedQueryError("provided sha does not match query", "INVALID_SHA256")
+        if sha256_hash not in self.documents:
+            if not self.allow_registration:
+                raise PersistedQueryError(
+                    "PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED"
+                )
+            self.registered[sha256_hash] = query
+            self.registered.move_to_end(sha256_hash)
+            while len(self.registered) > self.maxsize:
+                self.registered.popitem(last=False)
+        return query
+
+class PersistedQueryRouter(GraphQLRouter):
+    """
+    GraphQL router that resolves persisted query hashes before execution.
+    """
+
+    def __init__(self, *args, persisted_queries: PersistedQueryRegistry, **kwargs):
+        """
+        Initialize the router.
+
+        Args:
+            *args: Passed to GraphQLRouter.
+            persisted_queries (PersistedQueryRegistry): Registry used to resolve hashes.
+            **kwargs: Passed to GraphQLRouter.
+        """
+        super().__init__(*args, **kwargs)
+        self.persisted_queries = persisted_queries
+
+    def should_render_graphql_ide(self, request) -> bool:
+        """
+        Don't serve the GraphQL IDE for persisted query GET requests.
+
+        Those carry a hash in `extensions` and no `query` parameter, which
+        would otherwise look like a browser visiting the endpoint.
+
+        Args:
+            request: Strawberry request adapter.
+
+        Returns:
+            bool: Whether to render the IDE.
+        """
+        if "extensions" in request.query_params:
+            return False
+        return super().should_render_graphql_ide(request)
+
+    async def parse_http_body(self, request) -> GraphQLRequestData:
+        """
+        Parse the request and replace a persisted query hash with its document.
+
+        Args:
+            request: Strawberry request adapter.
+
+        Returns:
+            GraphQLRequestData: Parsed request data with the query filled in.
+        """
+        request_data = await super().parse_http_body(request)
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+            extensions = json.loads(extensions) if extensions else {}
+        else:
+            if "application/json" not in (request.content_type or ""):
+                return request_data
+            body = await request.get_body()
+            # Skip the second JSON parse for requests that don't use APQ.
+            if b"persistedQuery" not in body:
+                return request_data
+            extensions = json.loads(body).get("extensions") or {}
+
+        persisted_query = extensions.get("persistedQuery")
+        if persisted_query:
+            request_data.query = self.persisted_queries.resolve(
+                request_data.query, persisted_query.get("sha256Hash", "")
+            )
+        return request_data
+
+    async def execute_operation(self, request, context, root_value):
+        """
+        Execute the operation, reporting persisted query errors as GraphQL errors.
+
+        Args:
+            request: The incoming request.
+            context: GraphQL context.
+            root_value: GraphQL root value.
+
+        Returns:
+            ExecutionResult: The execution result.
+        """
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return ExecutionResult(data=None, errors=[error])
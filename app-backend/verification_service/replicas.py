@@ -0,0 +1,170 @@
+"""
+Read-replica routing for doctor registry lookups.
+
+Read-only lookups are spread round-robin across the replicas listed in
+`DATABASE_REPLICA_URLS` (comma-separated). A background loop measures each
+replica's replication lag; replicas that fail, or fall more than
+`REPLICA_MAX_LAG_SECONDS` behind, are skipped until they recover. When no
+replica is usable, lookups go to the primary. A replica that errors during
+a lookup is marked unhealthy and the lookup is retried on the primary.
+
+Any database URL can stand in for a replica, so the routing can be tried
+with two local Postgres containers or with SQLite files in tests (SQLite
+always reports zero lag).
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+# A replica that has replayed everything it received is caught up, even if
+# the primary has been idle since the last replayed transaction.
+POSTGRES_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+QUERY_LATENCY = Histogram(
+    "registry_db_query_duration_seconds",
+    "Registry lookup latency by database target",
+    ["target"],
+)
+REPLICA_LAG = Gauge("registry_replica_lag_seconds", "Replication lag by replica", ["replica"])
+REPLICA_HEALTHY = Gauge(
+    "registry_replica_healthy", "Whether a replica is used for lookups", ["replica"]
+)
+
+class Replica:
+    """
+    One read replica and its last known health.
+    """
+
+    def __init__(self, engine):
+        """
+        Initialize the replica.
+
+        Args:
+            engine (AsyncEngine): Engine connected to the replica.
+        """
+        self.engine = engine
+        self.session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        url = engine.url
+        self.name = f"{url.host}:{url.port}/{url.database}" if url.host else str(url.database)
+        self.healthy = True
+        self.lag = 0.0
+
+    def mark(self, healthy: bool, lag: float | None = None):
+        """
+        Record the replica's health and lag.
+
+        Args:
+            healthy (bool): Whether the replica answered.
+            lag (float | None): Replication lag in seconds, if measured.
+        """
+        self.healthy = healthy
+        if lag is not None:
+            self.lag = lag
+            REPLICA_LAG.labels(self.name).set(lag)
+        REPLICA_HEALTHY.labels(self.name).set(1 if self.usable else 0)
+
+    @property
+    def usable(self) -> bool:
+        """Whether lookups may be routed to this replica."""
+        return self.healthy and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+class ReplicaRouter:
+    """
+    Round-robin router over healthy, caught-up replicas.
+    """
+
+    def __init__(self, engines: list):
+        """
+        Initialize the router.
+
+        Args:
+            engines (list[AsyncEngine]): Engines connected to the replicas.
+                An empty list sends every lookup to the primary.
+        """
+        self.replicas = [Replica(engine) for engine in engines]
+        self._next = 0
+
+    def pick(self) -> Replica | None:
+        """
+        Choose the next usable replica.
+
+        Returns:
+            Replica | None: A replica, or None if the primary must be used.
+        """
+        usable = [replica for replica in self.replicas if replica.usable]
+        if not usable:
+            return None
+        self._next += 1
+        return usable[self._next % len(usable)]
+
+    async def scalar(self, statement, primary: async_sessionmaker):
+        """
+        Run a read-only statement on a replica, falling back to the primary.
+
+        Args:
+            statement: SQLAlchemy statement returning a single value.
+            primary (async_sessionmaker): Session factory for the primary.
+
+        Returns:
+            Any: The statement's scalar result.
+        """
+        replica = self.pick()
+        if replica is not None:
+            start = time.perf_counter()
+            try:
+                async with replica.session_factory() as db:
+                    value = await db.scalar(statement)
+            except (SQLAlchemyError, OSError):
+                logger.warning("Replica lookup failed, using the primary")
+                replica.mark(False)
+            else:
+                QUERY_LATENCY.labels(replica.name).observe(time.perf_counter() - start)
+                return value
+
+        start = time.perf_counter()
+        async with primary() as db:
+            value = await db.scalar(statement)
+        QUERY_LATENCY.labels("primary").observe(time.perf_counter() - start)
+        return value
+
+    async def check(self):
+        """Measure every replica's lag and update its health."""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    if conn.dialect.name == "postgresql":
+                        lag = float(await conn.scalar(POSTGRES_LAG_SQL))
+                    else:
+                        lag = float(await conn.scalar(text("SELECT 0")))
+            except (SQLAlchemyError, OSError):
+                replica.mark(False)
+                continue
+            if lag > REPLICA_MAX_LAG_SECONDS:
+                logger.warning("Replica lagging behind the primary")
+            replica.mark(True, lag)
+
+    async def run(self):
+        """Keep replica health up to date until cancelled."""
+        if not self.replicas:
+            return
+        while True:
+            await self.check()
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
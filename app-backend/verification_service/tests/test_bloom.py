@@ -0,0 +1,169 @@
+"""Test cases for the doctor ID Bloom filter."""
+
+import asyncio
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import bloom
+from bloom import BloomFilter, DoctorIdFilter
+from model import Base, User
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """Create an in-memory registry database seeded with 100 doctors."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all(
+            User(id=uuid.uuid4(), first_name=f"first{i}", last_name=f"last{i}",
+                 dob=date(1990, 1, 1), created_at=datetime(2025, 1, 1))
+            for i in range(100)
+        )
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item is reported present and the error rate stays near target."""
+    bloom = BloomFilter.for_capacity(10000, 0.01)
+    members = [uuid.uuid4().bytes for _ in range(10000)]
+    for member in members:
+        bloom.add(member)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10000))
+    assert false_positives / 10000 < 0.02
+    assert bloom.estimated_false_positive_rate() < 0.02
+
+
+@pytest.mark.asyncio
+async def test_filter_passes_everything_until_built(session_factory):
+    """An unbuilt filter never rejects an ID."""
+    doctor_filter = DoctorIdFilter()
+    assert doctor_filter.might_contain(uuid.uuid4()) is True
+
+
+@pytest.mark.asyncio
+async def test_rebuild_and_incremental_refresh(session_factory):
+    """Registered IDs pass after a rebuild, and new rows are picked up incrementally."""
+    doctor_filter = DoctorIdFilter(capacity=1000, error_rate=0.001)
+    await doctor_filter.sync(session_factory)
+
+    async with session_factory() as db:
+        ids = list(await db.scalars(select(User.id)))
+    assert doctor_filter.items == 100
+    assert all(doctor_filter.might_contain(doctor_id) for doctor_id in ids)
+
+    new_id = uuid.uuid4()
+    async with session_factory() as db:
+        db.add(User(id=new_id, first_name="New", last_name="Doctor", dob=date(1990, 1, 1),
+                    created_at=datetime(2025, 1, 1) + timedelta(hours=1)))
+        await db.commit()
+    await doctor_filter.sync(session_factory)
+
+    assert doctor_filter.items == 101
+    assert doctor_filter.might_contain(new_id) is True
+
+
+@pytest.mark.asyncio
+async def test_requested_rebuild_picks_up_backdated_rows(session_factory):
+    """Rows older than the watermark are only seen after a requested rebuild."""
+    doctor_filter = DoctorIdFilter(capacity=1000, error_rate=0.001)
+    await doctor_filter.sync(session_factory)
+
+    old_id = uuid.uuid4()
+    async with session_factory() as db:
+        db.add(User(id=old_id, first_name="Old", last_name="Doctor", dob=date(1990, 1, 1),
+                    created_at=datetime(2024, 1, 1)))
+        await db.commit()
+    await doctor_filter.sync(session_factory)
+    assert doctor_filter.items == 100
+
+    await doctor_filter.request_rebuild()
+    await doctor_filter.sync(session_factory)
+    assert doctor_filter.items == 101
+    assert doctor_filter.might_contain(old_id) is True
+
+
+@pytest.mark.asyncio
+async def test_refresh_loop_survives_connection_errors(session_factory, monkeypatch):
+    """An unwrapped driver error is logged and the loop keeps syncing."""
+    monkeypatch.setattr(bloom, "BLOOM_REFRESH_INTERVAL", 0)
+    doctor_filter = DoctorIdFilter(capacity=1000, error_rate=0.001)
+    calls = 0
+
+    async def sync(factory):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise OSError("connection refused")
+        raise asyncio.CancelledError
+    monkeypatch.setattr(doctor_filter, "sync", sync)
+
+    with pytest.raises(asyncio.CancelledError):
+        await doctor_filter.run(session_factory)
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_stale_filter_passes_every_id(session_factory, monkeypatch):
+    """Once syncs stop succeeding the filter no longer rejects unknown IDs."""
+    doctor_filter = DoctorIdFilter(capacity=1000, error_rate=0.001)
+    await doctor_filter.sync(session_factory)
+    unknown = uuid.uuid4()
+    assert doctor_filter.might_contain(unknown) is False
+
+    doctor_filter.synced_at = time.monotonic() - 2 * bloom.BLOOM_REFRESH_INTERVAL - 1
+
+    assert doctor_filter.might_contain(unknown) is True
+
+
+@pytest.mark.asyncio
+async def test_unchanged_filter_is_not_republished(session_factory, monkeypatch):
+    """Refreshes without new doctors neither bump the version nor rewrite the bitmap."""
+    redis = fakeredis.aioredis.FakeRedis()
+    holder = DoctorIdFilter(redis, capacity=1000, error_rate=0.001)
+    follower = DoctorIdFilter(redis, capacity=1000, error_rate=0.001)
+    publishes = []
+    original_publish = DoctorIdFilter._publish
+
+    async def counting_publish(self):
+        publishes.append(self.version)
+        await original_publish(self)
+
+    monkeypatch.setattr(DoctorIdFilter, "_publish", counting_publish)
+
+    for _ in range(3):
+        await holder.sync(session_factory)
+        await follower.sync(session_factory)
+    assert holder.version == 1
+    assert publishes == [1]
+    assert follower.loaded_version == f"{holder.token}:1"
+
+    new_id = uuid.uuid4()
+    async with session_factory() as db:
+        db.add(User(id=new_id, first_name="New", last_name="Doctor", dob=date(1990, 1, 1),
+                    created_at=datetime(2025, 1, 1) + timedelta(hours=1)))
+        await db.commit()
+    await holder.sync(session_factory)
+    await follower.sync(session_factory)
+
+    assert publishes == [1, 2]
+    assert follower.might_contain(new_id) is True
+
+    await redis.flushall()
+    await holder.sync(session_factory)
+    assert publishes == [1, 2, 2]
@@ -0,0 +1,98 @@
+"""Test cases for the tiered doctor registry cache."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from cache import CACHE_REQUESTS, RegistryCache, TTLCache, id_key
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the async Redis client."""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+def counter(tier: str, result: str) -> float:
+    """Read the current value of a cache request counter."""
+    return CACHE_REQUESTS.labels(tier, result)._value.get()
+
+
+def test_ttl_cache_expiry_and_eviction():
+    """Entries expire after their TTL and the least recently used is evicted."""
+    cache = TTLCache(maxsize=2)
+    with patch("cache.time.monotonic", return_value=100.0):
+        cache.set("a", True, ttl=10)
+        cache.set("b", False, ttl=10)
+        assert cache.get("a") is True
+        cache.set("c", True, ttl=10)
+
+        assert cache.get("b") is None
+        assert cache.get("c") is True
+    with patch("cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_goes_through_tiers():
+    """A miss loads from the database once; later calls hit local then Redis."""
+    redis_client = FakeRedis()
+    cache = RegistryCache(redis_client)
+    loader = AsyncMock(return_value=True)
+    key = id_key("dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e")
+
+    local_hits = counter("local", "hit")
+    redis_hits = counter("redis", "hit")
+
+    assert await cache.lookup(key, loader) is True
+    assert redis_client.data[key] == "1"
+    assert await cache.lookup(key, loader) is True
+    assert counter("local", "hit") == local_hits + 1
+
+    cache.local.clear()
+    assert await cache.lookup(key, loader) is True
+    assert counter("redis", "hit") == redis_hits + 1
+    loader.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_negative_results_are_cached():
+    """Unknown doctors are cached as negatives with the short TTL."""
+    redis_client = FakeRedis()
+    redis_client.set = AsyncMock()
+    cache = RegistryCache(redis_client)
+    loader = AsyncMock(return_value=False)
+
+    assert await cache.lookup("registry:id:unknown", loader) is False
+    assert await cache.lookup("registry:id:unknown", loader) is False
+    loader.assert_awaited_once()
+    redis_client.set.assert_awaited_once_with("registry:id:unknown", "0", ex=30)
+
+
+@pytest.mark.asyncio
+async def test_invalidate_clears_both_tiers_and_broadcasts():
+    """Invalidation removes the key everywhere and publishes it."""
+    redis_client = FakeRedis()
+    cache = RegistryCache(redis_client)
+    await cache.lookup("registry:dob:1990-05-12", AsyncMock(return_value=True))
+
+    await cache.invalidate("registry:dob:1990-05-12")
+
+    assert cache.local.get("registry:dob:1990-05-12") is None
+    assert "registry:dob:1990-05-12" not in redis_client.data
+    assert redis_client.published == [("registry:invalidate", '["registry:dob:1990-05-12"]')]
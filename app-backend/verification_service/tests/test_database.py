@@ -0,0 +1,98 @@
+"""Test cases for the async database lookups used by doctor verification.
+
+The lookups run against an in-memory SQLite database through aiosqlite so
+they can be exercised without a running Postgres instance.
+"""
+
+import asyncio
+import uuid
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import database
+from cache import RegistryCache
+from model import Base, User
+
+DOCTOR_ID = "dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e"
+DOB = date(1990, 5, 12)
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """
+    Create an in-memory database seeded with one doctor and route the
+    database module's sessions to it.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add(User(id=uuid.UUID(DOCTOR_ID), first_name="Pujan", last_name="Thing", dob=DOB))
+        await db.commit()
+
+    with patch.object(database, "SessionLocal", factory), \
+            patch.object(database, "registry_cache", RegistryCache()):
+        yield factory
+    await engine.dispose()
+
+
+def test_get_async_url():
+    """Sync driver URLs are rewritten to their asyncio drivers."""
+    url = database.get_async_url("postgresql+psycopg2://postgres:pw@localhost:5432/doctors_db")
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.database == "doctors_db"
+    assert database.get_async_url("sqlite://").drivername == "sqlite+aiosqlite"
+
+
+@pytest.mark.asyncio
+async def test_get_id(session_factory):
+    """An existing doctor ID is found and an unknown one is not."""
+    assert await database.get_id(DOCTOR_ID) is True
+    assert await database.get_id(str(uuid.uuid4())) is False
+
+
+@pytest.mark.asyncio
+async def test_get_username(session_factory):
+    """A registered first/last name pair is found and an unknown one is not."""
+    assert await database.get_username("Pujan", "Thing") is True
+    assert await database.get_username("Haha", "asd") is False
+
+
+@pytest.mark.asyncio
+async def test_get_dob(session_factory):
+    """A registered date of birth is found and an unknown one is not."""
+    assert await database.get_dob(DOB) is True
+    assert await database.get_dob(date(1990, 12, 5)) is False
+
+
+@pytest.mark.asyncio
+async def test_commit_invalidates_cached_lookups(session_factory):
+    """Committing a User change drops the cached lookups it affects."""
+    assert await database.get_username("Pujan", "Thing") is True
+
+    async with session_factory() as db:
+        user = await db.get(User, uuid.UUID(DOCTOR_ID))
+        user.last_name = "Other"
+        await db.commit()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(task for task in database._pending_invalidations if task.get_loop() is loop)
+    )
+
+    assert await database.get_username("Pujan", "Thing") is False
+    assert await database.get_username("Pujan", "Other") is True
+
+
+@pytest.mark.asyncio
+async def test_get_doctor(session_factory):
+    """All fields must match the same row."""
+    assert await database.get_doctor(DOCTOR_ID, "Pujan", "Thing", DOB) is True
+    assert await database.get_doctor(DOCTOR_ID, "Pujan", "Thing", date(1990, 12, 5)) is False
+    assert await database.get_doctor(str(uuid.uuid4()), "Pujan", "Thing", DOB) is False
@@ -8,8 +8,10 @@ GraphQL API.
 import json
 from unittest.mock import patch
 
+import fakeredis
 from fastapi.testclient import TestClient
 
+from common.verification_session import VerificationSessionStore
 from verification_service.main import app
 
 client = TestClient(app)
@@ -26,6 +28,15 @@ HEADERS = {
     "authorization": json.dumps(TOKEN)
 }
 
+def session_store(step: int | None = None) -> VerificationSessionStore:
+    """
+    Build a session store on an in-memory Redis, with DOCTOR_ID at `step`.
+    """
+    store = VerificationSessionStore(fakeredis.FakeRedis(decode_responses=True))
+    if step is not None:
+        store.start(DOCTOR_ID, step)
+    return store
+
 @patch("verification_service.main.get_id")
 def test_verify_doctor_id_valid(mock_verify):
     """Test case for a valid doctor ID.
@@ -111,9 +122,8 @@ def test_verify_doctor_id_error():
     assert response_data["data"]["verifyDoctorId"]["success"] is False
     assert response_data["data"]["verifyDoctorId"]["message"] == "Doctor ID is not a valid UUID."
 
-@patch("verification_service.main.r.get", return_value="1")
-@patch("verification_service.main.r.set")
-def test_verify_username_valid(mock_set, mock_get):
+@patch("verification_service.main.sessions", session_store(1))
+def test_verify_username_valid():
     """
     Test case for a successful doctor username verification.
 
@@ -248,8 +258,8 @@ def test_verify_invalid_uuid():
     assert response_data["success"] is False
     assert response_data["message"] == "Doctor ID is not a valid UUID."
 
-@patch("verification_service.main.r.get", return_value="1")
-def test_verify_valid_step(mock_get):
+@patch("verification_service.main.sessions", session_store(1))
+def test_verify_valid_step():
     """
     Test case for when the token has an incorrect step value.
 
@@ -289,9 +299,8 @@ def test_verify_valid_step(mock_get):
     assert response_data["success"] is False
     assert response_data["message"] == "Token does not match."
 
-@patch("verification_service.main.r.get", return_value="2")
-@patch("verification_service.main.r.set")
-def test_verify_dob_valid(mock_get, mock_set):
+@patch("verification_service.main.sessions", session_store(2))
+def test_verify_dob_valid():
     query = f"""
     query {{
         verifyDob(dob: "{DOB}") {{
@@ -324,9 +333,8 @@ def test_verify_dob_valid(mock_get, mock_set):
     assert response_data["body"]["id"] == DOCTOR_ID
     assert response_data["body"]["step"] == 3
 
-@patch("verification_service.main.r.get", return_value="2")
-@patch("verification_service.main.r.set")
-def test_verify_dob_invalid(mock_get, mock_set):
+@patch("verification_service.main.sessions", session_store(2))
+def test_verify_dob_invalid():
     dob = "1990-12-05"
 
     query = f"""
@@ -358,9 +366,8 @@ def test_verify_dob_invalid(mock_get, mock_set):
     assert response_data["success"] is False
     assert response_data["message"] == "No matching dob found."
 
-@patch("verification_service.main.r.get", return_value="2")
-@patch("verification_service.main.r.set")
-def test_verify_dob_invalid_format(mock_get, mock_set):
+@patch("verification_service.main.sessions", session_store(2))
+def test_verify_dob_invalid_format():
     dob = "1990-march-2nd"
 
     query = f"""
@@ -392,9 +399,8 @@ def test_verify_dob_invalid_format(mock_get, mock_set):
     assert response_data["success"] is False
     assert response_data["message"] == f"Invalid date format: '{dob}'. Please use YYYY-MM-DD format."
 
-@patch("verification_service.main.r.get", return_value="1")
-@patch("verification_service.main.r.set")
-def test_verify_dob_step(mock_get, mock_set):
+@patch("verification_service.main.sessions", session_store(1))
+def test_verify_dob_step():
     query = f"""
     query {{
         verifyDob(dob: "{DOB}") {{
@@ -424,3 +430,69 @@ def test_verify_dob_step(mock_get, mock_set):
     print("response data", response_data)
     assert response_data["success"] is False
     assert response_data["message"] == "Token does not match."
+
+VERIFY_DOCTOR_QUERY = """
+query ($doctorid: String!, $fName: String!, $lName: String!, $dob: String!) {
+    verifyDoctor(doctorid: $doctorid, fName: $fName, lName: $lName, dob: $dob) {
+        success
+        message
+        body {
+            id
+            step
+        }
+    }
+}
+"""
+
+@patch("verification_service.main.get_doctor", return_value=True)
+@patch("verification_service.main.sessions", new_callable=session_store)
+def test_verify_doctor_valid(mock_sessions, mock_get_doctor):
+    """
+    Test case for a successful one-shot verification.
+
+    Verifies that a matching ID, name and DOB returns the final step and
+    starts the verification session at that step.
+    """
+    variables = {"doctorid": DOCTOR_ID, "fName": "Pujan", "lName": "Thing", "dob": DOB}
+    response = client.post(
+        "/graphql", json={"query": VERIFY_DOCTOR_QUERY, "variables": variables}
+    )
+    assert response.status_code == 200
+    response_data = response.json()["data"]["verifyDoctor"]
+    assert response_data["success"] is True
+    assert response_data["message"] == "Doctor verified"
+    assert response_data["body"]["id"] == DOCTOR_ID
+    assert response_data["body"]["step"] == 3
+    assert mock_sessions.require_step(DOCTOR_ID, 3) == []
+
+@patch("verification_service.main.get_doctor", return_value=False)
+@patch("verification_service.main.sessions", new_callable=session_store)
+def test_verify_doctor_invalid(mock_sessions, mock_get_doctor):
+    """
+    Test case for a one-shot verification where the details don't match.
+    """
+    variables = {"doctorid": DOCTOR_ID, "fName": "Haha", "lName": "asd", "dob": DOB}
+    response = client.post(
+        "/graphql", json={"query": VERIFY_DOCTOR_QUERY, "variables": variables}
+    )
+    response_data = response.json()["data"]["verifyDoctor"]
+    assert response_data["success"] is False
+    assert response_data["message"] == "Invalid doctor details."
+    assert mock_sessions.redis.keys() == []
+
+def test_verify_doctor_invalid_input():
+    """
+    Test case for a one-shot verification with a malformed ID or DOB.
+    """
+    variables = {"doctorid": "errorDoctorId", "fName": "Pujan", "lName": "Thing", "dob": DOB}
+    response = client.post(
+        "/graphql", json={"query": VERIFY_DOCTOR_QUERY, "variables": variables}
+    )
+    assert response.json()["data"]["verifyDoctor"]["message"] == "Doctor ID is not a valid UUID."
+
+    variables = {"doctorid": DOCTOR_ID, "fName": "Pujan", "lName": "Thing", "dob": "1990-march-2nd"}
+    response = client.post(
+        "/graphql", json={"query": VERIFY_DOCTOR_QUERY, "variables": variables}
+    )
+    assert response.json()["data"]["verifyDoctor"]["message"] == \
+        "Invalid date format: '1990-march-2nd'. Please use YYYY-MM-DD format."
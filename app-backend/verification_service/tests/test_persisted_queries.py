@@ -0,0 +1,89 @@
+"""Test cases for automatic persisted queries on the GraphQL endpoint."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from persisted_queries import PersistedQueryError, PersistedQueryRegistry, query_hash
+from verification_service.main import app, graphql_app
+
+client = TestClient(app)
+
+QUERY = """
+query ($doctorid: String!) {
+    verifyDoctorId(doctorid: $doctorid) {
+        success
+        message
+    }
+}
+"""
+VARIABLES = {"doctorid": "errorDoctorId"}
+
+
+def persisted(sha256_hash: str) -> dict:
+    """Build the APQ request extension for a hash."""
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+
+
+def test_registry_resolves_manifest_documents(tmp_path):
+    """Documents from an Apollo manifest are resolved by hash."""
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({
+        "format": "apollo-persisted-query-manifest",
+        "version": 1,
+        "operations": [{"id": query_hash(QUERY), "name": "Q", "type": "query", "body": QUERY}],
+    }))
+    registry = PersistedQueryRegistry.from_manifest(str(manifest), allow_registration=False)
+
+    assert registry.resolve(None, query_hash(QUERY)) == QUERY
+    with pytest.raises(PersistedQueryError, match="PersistedQueryNotSupported"):
+        registry.resolve("{ __typename }", query_hash("{ __typename }"))
+
+
+def test_registry_rejects_mismatched_hash():
+    """A query sent with the wrong hash is rejected."""
+    registry = PersistedQueryRegistry()
+    with pytest.raises(PersistedQueryError, match="provided sha does not match query"):
+        registry.resolve(QUERY, "0" * 64)
+
+
+def test_registry_evicts_least_recently_used():
+    """Client-registered documents are bounded."""
+    registry = PersistedQueryRegistry(maxsize=1)
+    registry.resolve("{ a }", query_hash("{ a }"))
+    registry.resolve("{ b }", query_hash("{ b }"))
+    with pytest.raises(PersistedQueryError, match="PersistedQueryNotFound"):
+        registry.resolve(None, query_hash("{ a }"))
+
+
+def test_apq_round_trip(monkeypatch):
+    """
+    An unknown hash asks the client for the document; once registered the
+    hash alone is enough, over POST and GET.
+    """
+    monkeypatch.setattr(graphql_app, "persisted_queries", PersistedQueryRegistry())
+    sha256_hash = query_hash(QUERY)
+
+    response = client.post("/graphql", json={"variables": VARIABLES,
+                                             "extensions": persisted(sha256_hash)})
+    assert response.status_code == 200
+    assert response.json()["errors"][0]["message"] == "PersistedQueryNotFound"
+    assert response.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    response = client.post("/graphql", json={"query": QUERY, "variables": VARIABLES,
+                                             "extensions": persisted(sha256_hash)})
+    assert response.json()["data"]["verifyDoctorId"]["message"] == \
+        "Doctor ID is not a valid UUID."
+
+    response = client.post("/graphql", json={"variables": VARIABLES,
+                                             "extensions": persisted(sha256_hash)})
+    assert response.json()["data"]["verifyDoctorId"]["message"] == \
+        "Doctor ID is not a valid UUID."
+
+    response = client.get("/graphql", params={
+        "variables": json.dumps(VARIABLES),
+        "extensions": json.dumps(persisted(sha256_hash)),
+    })
+    assert response.json()["data"]["verifyDoctorId"]["message"] == \
+        "Doctor ID is not a valid UUID."
@@ -0,0 +1,99 @@
+"""Test cases for read-replica routing.
+
+SQLite databases stand in for the primary and the replicas. Each one is
+seeded differently so the answer shows which database served a lookup.
+"""
+
+import uuid
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from model import Base, User
+from replicas import REPLICA_MAX_LAG_SECONDS, ReplicaRouter
+
+
+async def make_engine(path, first_name: str | None):
+    """Create a SQLite database, optionally holding one doctor named `first_name`."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    if first_name:
+        async with async_sessionmaker(bind=engine)() as db:
+            db.add(User(id=uuid.uuid4(), first_name=first_name, last_name="Thing",
+                        dob=date(1990, 5, 12)))
+            await db.commit()
+    return engine
+
+
+def served_by(name: str):
+    """Statement that is true only on the database seeded with `name`."""
+    return select(exists().where(User.first_name == name))
+
+
+@pytest_asyncio.fixture
+async def databases(tmp_path):
+    """A primary and two replicas, each seeded with a different doctor."""
+    engines = [
+        await make_engine(tmp_path / f"{name}.db", name)
+        for name in ("primary", "replica1", "replica2")
+    ]
+    primary = async_sessionmaker(bind=engines[0])
+    router = ReplicaRouter(engines[1:])
+    yield primary, router
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_round_robin_across_replicas(databases):
+    """Lookups alternate between the healthy replicas."""
+    primary, router = databases
+    served = [await router.scalar(served_by("replica1"), primary) for _ in range(4)]
+    assert served in ([True, False, True, False], [False, True, False, True])
+    assert await router.scalar(served_by("primary"), primary) is False
+
+
+@pytest.mark.asyncio
+async def test_unusable_replicas_fall_back_to_primary(databases):
+    """Lagging or unhealthy replicas are skipped; with none left the primary answers."""
+    primary, router = databases
+    first, second = router.replicas
+
+    first.mark(True, REPLICA_MAX_LAG_SECONDS + 1)
+    assert {router.pick() for _ in range(3)} == {second}
+
+    second.mark(False)
+    assert router.pick() is None
+    assert await router.scalar(served_by("primary"), primary) is True
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_lookup_retries_on_primary(tmp_path):
+    """A replica that errors is marked unhealthy and the primary answers."""
+    primary_engine = await make_engine(tmp_path / "primary.db", "primary")
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    router = ReplicaRouter([broken])
+
+    primary = async_sessionmaker(bind=primary_engine)
+    assert await router.scalar(served_by("primary"), primary) is True
+    assert router.replicas[0].healthy is False
+    assert router.pick() is None
+
+    await router.check()
+    assert router.replicas[0].healthy is False
+    await primary_engine.dispose()
+    await broken.dispose()
+
+
+@pytest.mark.asyncio
+async def test_check_restores_replica(databases):
+    """A health check brings a recovered replica back into rotation."""
+    primary, router = databases
+    for replica in router.replicas:
+        replica.mark(False)
+    await router.check()
+    assert all(replica.usable and replica.lag == 0 for replica in router.replicas)
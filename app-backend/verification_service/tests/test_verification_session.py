@@ -0,0 +1,74 @@
+"""Test cases for the Redis verification session store.
+
+The store runs against fakeredis so its Lua scripts are exercised without a
+running Redis instance.
+"""
+
+import fakeredis
+import pytest
+
+from common.verification_session import (
+    STEP_ID,
+    STEP_NAME,
+    STEP_VERIFIED,
+    VerificationSessionStore,
+    draft_key,
+    session_key,
+)
+
+DOCTOR_ID = "dd0804db-35d4-4965-a7a2-ce6d3ffc2e7e"
+FORM_ID = "d0530636-c565-4770-ac3f-79c9cfe019b3"
+
+
+@pytest.fixture
+def store():
+    """Session store backed by an in-memory Redis."""
+    return VerificationSessionStore(fakeredis.FakeRedis(decode_responses=True), ttl=60)
+
+
+def test_start_sets_step_and_ttl(store):
+    """A started session is one hash with a TTL."""
+    store.start(DOCTOR_ID, STEP_ID)
+    assert store.redis.hget(session_key(DOCTOR_ID), "step") == "1"
+    assert 0 < store.redis.ttl(session_key(DOCTOR_ID)) <= 60
+
+
+def test_advance_is_compare_and_set(store):
+    """Only the first transition out of a step succeeds."""
+    store.start(DOCTOR_ID, STEP_ID)
+    assert store.advance(DOCTOR_ID, STEP_ID, STEP_NAME) is True
+    assert store.advance(DOCTOR_ID, STEP_ID, STEP_NAME) is False
+    assert store.advance(DOCTOR_ID, STEP_ID, STEP_VERIFIED) is False
+    assert store.advance(DOCTOR_ID, STEP_NAME, STEP_VERIFIED) is True
+
+
+def test_advance_missing_session(store):
+    """An expired or unknown session cannot be advanced or recreated."""
+    assert store.advance(DOCTOR_ID, STEP_ID, STEP_NAME) is False
+    assert not store.redis.exists(session_key(DOCTOR_ID))
+
+
+def test_require_step_fetches_keys(store):
+    """A matching step returns the requested keys in the same call."""
+    store.start(DOCTOR_ID, STEP_VERIFIED)
+    store.save_draft(FORM_ID, "{}")
+    assert store.require_step(DOCTOR_ID, STEP_VERIFIED, draft_key(FORM_ID)) == ["{}"]
+    assert store.require_step(DOCTOR_ID, STEP_VERIFIED, draft_key("missing")) == [None]
+    assert store.require_step(DOCTOR_ID, STEP_NAME, draft_key(FORM_ID)) is None
+
+
+def test_require_step_refreshes_ttl(store):
+    """Using a session extends its lifetime."""
+    store.start(DOCTOR_ID, STEP_ID)
+    store.redis.expire(session_key(DOCTOR_ID), 5)
+    store.require_step(DOCTOR_ID, STEP_ID)
+    assert store.redis.ttl(session_key(DOCTOR_ID)) > 5
+
+
+def test_drafts_expire_and_are_namespaced(store):
+    """Drafts are stored under their own prefix with a TTL."""
+    store.save_draft(FORM_ID, "{}")
+    assert store.redis.get(FORM_ID) is None
+    assert store.redis.ttl(draft_key(FORM_ID)) > 0
+    store.delete_draft(FORM_ID)
+    assert store.redis.get(draft_key(FORM_ID)) is None
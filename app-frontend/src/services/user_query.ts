@@ -37,4 +37,17 @@ query MyQuery($dob: String!){
             }
     }
 }
-`;
\ No newline at end of file
+`;
+
+export const CHECK_DOCTOR = gql`
+query MyQuery($doctorid: String!, $f_name: String!, $l_name: String!, $dob: String!) {
+    verifyDoctor(doctorid: $doctorid, fName: $f_name, lName: $l_name, dob: $dob) {
+        message
+        success
+        body {
+            id
+            step
+        }
+    }
+}
+`;